@@ -0,0 +1,281 @@
+"""
+Micro-benchmarks (pytest-benchmark) des chemins chauds en pur Python de la recherche.
+
+Chaque fonction de library/search_core.py est mesurée sur des données synthétiques
+de taille croissante (1k, 10k, 100k livres) et vérifiée contre une implémentation
+de référence (NetworkX ou version naïve) : une optimisation doit rester exacte.
+
+Usage (depuis daar_library/):
+  pip install pytest pytest-benchmark
+  pytest benchmarks/bench_hot_paths.py --benchmark-group-by=group --benchmark-columns=min,median,mean,rounds
+  BENCH_SIZES=1000,10000 pytest benchmarks/bench_hot_paths.py     # tailles réduites
+
+La colonne médiane par groupe donne la courbe de passage à l'échelle ;
+--benchmark-json=out.json l'exporte pour comparaison entre deux implémentations.
+PageRank et le graphe de similarité sont quadratiques aujourd'hui : au-delà de
+BENCH_QUADRATIC_MAX livres (défaut 10k) ils sont ignorés plutôt que de bloquer la suite.
+"""
+
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from library import search_core  # noqa: E402
+
+SIZES = [int(n) for n in os.environ.get("BENCH_SIZES", "1000,10000,100000").split(",")]
+QUADRATIC_MAX = int(os.environ.get("BENCH_QUADRATIC_MAX", "10000"))
+SEED = 42
+
+
+# ----------------------------------------------------------------------
+# Données synthétiques
+# ----------------------------------------------------------------------
+def make_graph(n, avg_degree=6, seed=SEED):
+    """Graphe non orienté aléatoire dict[int, set[int]] (~avg_degree voisins par nœud)."""
+    rng = random.Random(seed)
+    graph = {i: set() for i in range(n)}
+    for _ in range(n * avg_degree // 2):
+        a, b = rng.randrange(n), rng.randrange(n)
+        if a != b:
+            graph[a].add(b)
+            graph[b].add(a)
+    return graph
+
+
+def make_hits(n_books, n_terms=200, books_per_term=None, seed=SEED):
+    """Hits ES d'une requête regex : n_terms termes, postings Zipf sur n_books livres."""
+    rng = random.Random(seed)
+    hits = []
+    for rank in range(1, n_terms + 1):
+        fanout = books_per_term or max(1, min(500, n_books // rank))
+        books = {str(rng.randrange(n_books)): rng.randint(1, 50) for _ in range(fanout)}
+        hits.append({"_source": {"term": f"t{rank}", "part": 0, "books": books}})
+    return hits
+
+
+def make_book_words(n, vocab=2000, seed=SEED):
+    rng = random.Random(seed)
+    words = [f"word{i:05d}" for i in range(vocab)]
+    return {i: set(rng.sample(words[:200] if i % 3 else words, rng.randint(2, 6))) for i in range(n)}
+
+
+def skip_if_quadratic(n):
+    if n > QUADRATIC_MAX:
+        pytest.skip(f"implémentation O(N²) : {n} > BENCH_QUADRATIC_MAX={QUADRATIC_MAX}")
+
+
+# ----------------------------------------------------------------------
+# Postings
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("n", SIZES)
+def test_merge_postings(benchmark, n):
+    benchmark.group = "merge_postings"
+    hits = make_hits(n)
+    book_map = benchmark(search_core.merge_postings, hits)
+
+    expected = {}
+    for hit in hits:
+        for bid, count in hit["_source"]["books"].items():
+            expected[int(bid)] = expected.get(int(bid), 0) + count
+    assert book_map == expected
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_search_aggregation(benchmark, n):
+    """Agrégation complète de perform_search_logic : fusion + tri + page 1."""
+    benchmark.group = "search_aggregation"
+    hits = make_hits(n)
+
+    def aggregate():
+        book_map = search_core.merge_postings(hits)
+        return len(book_map), search_core.paginate(search_core.rank_books(book_map), 1, 10)
+
+    total, page = benchmark(aggregate)
+    scores = [score for _, score in page]
+    assert scores == sorted(scores, reverse=True)
+    assert total == len(search_core.merge_postings(hits))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_impact_topk(benchmark, n):
+    """Top-10 par arrêt anticipé (?exact=false) contre la fusion complète."""
+    benchmark.group = "impact_topk"
+    docs = {}
+    for i, hit in enumerate(make_hits(n)):
+        postings = sorted(hit["_source"]["books"].items(), key=lambda x: -x[1])
+        for part, start in enumerate(range(0, len(postings), 100)):
+            docs[f"{i}_part{part}"] = dict(postings[start:start + 100])
+    blocks = [(doc_id, max(books.values())) for doc_id, books in docs.items()]
+
+    def fetch(doc_ids, only_books=None):
+        keep = {str(b) for b in only_books} if only_books is not None else None
+        for doc_id in doc_ids:
+            books = docs[doc_id]
+            yield books if keep is None else {b: c for b, c in books.items() if b in keep}
+
+    scores, exact, _ = benchmark(search_core.impact_topk, blocks, fetch, 10)
+
+    full = search_core.merge_postings({"_source": {"books": books}} for books in docs.values())
+    assert exact
+    top = search_core.rank_books(scores)[:10]
+    assert [s for _, s in top] == [s for _, s in search_core.rank_books(full)[:10]]
+    assert all(full[bid] == score for bid, score in top)
+
+
+# ----------------------------------------------------------------------
+# Graphe
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("n", SIZES)
+def test_bfs_distances(benchmark, n):
+    benchmark.group = "bfs_distances"
+    nx = pytest.importorskip("networkx")
+    graph = make_graph(n)
+    distances = benchmark(search_core.bfs_distances, graph, 0)
+    assert distances == nx.single_source_shortest_path_length(nx.Graph(graph), 0)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_closeness_for_ids(benchmark, n):
+    """Closeness des 10 résultats d'une page, comme enhanced_search(centrality=true)."""
+    benchmark.group = "closeness_for_ids"
+    nx = pytest.importorskip("networkx")
+    graph = make_graph(n)
+    ids = list(range(0, n, max(1, n // 10)))[:10]
+    scores = benchmark(search_core.closeness_for_ids, graph, ids)
+
+    g = nx.Graph(graph)
+    for node in ids[:3]:
+        assert scores[node] == pytest.approx(nx.closeness_centrality(g, u=node, wf_improved=True))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_closeness_for_ids_csr(benchmark, n):
+    """Même calcul sur le CSRGraph mappé servi aux vues (BFS sur indptr / indices)."""
+    from library.graph_store import from_adjacency
+    benchmark.group = "closeness_for_ids"
+    graph = make_graph(n)
+    csr = from_adjacency(graph)
+    ids = list(range(0, n, max(1, n // 10)))[:10]
+    scores = benchmark(search_core.closeness_for_ids, csr, ids)
+    assert scores == pytest.approx(search_core.closeness_for_ids(graph, ids))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_pagerank(benchmark, n):
+    benchmark.group = "pagerank"
+    skip_if_quadratic(n)
+    nx = pytest.importorskip("networkx")
+    graph = make_graph(n)
+    ranks = benchmark.pedantic(search_core.pagerank, args=(graph,), rounds=1, iterations=1)
+
+    # 20 itérations : on compare à NetworkX avec une tolérance large
+    expected = nx.pagerank(nx.Graph(graph), alpha=0.85, max_iter=200, tol=1e-10)
+    top = sorted(expected, key=expected.get, reverse=True)[:5]
+    for node in top:
+        assert ranks[node] == pytest.approx(expected[node], rel=0.05)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_similarity_graph(benchmark, n):
+    """Cœur de build_graph_from_books (Jaccard sur les titres)."""
+    benchmark.group = "similarity_graph"
+    skip_if_quadratic(n)
+    book_words = make_book_words(n)
+    graph = benchmark.pedantic(search_core.similarity_graph, args=(book_words,), rounds=1, iterations=1)
+
+    for b1 in list(book_words)[:20]:
+        for b2 in list(book_words)[:200]:
+            if b1 == b2:
+                continue
+            w1, w2 = book_words[b1], book_words[b2]
+            linked = len(w1 & w2) / len(w1 | w2) > 0.1
+            assert (b2 in graph[b1]) == linked
+
+
+# ----------------------------------------------------------------------
+# Autocomplétion
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("n", SIZES)
+def test_prefix_complete(benchmark, n):
+    """/api/complete/ sur un vocabulaire de n termes (préfixe de 2 lettres, sans cache)."""
+    from library.complete import PrefixIndex
+    benchmark.group = "prefix_complete"
+    rng = random.Random(SEED)
+    vocab = sorted({"".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 9))) for _ in range(n)})
+    hits = [rng.randint(1, 2000) for _ in vocab]
+    index = PrefixIndex(vocab, hits)
+    lo, hi = index.prefix_range("ab")
+
+    top = benchmark(index._top, lo, hi, 10)
+    expected = sorted(((t, h) for t, h in zip(vocab, hits) if t.startswith("ab")), key=lambda x: (-x[1], x[0]))[:10]
+    assert top == expected
+
+
+# ----------------------------------------------------------------------
+# Pagination par curseur
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("n", SIZES)
+def test_cursor_deep_page(benchmark, n):
+    """Page de 10 au milieu d'un classement de n livres, reprise après la clé d'un curseur."""
+    from library.cursors import RankedList
+    benchmark.group = "cursor_page"
+    rng = random.Random(SEED)
+    sorted_books = search_core.rank_books({bid: rng.randint(1, 50) for bid in range(n)})
+    ranked = RankedList(sorted_books)
+    bid, score = sorted_books[n // 2]
+
+    page = benchmark(lambda: ranked.slice(ranked.position_after(score, bid), 10))
+    assert page == sorted_books[n // 2 + 1:n // 2 + 11]
+
+
+# ----------------------------------------------------------------------
+# Normalisation du texte (indexation)
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("n", SIZES)
+def test_count_terms(benchmark, n):
+    """Comptage des termes normalisés d'un livre de n mots (chemin rapide de library/text.py)."""
+    from collections import Counter
+    from library.text import Normalizer, WORD_RE, fold
+    benchmark.group = "count_terms"
+    rng = random.Random(SEED)
+    vocab = ["Été", "été", "CAFÉ", "the", "Straße", "Война", "love", "Love", "loving", "world"]
+    text = " ".join(rng.choice(vocab) for _ in range(n))
+    normalizer = Normalizer()
+
+    counts = benchmark(normalizer.count_terms, text)
+    expected = Counter(fold(w) for w in WORD_RE.findall(text) if fold(w) != "the")
+    assert counts == expected
+
+
+# ----------------------------------------------------------------------
+# Facettes (bitmaps compressés)
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("n", SIZES)
+def test_facet_counts(benchmark, tmp_path, n):
+    """Filtre de facettes + top 10 des sujets sur un résultat de n/10 livres parmi n."""
+    from collections import Counter
+    from library.bitmaps import Bitmap
+    from library.facets import FacetIndex, FacetsWriter
+    benchmark.group = "facet_counts"
+    rng = random.Random(SEED)
+    writer, subjects = FacetsWriter(), {}
+    for bid in range(n):
+        subjects[bid] = {f"s{min(int(rng.paretovariate(1.2)), 500)}" for _ in range(3)}
+        writer.add_book(bid, {"subject": subjects[bid], "language": [rng.choice(["en", "fr", "de"])]})
+    writer.write(tmp_path / "facets.bin")
+    index = FacetIndex(tmp_path / "facets.bin")
+    result = rng.sample(range(n), n // 10)
+
+    def run():
+        candidates = Bitmap.from_ids(result) & index.filter({"language": ("en", "fr")})
+        return index.counts(candidates, "subject")
+
+    counts = benchmark(run)
+    allowed = index.filter({"language": ("en", "fr")}).contains_many(result)
+    expected = Counter(s for bid, ok in zip(result, allowed) if ok for s in subjects[bid])
+    assert [c["count"] for c in counts] == sorted(expected.values(), reverse=True)[:10]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Génère un corpus synthétique reproductible au format de download_gutendex.py
+(metadata.json + <id>.txt) pour les benchmarks.
+
+Le vocabulaire est fait de pseudo-mots (syllabes) tirés selon une loi de Zipf,
+comme dans un vrai texte : quelques mots très fréquents, une longue traîne rare.
+Même graine + mêmes paramètres => mêmes fichiers.
+
+Usage:
+  python benchmarks/generate_corpus.py --books 500 --words 5000 --output benchmarks/data/libraryBooks
+"""
+
+import argparse
+import itertools
+import json
+import random
+from pathlib import Path
+
+SYLLABLES = [
+    "ba", "be", "bi", "bo", "da", "de", "di", "do", "la", "le", "li", "lo", "ma", "me",
+    "mi", "mo", "na", "ne", "ni", "no", "ra", "re", "ri", "ro", "sa", "se", "si", "so",
+    "ta", "te", "ti", "to", "va", "ve", "vi", "vo", "tion", "ment", "ité", "eur",
+]
+
+
+def build_vocabulary(size, rng):
+    """`size` pseudo-mots distincts de 2 à 4 syllabes, dans un ordre aléatoire stable."""
+    words = set()
+    for n in (2, 3, 4):
+        for combo in itertools.product(SYLLABLES, repeat=n):
+            words.add("".join(combo))
+            if len(words) >= size * 3:
+                break
+        if len(words) >= size * 3:
+            break
+    vocab = sorted(words)
+    rng.shuffle(vocab)
+    return vocab[:size]
+
+
+def zipf_weights(size, s=1.1):
+    return [1.0 / (rank ** s) for rank in range(1, size + 1)]
+
+
+def generate(output, books, words, vocab_size, seed):
+    rng = random.Random(seed)
+    vocab = build_vocabulary(vocab_size, rng)
+    weights = list(itertools.accumulate(zipf_weights(len(vocab))))
+    output.mkdir(parents=True, exist_ok=True)
+
+    metadata = {}
+    for i in range(1, books + 1):
+        book_id = 100000 + i
+        body = rng.choices(vocab, cum_weights=weights, k=words)
+        lines = (" ".join(body[j:j + 12]) for j in range(0, len(body), 12))
+        (output / f"{book_id}.txt").write_text("\n".join(lines), encoding="utf-8")
+
+        # titres de 3 à 6 mots (> 3 lettres) pour que build_graph_from_books crée des liens
+        title_words = rng.choices(vocab[:200], k=rng.randint(3, 6))
+        metadata[str(book_id)] = {
+            "id": book_id,
+            "title": f"{' '.join(title_words).capitalize()} {book_id}",
+            "authors": [{"name": f"Author {rng.randint(1, max(1, books // 5))}"}],
+            "filename": f"{book_id}.txt",
+            "cover_image": "",
+            "word_count": words,
+            "download_count": rng.randint(0, 50000),
+            "bookshelves": [],
+            "subjects": [],
+            "languages": ["en"],
+            "saved_at": "2000-01-01T00:00:00Z",
+        }
+
+    (output / "metadata.json").write_text(json.dumps(metadata, ensure_ascii=False, indent=2), encoding="utf-8")
+    # vocabulaire trié par fréquence décroissante : sert au locustfile pour tirer les requêtes
+    (output / "vocab.json").write_text(json.dumps(vocab, ensure_ascii=False), encoding="utf-8")
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path, default=Path("benchmarks/data/libraryBooks"))
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--words", type=int, default=5000, help="mots par livre")
+    parser.add_argument("--vocab", type=int, default=20000, help="taille du vocabulaire")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    metadata = generate(args.output, args.books, args.words, args.vocab, args.seed)
+    print(f"[DONE] {len(metadata)} livres synthétiques dans {args.output.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
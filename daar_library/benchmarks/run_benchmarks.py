@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Banc de performance de l'API, de bout en bout et reproductible.
+
+ 1. génère un corpus synthétique (generate_corpus.py, graine fixe)
+ 2. l'importe et l'indexe avec les vraies commandes Django
+    (import_books_withImage, index_inverted_from_db) dans une base SQLite
+    dédiée et un Elasticsearch local (service `elasticsearch-bench` du
+    docker-compose, profil "bench", port 9201)
+ 3. lance gunicorn puis Locust en mode headless pour chaque mélange de requêtes
+ 4. écrit p50/p95/p99 et RPS par mélange dans un JSON
+ 5. compare à une baseline enregistrée et sort en erreur en cas de régression
+
+Usage (depuis daar_library/):
+  docker compose --profile bench up -d elasticsearch-bench
+  python benchmarks/run_benchmarks.py --books 500 --save-baseline
+  python benchmarks/run_benchmarks.py --books 500            # compare à la baseline
+
+Dépendances : `pip install locust`, gunicorn (requirements.txt) et docker pour Elasticsearch.
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+PROJECT_DIR = HERE.parent
+MIXES = ["prefix", "wildcard", "regex", "centrality_on", "centrality_off"]
+PERCENTILES = {"p50": "50%", "p95": "95%", "p99": "99%"}
+
+
+def wait_for(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2)
+            return True
+        except Exception:
+            time.sleep(1)
+    return False
+
+
+def run(cmd, env):
+    print(f"[RUN] {' '.join(cmd)}")
+    subprocess.run(cmd, cwd=PROJECT_DIR, env=env, check=True)
+
+
+def prepare_dataset(args, env):
+    run([sys.executable, str(HERE / "generate_corpus.py"), "--output", str(args.data_dir),
+         "--books", str(args.books), "--words", str(args.words), "--vocab", str(args.vocab),
+         "--seed", str(args.seed)], env)
+    db_path = Path(env["DAAR_DB_PATH"])
+    if db_path.exists():
+        db_path.unlink()   # base jetable : chaque run repart du même état
+    run([sys.executable, "manage.py", "migrate", "--noinput"], env)
+    run([sys.executable, "manage.py", "import_books_withImage", "--library-dir", str(args.data_dir)], env)
+    run([sys.executable, "manage.py", "index_inverted_from_db"], env)
+    run([sys.executable, "manage.py", "build_snapshot", "--graph", str(args.data_dir / "graph_books.dgr")], env)
+
+
+def read_locust_stats(csv_prefix):
+    """Ligne 'Aggregated' du CSV Locust -> {p50, p95, p99, rps, requests, failures}."""
+    with open(f"{csv_prefix}_stats.csv", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["Name"] == "Aggregated":
+                stats = {k: float(row[col]) for k, col in PERCENTILES.items()}
+                stats["rps"] = float(row["Requests/s"])
+                stats["requests"] = int(row["Request Count"])
+                stats["failures"] = int(row["Failure Count"])
+                return stats
+    raise RuntimeError(f"pas de ligne Aggregated dans {csv_prefix}_stats.csv")
+
+
+def run_mix(mix, args, env):
+    csv_prefix = args.results_dir / mix
+    mix_env = dict(env, BENCH_MIX=mix, BENCH_VOCAB=str(args.data_dir / "vocab.json"), BENCH_SEED=str(args.seed))
+    run(["locust", "-f", "locustfile.py", "--headless", "--only-summary",
+         "-u", str(args.users), "-r", str(args.users), "-t", args.duration,
+         "--host", args.host, "--csv", str(csv_prefix)], mix_env)
+    return read_locust_stats(csv_prefix)
+
+
+def compare(results, baseline, tolerance):
+    """Liste des régressions : latences > baseline*(1+tol) ou RPS < baseline*(1-tol)."""
+    regressions = []
+    for mix, stats in results.items():
+        ref = baseline.get(mix)
+        if not ref:
+            continue
+        for key in PERCENTILES:
+            if ref[key] and stats[key] > ref[key] * (1 + tolerance):
+                regressions.append(f"{mix}.{key}: {ref[key]:.0f} ms -> {stats[key]:.0f} ms")
+        if ref["rps"] and stats["rps"] < ref["rps"] * (1 - tolerance):
+            regressions.append(f"{mix}.rps: {ref['rps']:.1f} -> {stats['rps']:.1f}")
+        if stats["failures"]:
+            regressions.append(f"{mix}: {stats['failures']} requêtes en échec")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--vocab", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mixes", nargs="+", default=MIXES, choices=MIXES + ["all"])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", default="60s")
+    parser.add_argument("--workers", type=int, default=2, help="workers gunicorn")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--es-url", default="http://localhost:9201")
+    parser.add_argument("--data-dir", type=Path, default=HERE / "data" / "libraryBooks")
+    parser.add_argument("--results-dir", type=Path, default=HERE / "results")
+    parser.add_argument("--baseline", type=Path, default=HERE / "baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre ce run comme baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="régression tolérée (0.20 = 20%%)")
+    parser.add_argument("--skip-dataset", action="store_true", help="réutilise la base et l'index existants")
+    args = parser.parse_args()
+
+    args.data_dir = args.data_dir.resolve()
+    args.results_dir = args.results_dir.resolve()
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    args.host = f"http://127.0.0.1:{args.port}"
+
+    env = dict(os.environ,
+               ELASTICSEARCH_URL=args.es_url,
+               DAAR_DB_PATH=str(HERE / "data" / "bench.sqlite3"),
+               DAAR_GRAPH_FILE=str(HERE / "data" / "graph_books.dgr"),
+               DAAR_SNAPSHOT_FILE=str(HERE / "data" / "bench_snapshot.bin"),
+               DJANGO_SETTINGS_MODULE="daar_library.settings")
+
+    if not wait_for(args.es_url, 120):
+        sys.exit(f"[ERROR] Elasticsearch injoignable sur {args.es_url} "
+                 "(docker compose --profile bench up -d elasticsearch-bench)")
+
+    if not args.skip_dataset:
+        prepare_dataset(args, env)
+
+    server = subprocess.Popen(["gunicorn", "daar_library.wsgi:application", "--preload", "--bind", f"127.0.0.1:{args.port}",
+                               "--workers", str(args.workers)], cwd=PROJECT_DIR, env=env)
+    try:
+        if not wait_for(f"{args.host}/api/search/?q=a", 120):
+            sys.exit("[ERROR] le serveur Django n'a pas démarré")
+        results = {mix: run_mix(mix, args, env) for mix in args.mixes}
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "dataset": {"books": args.books, "words": args.words, "vocab": args.vocab, "seed": args.seed},
+        "load": {"users": args.users, "duration": args.duration, "workers": args.workers},
+        "results": results,
+    }
+    out = args.results_dir / f"bench-{time.strftime('%Y%m%dT%H%M%S')}.json"
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for mix, stats in results.items():
+        print(f"  {mix:<15} p50={stats['p50']:>6.0f}ms p95={stats['p95']:>6.0f}ms "
+              f"p99={stats['p99']:>6.0f}ms rps={stats['rps']:>7.1f} fail={stats['failures']}")
+    print(f"[DONE] résultats -> {out}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"[DONE] baseline enregistrée -> {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print("[INFO] pas de baseline : relancer avec --save-baseline pour en créer une")
+        return
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("dataset") != report["dataset"] or baseline.get("load") != report["load"]:
+        print("[WARN] dataset/charge différents de la baseline : comparaison indicative")
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if regressions:
+        print("[FAIL] régressions détectées :")
+        for line in regressions:
+            print(f"  • {line}")
+        sys.exit(1)
+    print("[OK] aucune régression par rapport à la baseline")
+
+
+if __name__ == "__main__":
+    main()
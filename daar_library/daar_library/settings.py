@@ -19,6 +19,21 @@ import os
 
 LIBRARY_PATH = os.path.join(BASE_DIR, "library")
 
+# Corpus compressé optionnel (voir library/corpus.py et la commande pack_corpus)
+CORPUS_FILE = os.path.join(BASE_DIR, "libraryBooks", "corpus.dcz")
+
+# Graphe de similarité au format binaire CSR (voir library/graph_store.py)
+GRAPH_FILE = os.environ.get("DAAR_GRAPH_FILE", os.path.join(BASE_DIR, "graph_books.dgr"))
+
+# Instantané mmap de la recherche (voir library/snapshot.py et la commande build_snapshot)
+SNAPSHOT_FILE = os.environ.get("DAAR_SNAPSHOT_FILE", os.path.join(BASE_DIR, "search_snapshot.bin"))
+
+# Index positionnel échantillonné (index_inverted_from_db --positions, library/positions.py)
+POSITIONS_FILE = os.environ.get("DAAR_POSITIONS_FILE", os.path.join(BASE_DIR, "positions.bin"))
+
+# Bitmaps des facettes langue / sujet / étagère / auteur (commande build_facets, library/facets.py)
+FACETS_FILE = os.environ.get("DAAR_FACETS_FILE", os.path.join(BASE_DIR, "facets.bin"))
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -46,11 +61,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'library.metrics.TimingMiddleware',
+    'library.compression.StreamingGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'library.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -58,6 +76,66 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'daar_library.urls'
+
+# Requêtes plus lentes que ce seuil journalisées par library.slow_queries (avec le motif)
+SLOW_QUERY_MS = int(os.environ.get("SLOW_QUERY_MS", "500"))
+
+# Profilage à la demande (library/profiling.py) : ?profile=1 pour le staff ou avec
+# l'en-tête X-Profile-Token, plus un échantillonnage aléatoire optionnel.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+
+# Garde-fou des regexp coûteuses (library/query_guard.py)
+QUERY_GUARD_ENABLED = True
+QUERY_GUARD_MODE = os.environ.get("QUERY_GUARD_MODE", "degrade")   # "degrade" | "reject"
+QUERY_GUARD_MAX_TERMS = 2000          # documents-termes ES par requête
+QUERY_GUARD_MAX_POSTINGS = 200_000    # postings (livre, compte) fusionnés par requête
+QUERY_GUARD_SAMPLE_SIZE = 5000        # échantillon du vocabulaire pour l'estimation
+ES_QUERY_TIMEOUT = "2s"
+ES_TERM_SHARDS = int(os.environ.get("ES_TERM_SHARDS", "8"))   # shards de l'index inversé (library/sharding.py)
+
+# Cache HTTP des recherches / suggestions (library/http_cache.py)
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", "60"))      # navigateur
+HTTP_CACHE_S_MAXAGE = int(os.environ.get("HTTP_CACHE_S_MAXAGE", "300"))   # proxy / CDN
+
+# Normalisation du texte, identique à l'indexation et à la requête (library/text.py).
+# Modifier ces options impose de réindexer (index_inverted_from_db).
+TEXT_NORMALIZATION = {
+    "stop_words": True,                                   # mots vides anglais + français
+    "stem": os.environ.get("DAAR_STEM", "") == "1",       # Snowball : PyStemmer ou nltk requis
+    "language": os.environ.get("DAAR_STEM_LANGUAGE", "english"),
+}
+
+# Pagination par curseur : classements gardés en mémoire par worker (library/cursors.py)
+SEARCH_CURSOR_TTL = 300               # secondes
+SEARCH_CURSOR_CACHE_SIZE = 64         # recherches classées gardées (LRU)
+
+# Regroupement des recherches identiques simultanées (library/coalesce.py). Entre workers, le
+# classement du meneur est partagé par Redis (DAAR_COALESCE_REDIS_URL, paquet `redis`) ; sans lui,
+# chaque worker regroupe seulement ses threads. Jamais la base SQLite de l'application.
+COALESCE_REDIS_URL = os.environ.get("DAAR_COALESCE_REDIS_URL", "")
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+if COALESCE_REDIS_URL:
+    CACHES["coalesce"] = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": COALESCE_REDIS_URL}
+SEARCH_COALESCE_CACHE = "coalesce" if COALESCE_REDIS_URL else ""   # alias de CACHES ; "" : par worker
+SEARCH_COALESCE_WAIT = 10.0           # secondes d'attente d'un calcul en cours avant de calculer soi-même
+SEARCH_COALESCE_LOCK_TTL = 30         # secondes ; libère le verrou d'un worker mort
+SEARCH_COALESCE_RESULT_TTL = 30       # secondes de vie d'un classement partagé (clé déjà liée à la génération)
+
+# Recherche dans un livre, /api/book_search/ (library/book_search.py)
+BOOK_SEARCH_WORKERS = int(os.environ.get("BOOK_SEARCH_WORKERS", "4"))   # threads par worker
+BOOK_SEARCH_TIMEOUT = 2.0             # secondes, résultats partiels au-delà
+BOOK_SEARCH_MAX_LIMIT = 1000          # occurrences renvoyées au plus
+
+REST_FRAMEWORK = {
+    # orjson pour toutes les vues API, NDJSON via ?format=ndjson (library/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "library.renderers.ORJSONRenderer",
+        "library.renderers.NDJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
@@ -86,7 +164,7 @@ WSGI_APPLICATION = 'daar_library.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get("DAAR_DB_PATH", BASE_DIR / 'db.sqlite3'),
     }
 }
 
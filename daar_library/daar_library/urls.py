@@ -1,12 +1,14 @@
 # daar_library/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from library.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('library.urls')),
+    re_path(r'^metrics/?$', metrics_view),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'daar_library.settings')
 
 application = get_wsgi_application()
+
+# Ouvre l'instantané mmap dès le chargement : avec `gunicorn --preload`, c'est le
+# maître qui le fait et les workers héritent du mapping au fork (pages partagées).
+from library.snapshot import get_snapshot  # noqa: E402
+
+get_snapshot()
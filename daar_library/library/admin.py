@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Book
+from .models import Book, Job
 
 admin.site.register(Book)
+admin.site.register(Job)
@@ -0,0 +1,211 @@
+"""
+Bitmaps compressés d'identifiants de livres, à la manière de Roaring.
+
+L'espace des ids (entiers >= 0) est découpé en blocs de 65 536 valeurs ; la clé
+d'un bloc est id >> 16. Chaque bloc non vide est un conteneur :
+ - « tableau » : uint16 triés des 16 bits bas (au plus ARRAY_MAX valeurs) ;
+ - « bitmap »  : 1024 mots uint64 (65 536 bits) au-delà.
+Un bloc clairsemé coûte 2 octets par id, un bloc dense 8 Ko au plus.
+
+Intersection, union et cardinalité travaillent conteneur par conteneur, en numpy :
+intersect1d pour deux tableaux, test de bits pour tableau x bitmap, ET de mots +
+popcount pour deux bitmaps. and_cardinality() compte une intersection sans la
+construire (comptage des facettes).
+
+Sérialisation (to_arrays / from_arrays) en quatre tableaux numpy : clés,
+cardinalités et débuts des conteneurs dans `data` (uint16 ; un conteneur bitmap
+fait 4096 uint16, aligné sur 8 octets), pour les ranger dans le conteneur mmap
+de library/snapshot.py et les relire sans copie.
+"""
+
+import numpy as np
+
+ARRAY_MAX = 4096          # au-delà, un conteneur tableau devient bitmap (même taille : 8 Ko)
+BITMAP_WORDS = 1024       # mots uint64 d'un conteneur bitmap
+BITMAP_UINT16 = BITMAP_WORDS * 4
+
+_popcount = getattr(np, "bitwise_count", None)   # numpy >= 2.0
+
+
+def _cardinality(container):
+    if container.dtype == np.uint16:
+        return len(container)
+    if _popcount is not None:
+        return int(_popcount(container).sum())
+    return int(np.unpackbits(container.view(np.uint8)).sum())
+
+
+def _to_bitmap(values):
+    words = np.zeros(BITMAP_WORDS, dtype=np.uint64)
+    v = values.astype(np.uint64)
+    np.bitwise_or.at(words, (v >> np.uint64(6)).astype(np.intp), np.uint64(1) << (v & np.uint64(63)))
+    return words
+
+
+def _to_values(words):
+    bits = np.unpackbits(words.view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+def _normalize(container):
+    """Forme canonique : tableau si au plus ARRAY_MAX valeurs, bitmap sinon ; None si vide."""
+    if container.dtype == np.uint16:
+        if not len(container):
+            return None
+        return container if len(container) <= ARRAY_MAX else _to_bitmap(container)
+    n = _cardinality(container)
+    if n == 0:
+        return None
+    return _to_values(container) if n <= ARRAY_MAX else container
+
+
+def _contains(container, low):
+    """Masque booléen : valeurs basses `low` (uint16) présentes dans le conteneur."""
+    if container.dtype == np.uint16:
+        pos = np.searchsorted(container, low)
+        pos[pos == len(container)] = 0
+        return container[pos] == low if len(container) else np.zeros(len(low), dtype=bool)
+    low = low.astype(np.uint64)
+    return ((container[(low >> np.uint64(6)).astype(np.intp)] >> (low & np.uint64(63))) & np.uint64(1)).astype(bool)
+
+
+def _and(a, b):
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        return np.intersect1d(a, b, assume_unique=True)
+    if a.dtype == np.uint16:
+        return a[_contains(b, a)]
+    if b.dtype == np.uint16:
+        return b[_contains(a, b)]
+    return a & b
+
+
+def _and_cardinality(a, b):
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        small, large = (a, b) if len(a) <= len(b) else (b, a)
+        return int(_contains(large, small).sum())
+    if a.dtype == np.uint16:
+        return int(_contains(b, a).sum())
+    if b.dtype == np.uint16:
+        return int(_contains(a, b).sum())
+    return _cardinality(a & b)
+
+
+def _or(a, b):
+    if a.dtype == np.uint16 and b.dtype == np.uint16 and len(a) + len(b) <= ARRAY_MAX:
+        return np.union1d(a, b)
+    a = a if a.dtype == np.uint64 else _to_bitmap(a)
+    b = b if b.dtype == np.uint64 else _to_bitmap(b)
+    return a | b
+
+
+class Bitmap:
+    """Ensemble immuable d'ids (voir le module). `keys` croissantes, un conteneur par clé."""
+
+    __slots__ = ("keys", "containers")
+
+    def __init__(self, keys=(), containers=()):
+        self.keys = list(keys)
+        self.containers = list(containers)
+
+    @classmethod
+    def from_ids(cls, ids):
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        if not len(ids):
+            return cls()
+        high = ids >> 16
+        bounds = np.flatnonzero(np.diff(high)) + 1
+        keys, containers = [], []
+        for chunk in np.split(ids, bounds):
+            keys.append(int(chunk[0] >> 16))
+            containers.append(_normalize((chunk & 0xFFFF).astype(np.uint16)))
+        return cls(keys, containers)
+
+    def __len__(self):
+        return sum(_cardinality(c) for c in self.containers)
+
+    def __bool__(self):
+        return bool(self.keys)
+
+    def __contains__(self, book_id):
+        return bool(self.contains_many(np.array([book_id], dtype=np.int64))[0])
+
+    def contains_many(self, ids):
+        """Masque booléen : présence de chaque id de `ids` (tableau numpy d'entiers)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = np.zeros(len(ids), dtype=bool)
+        high = ids >> 16
+        for key, container in zip(self.keys, self.containers):
+            where = np.flatnonzero(high == key)
+            if len(where):
+                mask[where] = _contains(container, (ids[where] & 0xFFFF).astype(np.uint16))
+        return mask
+
+    def _pairs(self, other):
+        """(conteneur de self, conteneur de other) pour chaque clé commune."""
+        j = 0
+        for i, key in enumerate(self.keys):
+            while j < len(other.keys) and other.keys[j] < key:
+                j += 1
+            if j < len(other.keys) and other.keys[j] == key:
+                yield key, self.containers[i], other.containers[j]
+
+    def __and__(self, other):
+        keys, containers = [], []
+        for key, a, b in self._pairs(other):
+            container = _normalize(_and(a, b))
+            if container is not None:
+                keys.append(key)
+                containers.append(container)
+        return Bitmap(keys, containers)
+
+    def and_cardinality(self, other):
+        """len(self & other) sans construire l'intersection."""
+        return sum(_and_cardinality(a, b) for _, a, b in self._pairs(other))
+
+    def __or__(self, other):
+        merged = dict(zip(self.keys, self.containers))
+        for key, container in zip(other.keys, other.containers):
+            merged[key] = _normalize(_or(merged[key], container)) if key in merged else container
+        keys = sorted(merged)
+        return Bitmap(keys, [merged[key] for key in keys])
+
+    def to_array(self):
+        """Ids triés (int64)."""
+        parts = [(np.int64(key) << 16) + (c if c.dtype == np.uint16 else _to_values(c)).astype(np.int64)
+                 for key, c in zip(self.keys, self.containers)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    # Sérialisation
+    # ------------------------------------------------------------------
+    def to_arrays(self):
+        """
+        (clés int64, cardinalités uint32, débuts uint64 des conteneurs dans data, data uint16).
+        Cardinalité > ARRAY_MAX : conteneur bitmap (4096 uint16, début aligné sur 8 octets).
+        """
+        cards, starts, chunks, size = [], [], [], 0
+        for container in self.containers:
+            cards.append(_cardinality(container))
+            if container.dtype == np.uint64:
+                pad = -size % 4   # lecture sans copie : vue uint64 alignée
+                if pad:
+                    chunks.append(np.zeros(pad, dtype=np.uint16))
+                    size += pad
+                container = container.view(np.uint16)
+            starts.append(size)
+            chunks.append(container)
+            size += len(container)
+        data = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint16)
+        return (np.array(self.keys, dtype=np.int64), np.array(cards, dtype=np.uint32),
+                np.array(starts, dtype=np.uint64), data)
+
+    @classmethod
+    def from_arrays(cls, keys, cards, starts, data):
+        """Inverse de to_arrays ; les conteneurs sont des vues sur `data` (mmap)."""
+        containers = []
+        for start, card in zip(starts.tolist(), cards.tolist()):
+            if card > ARRAY_MAX:
+                containers.append(data[start:start + BITMAP_UINT16].view(np.uint64))
+            else:
+                containers.append(data[start:start + card])
+        return cls(keys.tolist(), containers)
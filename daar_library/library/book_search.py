@@ -0,0 +1,268 @@
+"""
+Recherche d'un motif (regex Python) à l'intérieur d'un livre : /api/book_search/?id=&q=.
+
+Le texte est lu là où il est stocké, sans le charger en entier :
+ - livre du corpus compressé : plages d'octets (CorpusReader.read_range), offsets en octets,
+   directement utilisables dans un en-tête Range de /api/book_content/ ;
+ - sinon : Book.text_content, offsets en caractères.
+
+Le texte est découpé en segments de SEGMENT_SIZE (un bloc zstd du corpus). Chaque
+segment est lu avec LOOKBEHIND de contexte avant (\\b, assertions arrière) et
+OVERLAP après : une occurrence qui commence dans le segment et déborde sur le
+suivant est trouvée en entier. Une occurrence appartient au segment où elle
+commence ; à la fusion, celles qui chevauchent l'occurrence précédente sont
+écartées (même résultat qu'un finditer séquentiel, sauf cas limites aux bords).
+
+Le moteur `re` ne peut pas être interrompu pendant un appariement : l'échéance
+n'est vérifiée qu'entre deux occurrences. Le motif est donc refusé s'il peut
+backtracker de façon exponentielle ou polynomiale de degré > 2 (quantificateurs
+imbriqués, alternatives quantifiées, références arrière, plus de MAX_UNBOUNDED
+quantificateur non borné : query_guard.unsafe_regex), et chaque appel finditer
+ne voit que SCAN_STEP + OVERLAP caractères : un motif quadratique ([\\s\\S]*x)
+dépasse l'échéance d'une fraction de seconde au plus.
+
+La regex s'exécute dans le thread de la requête : `re` garde le GIL, des threads
+n'apparieraient pas plus vite. Au-delà de PARALLEL_SEGMENTS segments, le pool de
+threads du worker lit et décompresse à l'avance (au plus BOOK_SEARCH_WORKERS
+segments ; zstd et pread libèrent le GIL) les segments d'un livre du corpus
+pendant que le thread de la requête balaie le précédent. Dès que `limit`
+occurrences sont réunies, ou au bout de `timeout`, la lecture s'arrête et la
+réponse est marquée truncated / timed_out (timed_out : le texte n'a pas été
+balayé en entier dans le délai).
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db.models.functions import Length, Substr
+
+from library.corpus import CHUNK_SIZE
+from library.models import Book
+from library.query_guard import unsafe_regex
+
+SEGMENT_SIZE = CHUNK_SIZE     # unités (octets ou caractères) par segment
+OVERLAP = 4096                # lu après le segment : occurrence qui déborde + contexte droit
+SCAN_STEP = 4096              # caractères dont les occurrences sont cherchées par un même appel finditer
+LOOKBEHIND = 256              # lu avant le segment : contexte gauche et assertions arrière
+CONTEXT = 80                  # caractères de contexte renvoyés de chaque côté
+MAX_MATCH = 1024              # caractères renvoyés pour l'occurrence elle-même
+MAX_PATTERN = 256             # longueur maximale du motif
+MAX_UNBOUNDED = 1             # quantificateurs non bornés (*, +, {n,}) par motif
+PARALLEL_SEGMENTS = 4         # en dessous : lecture séquentielle dans le thread de la requête
+DEFAULT_LIMIT = 100
+
+
+class BookSearchError(Exception):
+    pass
+
+
+def compile_pattern(q):
+    """
+    Regex insensible à la casse ; BookSearchError si elle est vide, trop longue,
+    invalide ou exposée au backtracking catastrophique.
+    """
+    if not q:
+        raise BookSearchError("q parameter is required")
+    if len(q) > MAX_PATTERN:
+        raise BookSearchError(f"Pattern too long (max {MAX_PATTERN} characters)")
+    try:
+        compiled = re.compile(q, re.IGNORECASE)
+    except re.error as exc:
+        raise BookSearchError(f"Invalid regex: {exc}")
+    reason = unsafe_regex(q, max_length=MAX_PATTERN, max_unbounded=MAX_UNBOUNDED)
+    if reason:
+        raise BookSearchError(f"Pattern rejected: {reason}")
+    return compiled
+
+
+def _skip_continuation(data):
+    """Nombre d'octets de suite UTF-8 en tête de `data` (caractère coupé par la plage)."""
+    skip = 0
+    while skip < min(len(data), 3) and data[skip] & 0xC0 == 0x80:
+        skip += 1
+    return skip
+
+
+class CorpusText:
+    """Texte d'un livre du corpus compressé, offsets en octets."""
+
+    unit = "bytes"
+    parallel = True   # CorpusReader lit par pread : sûr depuis plusieurs threads
+
+    def __init__(self, corpus, key):
+        self.corpus = corpus
+        self.key = key
+        self.size = corpus.size(key)
+
+    def window(self, lo, start, hi):
+        """
+        (texte, pos, base) : texte décodé des octets [lo, hi), pos = indice du
+        premier caractère commençant à partir de `start`, base = son offset en octets.
+        """
+        data = self.corpus.read_range(self.key, lo, hi)
+        head, body = data[:start - lo], data[start - lo:]
+        head = head[_skip_continuation(head):].decode("utf-8", "ignore")
+        skip = _skip_continuation(body)
+        return head + body[skip:].decode("utf-8", "ignore"), len(head), start + skip
+
+    @staticmethod
+    def measure(text):
+        return len(text.encode("utf-8"))
+
+
+class DatabaseText:
+    """Texte d'un livre lu dans Book.text_content par SUBSTR SQL, offsets en caractères."""
+
+    unit = "chars"
+    parallel = False  # connexions Django propres à chaque thread : balayage séquentiel
+
+    def __init__(self, book_id, size):
+        self.book_id = book_id
+        self.size = size
+
+    def window(self, lo, start, hi):
+        row = Book.objects.filter(id=self.book_id).values(w=Substr("text_content", lo + 1, hi - lo)).first()
+        return (row["w"] or "") if row else "", start - lo, start
+
+    measure = staticmethod(len)
+
+
+def book_text(book, corpus=None):
+    """Source du texte de `book` (CorpusText ou DatabaseText), None s'il n'a pas de texte."""
+    if corpus is not None and book.gutenberg_id is not None and book.gutenberg_id in corpus:
+        return CorpusText(corpus, book.gutenberg_id)
+    size = Book.objects.filter(id=book.id).values_list(Length("text_content"), flat=True).first()
+    return DatabaseText(book.id, size) if size else None
+
+
+def read_segment(source, start, end):
+    """Fenêtre (texte, pos, base) du segment [start, end), contexte compris (voir CorpusText.window)."""
+    return source.window(max(0, start - LOOKBEHIND), start, min(source.size, end + OVERLAP))
+
+
+def scan_window(source, window, end, compiled, limit, deadline):
+    """
+    (occurrences, complet) : occurrences commençant dans la fenêtre avant `end`, au
+    plus `limit` ; complet vaut False si `deadline` est passée avant la fin du segment.
+    Chaque occurrence est {"offset", "length", "match", "left", "right"} (offset / length dans source.unit).
+    """
+    text, pos, base = window
+    # un caractère occupe au moins une unité : aucun ne commence dans le segment au-delà de stop
+    stop = min(len(text), pos + end - base)
+    matches = []
+    last_index, last_offset, resume = pos, base, pos
+    for piece in range(pos, stop, SCAN_STEP):
+        if time.monotonic() > deadline:
+            return matches, False
+        # appariement borné à SCAN_STEP + OVERLAP caractères : durée d'un appel finditer bornée
+        for m in compiled.finditer(text, max(piece, resume), min(len(text), piece + SCAN_STEP + OVERLAP)):
+            if m.start() >= piece + SCAN_STEP:
+                break   # commence dans le morceau suivant
+            if len(matches) >= limit:
+                return matches, True
+            if time.monotonic() > deadline:
+                return matches, False
+            offset = last_offset + source.measure(text[last_index:m.start()])
+            if offset >= end:
+                return matches, True
+            last_index, last_offset, resume = m.start(), offset, m.end()
+            if m.end() == m.start():
+                continue   # motif vide (x*) : aucune occurrence utile
+            matches.append({
+                "offset": offset,
+                "length": source.measure(m.group()),
+                "match": m.group()[:MAX_MATCH],
+                "left": text[max(0, m.start() - CONTEXT):m.start()],
+                "right": text[m.end():m.end() + CONTEXT],
+            })
+    return matches, True
+
+
+def scan_segment(source, start, end, compiled, limit, deadline):
+    """scan_window sur le segment [start, end) lu dans le thread appelant."""
+    return scan_window(source, read_segment(source, start, end), end, compiled, limit, deadline)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool de threads du worker (lectures anticipées), créé à la première recherche parallèle."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix="book-search")
+    return _executor
+
+
+def workers():
+    return getattr(settings, "BOOK_SEARCH_WORKERS", 4)
+
+
+def prefetched_windows(source, bounds, deadline):
+    """
+    Fenêtres des segments `bounds`, dans l'ordre, lues par le pool au plus workers()
+    segments à l'avance. Lève FutureTimeout si une lecture dépasse `deadline`.
+    """
+    pool, ahead = get_executor(), {}
+    try:
+        for i in range(len(bounds)):
+            for j in range(i, min(len(bounds), i + workers())):
+                if j not in ahead:
+                    ahead[j] = pool.submit(read_segment, source, *bounds[j])
+            window = ahead[i].result(timeout=max(0.0, deadline - time.monotonic()))
+            del ahead[i]
+            yield window
+    finally:
+        for future in ahead.values():
+            future.cancel()
+
+
+def search_book(source, compiled, limit=DEFAULT_LIMIT, timeout=None):
+    """
+    {"unit", "size", "matches", "truncated", "timed_out", "segments"} : les `limit`
+    premières occurrences de `compiled` dans `source`, dans l'ordre du texte.
+    """
+    timeout = timeout if timeout is not None else getattr(settings, "BOOK_SEARCH_TIMEOUT", 2.0)
+    deadline = time.monotonic() + timeout
+    bounds = [(s, min(s + SEGMENT_SIZE, source.size)) for s in range(0, source.size, SEGMENT_SIZE)]
+
+    if not source.parallel or len(bounds) <= PARALLEL_SEGMENTS:
+        windows = (read_segment(source, s, e) for s, e in bounds)
+    else:
+        windows = prefetched_windows(source, bounds, deadline)
+
+    matches, truncated, timed_out = [], False, False
+    try:
+        for (_, end), window in zip(bounds, windows):
+            # +1 : détecte la troncature dans un seul segment
+            segment, complete = scan_window(source, window, end, compiled, limit + 1, deadline)
+            for match in segment:
+                if matches and match["offset"] < matches[-1]["offset"] + matches[-1]["length"]:
+                    continue   # chevauche l'occurrence précédente (bord de segment)
+                if len(matches) == limit:
+                    truncated = True
+                    break
+                matches.append(match)
+            if truncated:
+                break
+            if not complete or (end < source.size and time.monotonic() > deadline):
+                timed_out = True
+                break
+    except FutureTimeout:
+        timed_out = True
+    finally:
+        windows.close()
+    return {
+        "unit": source.unit,
+        "size": source.size,
+        "segments": len(bounds),
+        "matches": matches,
+        "truncated": truncated,
+        "timed_out": timed_out,
+    }
@@ -0,0 +1,37 @@
+"""
+Manifeste des changements écrit par `download_gutendex.py --sync` (changes.json) :
+
+    {"generated_at": "...", "added": [gutenberg_id, ...], "updated": [gutenberg_id, ...]}
+
+Lu par `import_books_withImage --manifest` (n'importe que ces livres) puis par
+`index_inverted_from_db --manifest` (mise à jour incrémentale de l'index ES),
+qui le marque appliqué (renommé en <nom>.applied) une fois l'index à jour :
+la synchronisation suivante repart d'un manifeste vide.
+"""
+
+import json
+from pathlib import Path
+
+
+class ManifestError(Exception):
+    pass
+
+
+def read_manifest(path):
+    """{"added": set, "updated": set} des identifiants Gutenberg du manifeste."""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return {kind: {int(i) for i in data.get(kind, [])} for kind in ("added", "updated")}
+    except FileNotFoundError:
+        raise ManifestError(f"{path} introuvable")
+    except (ValueError, TypeError, AttributeError) as exc:
+        raise ManifestError(f"{path} : manifeste invalide ({exc})")
+
+
+def changed_ids(manifest):
+    return manifest["added"] | manifest["updated"]
+
+
+def mark_applied(path):
+    path = Path(path)
+    path.replace(path.with_name(path.name + ".applied"))
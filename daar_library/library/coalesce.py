@@ -0,0 +1,152 @@
+"""
+Regroupement (« single flight ») des recherches identiques simultanées.
+
+Quand une requête populaire (q=love) arrive de nombreux clients en même temps,
+par exemple juste après une réindexation qui a changé tous les result set ids,
+chaque requête lancerait sa propre recherche ES de 10 000 documents-termes et sa
+propre fusion Python. Ici, un seul calcul par clé est en cours :
+
+ - dans un worker : le premier thread (meneur) calcule, les suivants attendent
+   son Future et partagent son résultat (ou son exception) ;
+ - entre workers gunicorn, si un cache partagé est configuré
+   (SEARCH_COALESCE_CACHE, Redis en pratique) : le meneur d'un worker prend un
+   verrou court (cache.add, atomique), calcule et dépose son résultat pour
+   SEARCH_COALESCE_RESULT_TTL secondes ; les meneurs des autres workers lisent
+   ce résultat au lieu de recalculer. Si le verrou disparaît sans résultat
+   (meneur en erreur ou mort), ils calculent eux-mêmes.
+
+Un cache en base (DatabaseCache) est ignoré : un classement complet picklé
+(~1 Mo) écrit dans la base SQLite de l'application à chaque recherche y
+sérialiserait les écritures ("database is locked" sous charge). Sans cache
+partagé utilisable, chaque worker regroupe seulement ses propres threads.
+
+Une attente dure au plus SEARCH_COALESCE_WAIT secondes ; au-delà, la requête
+calcule elle-même. Le verrou expire de lui-même (SEARCH_COALESCE_LOCK_TTL) si son
+worker meurt.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.backends.db import DatabaseCache
+
+from library.metrics import annotate
+
+POLL_INTERVAL = 0.05   # secondes entre deux lectures du cache partagé
+KEY_PREFIX = "coalesce"
+
+
+def coalesce_wait():
+    return getattr(settings, "SEARCH_COALESCE_WAIT", 10.0)
+
+
+class SingleFlight:
+    """Un calcul en cours par clé dans le processus ; les autres appelants attendent son Future."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # clé -> Future du meneur
+
+    def do(self, key, compute):
+        """(résultat, partagé) : partagé vaut True si le résultat vient d'un autre thread."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            try:
+                return future.result(timeout=coalesce_wait()), True
+            except FutureTimeout:
+                return compute(), False
+        try:
+            result = compute()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_flights = SingleFlight()
+
+
+def shared_cache():
+    """Cache Django partagé par les workers, ou None s'il n'est pas configuré (ou en base)."""
+    alias = getattr(settings, "SEARCH_COALESCE_CACHE", None)
+    if not alias:
+        return None
+    try:
+        cache = caches[alias]
+    except InvalidCacheBackendError:
+        return None
+    return None if isinstance(cache, DatabaseCache) else cache
+
+
+def across_workers(key, compute):
+    """
+    compute() pour `key`, ou le résultat qu'un autre worker vient de calculer
+    (déposé dans le cache partagé, attendu pendant son calcul).
+    """
+    cache = shared_cache()
+    if cache is None:
+        return compute()
+    lock_key, result_key = f"{KEY_PREFIX}:lock:{key}", f"{KEY_PREFIX}:result:{key}"
+    token = uuid.uuid4().hex
+    try:
+        result = cache.get(result_key)
+        if result is not None:
+            annotate(coalesced="worker")
+            return result
+        leader = cache.add(lock_key, token, getattr(settings, "SEARCH_COALESCE_LOCK_TTL", 30))
+    except Exception:   # cache partagé injoignable : chaque worker calcule
+        return compute()
+
+    if not leader:
+        deadline = time.monotonic() + coalesce_wait()
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                result = cache.get(result_key)
+                if result is not None:
+                    annotate(coalesced="worker")
+                    return result
+                if cache.get(lock_key) is None:
+                    break   # meneur en erreur ou mort : pas de résultat à attendre
+        except Exception:
+            pass
+        return compute()
+
+    try:
+        result = compute()
+        try:
+            cache.set(result_key, result, getattr(settings, "SEARCH_COALESCE_RESULT_TTL", 30))
+        except Exception:
+            pass
+        return result
+    finally:
+        try:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        except Exception:
+            pass
+
+
+def coalesced(key, compute):
+    """
+    Résultat de compute() pour `key`, calculé une seule fois par les requêtes
+    simultanées du worker (et partagé avec les autres workers via le cache partagé).
+    """
+    result, shared = _flights.do(key, lambda: across_workers(key, compute))
+    if shared:
+        annotate(coalesced="thread")
+    return result
@@ -0,0 +1,102 @@
+"""
+Autocomplétion : index de préfixes du vocabulaire, en mémoire, sans ES à la requête.
+
+Le vocabulaire est un tableau trié ; les termes commençant par un préfixe forment
+une plage contiguë [lo, hi) trouvée par deux bisect. Les N termes de plus forte
+fréquence documentaire (nombre de livres = nombre de résultats d'une recherche
+sur ce terme) sont pris dans la plage avec numpy.argpartition. Les préfixes très
+courts couvrent une grande partie du vocabulaire : leur top-N est mémorisé.
+
+Source : l'instantané mmap (library/snapshot.py) s'il existe, sinon un scan
+unique de l'index ES (term, n_books) au premier appel du processus.
+"""
+
+import bisect
+import threading
+
+import numpy as np
+
+WIDE_RANGE = 4096      # au-delà, le résultat d'un préfixe est mémorisé
+MAX_CACHED = 4096
+
+
+class PrefixIndex:
+    def __init__(self, terms, hits):
+        """terms : liste triée de termes uniques ; hits : nb de livres par terme."""
+        self.terms = terms
+        self.hits = np.asarray(hits, dtype=np.int64)
+        self._cache = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        offsets = snapshot.arrays["post_offsets"]
+        return cls(list(snapshot.terms()), np.diff(offsets))
+
+    @classmethod
+    def from_es(cls, es, index):
+        from elasticsearch import helpers
+        hits = {}
+        for hit in helpers.scan(es, index=index, query={"query": {"match_all": {}}}, _source=["term", "n_books"]):
+            src = hit["_source"]
+            hits[src["term"]] = hits.get(src["term"], 0) + src.get("n_books", 0)   # somme des parts
+        terms = sorted(hits)
+        return cls(terms, [hits[t] for t in terms])
+
+    def prefix_range(self, prefix):
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def complete(self, prefix, limit=10):
+        """[(terme, hits), ...] : les `limit` termes du préfixe les plus fréquents."""
+        lo, hi = self.prefix_range(prefix)
+        if hi - lo > WIDE_RANGE:
+            key = (prefix, limit)
+            cached = self._cache.get(key)
+            if cached is None:
+                cached = self._top(lo, hi, limit)
+                if len(self._cache) < MAX_CACHED:
+                    self._cache[key] = cached
+            return cached
+        return self._top(lo, hi, limit)
+
+    def _top(self, lo, hi, limit):
+        window = self.hits[lo:hi]
+        if len(window) > limit:
+            # limit-ième plus grande valeur ; à égalité, les premiers termes alphabétiques
+            kth = np.partition(window, len(window) - limit)[len(window) - limit]
+            above = np.flatnonzero(window > kth)
+            ties = np.flatnonzero(window == kth)[:limit - len(above)]
+            picked = np.concatenate([above, ties])
+        else:
+            picked = np.arange(len(window))
+        # tri par fréquence décroissante puis ordre alphabétique
+        order = sorted(picked.tolist(), key=lambda i: (-int(window[i]), i))
+        return [(self.terms[lo + i], int(window[i])) for i in order]
+
+
+_lock = threading.Lock()
+_current = (None, None)   # (PrefixIndex, instantané qui a servi à le construire) : remplacé d'un bloc
+
+
+def get_prefix_index():
+    """PrefixIndex du processus ; None si ni instantané ni ES ne sont disponibles."""
+    global _current
+    from library.snapshot import get_snapshot
+    snapshot = get_snapshot()
+    index, source = _current
+    if index is not None and (snapshot is None or snapshot is source):
+        return index
+    with _lock:
+        index, source = _current
+        if index is None or (snapshot is not None and snapshot is not source):
+            if snapshot is not None:
+                index, source = PrefixIndex.from_snapshot(snapshot), snapshot
+            else:
+                from library.elasticsearch_client import es, INDEX_NAME
+                try:
+                    index = PrefixIndex.from_es(es, INDEX_NAME)
+                except Exception:
+                    return None
+            _current = (index, source)
+    return index
@@ -0,0 +1,52 @@
+"""
+Compression gzip compatible avec les réponses streamées.
+
+La GZipMiddleware de Django compresse aussi les StreamingHttpResponse, mais sans
+vider le compresseur entre deux morceaux : les premières lignes NDJSON restent
+dans le tampon zlib jusqu'à ce qu'il soit plein, et le client ne reçoit rien.
+Ici chaque morceau produit par la vue est suivi d'un Z_SYNC_FLUSH : ce qui a été
+généré part immédiatement (quelques octets de surcoût par morceau).
+
+Ne sont pas compressés : les réponses 206 / avec Accept-Ranges (les plages portent
+sur les octets non compressés, voir book_content) et celles déjà encodées.
+Les réponses non streamées sont déléguées à la GZipMiddleware de Django.
+"""
+
+import zlib
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+_accepts_gzip_re = _lazy_re_compile(r"\bgzip\b")
+
+
+def _flushing_gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits=31 : en-tête gzip
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush(zlib.Z_FINISH)
+
+
+class StreamingGZipMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.status_code == 206 or response.has_header("Accept-Ranges"):
+            return response
+        if not response.streaming or response.is_async:
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if response.has_header("Content-Encoding"):
+            return response
+        if not _accepts_gzip_re.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            return response
+
+        response.streaming_content = _flushing_gzip(response.streaming_content)
+        del response["Content-Length"]   # la longueur compressée n'est pas connue à l'avance
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag   # représentation différente : ETag faible
+        response.headers["Content-Encoding"] = "gzip"
+        return response
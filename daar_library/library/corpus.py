@@ -0,0 +1,162 @@
+"""
+Conteneur de corpus compressé (zstd) avec accès aléatoire.
+
+Un seul fichier remplace les milliers de `<id>.txt` de libraryBooks :
+
+    [en-tête 24 o][frames zstd ...][index JSON compressé]
+
+    en-tête : MAGIC (8 o) | version (u32) | nb livres (u32) | offset de l'index (u64)
+
+Chaque livre est découpé en blocs de CHUNK_SIZE octets (UTF-8 non compressé),
+chaque bloc est une frame zstd indépendante. L'index donne, par livre, la taille
+totale et la liste (offset, taille compressée) de ses frames : lire une plage
+d'octets ne décompresse que les frames concernées.
+
+Dépendance optionnelle : `pip install zstandard`.
+"""
+
+import codecs
+import json
+import os
+import struct
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # le corpus est optionnel, les .txt restent utilisables
+    zstandard = None
+
+MAGIC = b"DAARCORP"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+CHUNK_SIZE = 256 * 1024   # taille d'un bloc non compressé
+LEVEL = 10                # niveau zstd (compression faite une seule fois)
+
+
+class CorpusError(Exception):
+    pass
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise CorpusError("Le module 'zstandard' est requis pour le corpus compressé (pip install zstandard)")
+
+
+class CorpusWriter:
+    """
+    Écrit un corpus : `add(key, text)` pour chaque livre puis `close()`.
+    Le fichier est écrit dans `<path>.tmp` puis renommé (publication atomique).
+    """
+
+    def __init__(self, path, level=LEVEL):
+        _require_zstd()
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.fh = self.tmp_path.open("wb")
+        self.fh.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.index = {}
+
+    def add(self, key, text):
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        chunks = []
+        for i in range(0, len(data), CHUNK_SIZE):
+            frame = self.compressor.compress(data[i:i + CHUNK_SIZE])
+            chunks.append([self.fh.tell(), len(frame)])
+            self.fh.write(frame)
+        self.index[str(key)] = {"size": len(data), "chunks": chunks}
+
+    def close(self):
+        index_offset = self.fh.tell()
+        self.fh.write(self.compressor.compress(json.dumps(self.index).encode("utf-8")))
+        self.fh.seek(0)
+        self.fh.write(HEADER.pack(MAGIC, VERSION, len(self.index), index_offset))
+        self.fh.close()
+        self.tmp_path.replace(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fh.close()
+            self.tmp_path.unlink(missing_ok=True)
+
+
+class CorpusReader:
+    """
+    Lecture d'un corpus : texte complet, flux de blocs ou plage d'octets d'un livre.
+    Seul l'index est chargé en mémoire à l'ouverture.
+    """
+
+    def __init__(self, path):
+        _require_zstd()
+        self.path = Path(path)
+        self.fh = self.path.open("rb")
+        magic, version, count, index_offset = HEADER.unpack(self.fh.read(HEADER.size))
+        if magic != MAGIC:
+            raise CorpusError(f"{self.path} n'est pas un corpus DAAR")
+        if version != VERSION:
+            raise CorpusError(f"Version de corpus {version} non supportée (attendu {VERSION})")
+        self.fh.seek(index_offset)
+        self.index = json.loads(zstandard.ZstdDecompressor().decompress(self.fh.read()))
+        self.fd = self.fh.fileno()
+
+    def __contains__(self, key):
+        return str(key) in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def size(self, key):
+        return self.index[str(key)]["size"]
+
+    def _frame(self, offset, length):
+        # pread : pas de position partagée, lecture sûre depuis plusieurs threads
+        frame = os.pread(self.fd, length, offset)
+        return zstandard.ZstdDecompressor().decompress(frame)
+
+    def iter_chunks(self, key):
+        """Blocs d'octets UTF-8 successifs du livre (au plus CHUNK_SIZE chacun)."""
+        for offset, length in self.index[str(key)]["chunks"]:
+            yield self._frame(offset, length)
+
+    def iter_text(self, key):
+        """
+        Comme iter_chunks mais décodé en str ; un caractère multi-octets coupé
+        en fin de bloc est reporté sur le bloc suivant.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        for chunk in self.iter_chunks(key):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def read_text(self, key):
+        return b"".join(self.iter_chunks(key)).decode("utf-8", errors="ignore")
+
+    def read_range(self, key, start, end):
+        """Octets [start, end) du livre ; ne décompresse que les blocs concernés."""
+        entry = self.index[str(key)]
+        start = max(0, start)
+        end = min(entry["size"], end)
+        if start >= end:
+            return b""
+        first, last = start // CHUNK_SIZE, (end - 1) // CHUNK_SIZE
+        data = b"".join(self._frame(off, ln) for off, ln in entry["chunks"][first:last + 1])
+        base = first * CHUNK_SIZE
+        return data[start - base:end - base]
+
+    def close(self):
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,118 @@
+"""
+Pagination par curseur (keyset) des recherches.
+
+Un résultat de recherche est identifié par son « result set id » : hash du motif,
+du mode (regex ou non), des filtres de facettes et de la génération de l'index ES
+(library/http_cache.py).
+Le classement complet [(book_id, score), ...] trié par (score décroissant,
+book_id croissant) est gardé quelques minutes en mémoire (RankedList, LRU + TTL).
+
+Le curseur renvoyé dans "next_cursor" est opaque et signé (django.core.signing) :
+il contient le result set id et la dernière clé (score, book_id) de la page.
+La page suivante est :
+ - lue dans la liste classée en mémoire si elle y est encore : deux recherches
+   dichotomiques + une tranche, O(log n + size) quelle que soit la profondeur ;
+ - sinon recalculée (autre worker, liste expirée) puis reprise juste après la
+   clé du curseur : le classement est total, la suite reste cohérente.
+Si l'index a été reconstruit depuis, le result set id ne correspond plus :
+CursorExpired (HTTP 410), le client recommence à la première page.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core import signing
+
+CURSOR_SALT = "library.cursors"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(Exception):
+    pass
+
+
+class RankedList:
+    """Classement complet d'une recherche, stocké en deux tableaux numpy."""
+
+    __slots__ = ("ids", "neg_scores")
+
+    def __init__(self, sorted_books):
+        """sorted_books : [(book_id, score), ...] triés par (-score, book_id)."""
+        self.ids = np.array([bid for bid, _ in sorted_books], dtype=np.int64)
+        # scores négatifs : tableau croissant, utilisable par searchsorted
+        self.neg_scores = -np.asarray([score for _, score in sorted_books])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position_after(self, score, book_id):
+        """Indice du premier livre classé strictement après la clé (score, book_id)."""
+        lo = int(np.searchsorted(self.neg_scores, -score, side="left"))
+        hi = int(np.searchsorted(self.neg_scores, -score, side="right"))
+        return lo + int(np.searchsorted(self.ids[lo:hi], book_id, side="right"))
+
+    def slice(self, start, size):
+        ids = self.ids[start:start + size].tolist()
+        scores = (-self.neg_scores[start:start + size]).tolist()
+        return list(zip(ids, scores))
+
+
+_lock = threading.Lock()
+_lists = OrderedDict()   # result set id -> (expiration, RankedList)
+
+
+def cursor_ttl():
+    return getattr(settings, "SEARCH_CURSOR_TTL", 300)
+
+
+def result_set_id(pattern, regex, scope=""):
+    """`scope` : autres paramètres qui changent le résultat (filtres de facettes, library/facets.py)."""
+    from library.http_cache import index_generation
+    key = f"{pattern}\n{int(bool(regex))}\n{index_generation()}\n{scope}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_ranked(rs_id):
+    with _lock:
+        entry = _lists.get(rs_id)
+        if entry is None:
+            return None
+        expires, ranked = entry
+        if expires < time.monotonic():
+            del _lists[rs_id]
+            return None
+        _lists.move_to_end(rs_id)
+        return ranked
+
+
+def put_ranked(rs_id, ranked):
+    with _lock:
+        _lists[rs_id] = (time.monotonic() + cursor_ttl(), ranked)
+        _lists.move_to_end(rs_id)
+        while len(_lists) > getattr(settings, "SEARCH_CURSOR_CACHE_SIZE", 64):
+            _lists.popitem(last=False)
+
+
+def encode_cursor(rs_id, book_id, score):
+    return signing.dumps({"r": rs_id, "b": book_id, "s": score}, salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor, rs_id):
+    """Clé (score, book_id) du curseur ; lève InvalidCursor ou CursorExpired."""
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+        cursor_rs_id, book_id, score = payload["r"], int(payload["b"]), payload["s"]
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor("Curseur invalide")
+    if not isinstance(score, (int, float)):
+        raise InvalidCursor("Curseur invalide")
+    if cursor_rs_id != rs_id:
+        raise CursorExpired("Curseur expiré (index reconstruit ou autre recherche) : reprendre à la première page")
+    return score, book_id
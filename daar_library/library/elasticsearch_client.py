@@ -1,7 +1,10 @@
+import os
 from elasticsearch import Elasticsearch
 
+ES_URL = os.environ.get("ELASTICSEARCH_URL", "http://elasticsearch1:9200")
+
 es = Elasticsearch(
-    hosts=["http://elasticsearch1:9200"],
+    hosts=[ES_URL],
     request_timeout=60,   # augmente le timeout
     retry_on_timeout=True,
     max_retries=10,
@@ -0,0 +1,201 @@
+"""
+Facettes des livres (langue, sujet, étagère, auteur) indexées en bitmaps compressés.
+
+Les valeurs viennent de metadata.json (download_gutendex.py), rangées par
+import_books_withImage dans Book.languages / subjects / bookshelves / authors.
+La commande `build_facets` écrit settings.FACETS_FILE (conteneur mmap de
+library/snapshot.py, meta kind=facets) :
+    vocab_bytes / vocab_offsets     "<facette>:<valeur>" triés
+    value_ptr                       conteneurs de la valeur i : [value_ptr[i], value_ptr[i+1])
+    keys / cards / starts / data    conteneurs des bitmaps (library/bitmaps.py)
+    book_ids                        livres indexés
+
+À la recherche (?language=en&subject=...&author=..., valeurs répétables) :
+OU des valeurs d'une facette, ET entre facettes ; le bitmap obtenu est intersecté
+avec les livres candidats avant le classement et l'hydratation. Avec facets=true,
+la réponse porte pour chaque facette les FACET_LIMIT valeurs les plus fréquentes
+parmi les résultats, comptées par cardinalité d'intersection de bitmaps. Les
+valeurs sont parcourues par cardinalité totale décroissante : le parcours
+s'arrête dès qu'aucune valeur restante ne peut entrer dans le top.
+"""
+
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from library.bitmaps import Bitmap
+from library.published import Published
+from library.snapshot import Snapshot, SnapshotError, SnapshotWriter
+
+# paramètre de requête -> champ de Book
+FACETS = {
+    "language": "languages",
+    "subject": "subjects",
+    "bookshelf": "bookshelves",
+    "author": "authors",
+}
+FACET_LIMIT = 10   # valeurs renvoyées par facette
+
+
+class FacetsUnavailable(Exception):
+    pass
+
+
+class FacetsWriter:
+    """add_book() pour chaque livre puis write(path) (publication atomique)."""
+
+    def __init__(self):
+        self.book_ids = []
+        self.postings = defaultdict(list)   # "<facette>:<valeur>" -> ids
+
+    def add_book(self, book_id, values):
+        """values : {facette: [valeurs]} (facettes de FACETS)."""
+        self.book_ids.append(int(book_id))
+        for facet, facet_values in values.items():
+            for value in set(facet_values or ()):
+                if value:
+                    self.postings[f"{facet}:{value}"].append(int(book_id))
+
+    def write(self, path, meta=None):
+        vocab = sorted(self.postings)
+        keys, cards, starts, chunks = [], [], [], []
+        value_ptr = np.zeros(len(vocab) + 1, dtype=np.uint64)
+        size = 0
+        for i, name in enumerate(vocab):
+            k, c, s, data = Bitmap.from_ids(self.postings[name]).to_arrays()
+            pad = -size % 4   # garde l'alignement 8 octets des conteneurs bitmap
+            if pad:
+                chunks.append(np.zeros(pad, dtype=np.uint16))
+                size += pad
+            keys.append(k)
+            cards.append(c)
+            starts.append(s + np.uint64(size))
+            chunks.append(data)
+            size += len(data)
+            value_ptr[i + 1] = value_ptr[i] + len(k)
+
+        def concat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        writer = SnapshotWriter(dict(meta or {}, kind="facets", built_at=time.time(), n_books=len(self.book_ids)))
+        writer.add_strings("vocab", vocab)
+        writer.add_array("value_ptr", value_ptr)
+        writer.add_array("keys", concat(keys, np.int64))
+        writer.add_array("cards", concat(cards, np.uint32))
+        writer.add_array("starts", concat(starts, np.uint64))
+        writer.add_array("data", concat(chunks, np.uint16))
+        writer.add_array("book_ids", np.unique(np.array(self.book_ids, dtype=np.int64)))
+        writer.write(path)
+
+
+class FacetIndex:
+    """Lecture mmap des bitmaps de facettes (voir FacetsWriter)."""
+
+    def __init__(self, path):
+        self.snapshot = Snapshot(path)
+        if self.snapshot.meta.get("kind") != "facets":
+            raise SnapshotError(f"{path} n'est pas un index de facettes")
+        arrays = self.snapshot.arrays
+        self.value_ptr = arrays["value_ptr"].astype(np.int64)
+        # cardinalité totale de chaque valeur : borne supérieure de ses comptes
+        card_sums = np.concatenate([[0], np.cumsum(arrays["cards"], dtype=np.int64)])
+        self.totals = card_sums[self.value_ptr[1:]] - card_sums[self.value_ptr[:-1]]
+        self.ranges = {facet: self.snapshot.prefix_range(f"{facet}:") for facet in FACETS}
+        # valeurs de chaque facette par cardinalité décroissante (ex aequo : ordre alphabétique)
+        self.order = {facet: lo + np.argsort(-self.totals[lo:hi], kind="stable")
+                      for facet, (lo, hi) in self.ranges.items()}
+
+    @property
+    def meta(self):
+        return self.snapshot.meta
+
+    def value(self, i):
+        return self.snapshot.term(i).split(":", 1)[1]
+
+    def bitmap(self, i):
+        lo, hi = self.value_ptr[i], self.value_ptr[i + 1]
+        arrays = self.snapshot.arrays
+        return Bitmap.from_arrays(arrays["keys"][lo:hi], arrays["cards"][lo:hi], arrays["starts"][lo:hi], arrays["data"])
+
+    def lookup(self, facet, value):
+        """Bitmap des livres ayant `value` pour `facet` (vide si la valeur est inconnue)."""
+        i = self.snapshot.term_index(f"{facet}:{value}")
+        return self.bitmap(i) if i is not None else Bitmap()
+
+    def filter(self, filters):
+        """ET sur les facettes de l'OU des valeurs de chaque facette."""
+        result = None
+        for facet, values in filters.items():
+            allowed = Bitmap()
+            for value in values:
+                allowed = allowed | self.lookup(facet, value)
+            result = allowed if result is None else result & allowed
+        return result
+
+    def counts(self, result, facet, limit=FACET_LIMIT):
+        """[{"value", "count"}] : valeurs de `facet` les plus fréquentes dans le bitmap `result`."""
+        best = []   # (-compte, indice), trié
+        for i in self.order[facet].tolist():
+            if len(best) == limit and self.totals[i] < -best[-1][0]:
+                break   # aucune valeur restante ne peut dépasser le dernier du top
+            n = result.and_cardinality(self.bitmap(i))
+            if n:
+                best.append((-n, i))
+                best.sort()
+                del best[limit:]
+        return [{"value": self.value(i), "count": -n} for n, i in best]
+
+    def close(self):
+        self.snapshot.close()
+
+
+def parse_filters(params):
+    """{facette: (valeurs triées)} des paramètres de requête (QueryDict) ; facettes absentes omises."""
+    filters = {}
+    for facet in FACETS:
+        values = sorted({v.strip() for v in params.getlist(facet) if v.strip()})
+        if values:
+            filters[facet] = tuple(values)
+    return filters
+
+
+def filters_key(filters):
+    """Forme canonique des filtres (+ génération de l'index de facettes) pour les clés de cache."""
+    if not filters:
+        return ""
+    index = get_facets()
+    generation = index.meta.get("built_at", "") if index is not None else "none"
+    return f"{sorted(filters.items())}|{generation}"
+
+
+def facet_filter(filters):
+    """Bitmap des livres autorisés par `filters`, None sans filtre ; FacetsUnavailable sans index."""
+    if not filters:
+        return None
+    index = get_facets()
+    if index is None:
+        raise FacetsUnavailable("Facettes indisponibles : lancer `manage.py build_facets`")
+    return index.filter(filters)
+
+
+def facet_counts(book_ids):
+    """{facette: [{"value", "count"}]} pour les livres `book_ids` (tous les résultats), None sans index."""
+    index = get_facets()
+    if index is None:
+        return None
+    result = Bitmap.from_ids(book_ids)
+    return {facet: index.counts(result, facet) for facet in FACETS}
+
+
+def _settings_path():
+    from django.conf import settings
+    return getattr(settings, "FACETS_FILE", None)
+
+
+_published = Published(_settings_path, FacetIndex, errors=(SnapshotError,))
+
+
+def get_facets():
+    """Index de facettes de settings.FACETS_FILE (rouvert s'il est republié), ou None."""
+    return _published.get()
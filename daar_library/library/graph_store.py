@@ -0,0 +1,208 @@
+"""
+Format binaire versionné du graphe de similarité (remplace le JSON / pickle).
+
+    [MAGIC 8 o][version u16][flags u16][n_nodes u32][n_edges u64]     (24 octets)
+    node_ids  int32[n_nodes]       ids Book triés (ligne i = node_ids[i])
+    indptr    int32[n_nodes + 1]   CSR : voisins de i = indices[indptr[i]:indptr[i+1]]
+    indices   int32[n_edges]       positions des voisins (pas les ids)
+    weights   float32[n_edges]     présent si flags & FLAG_WEIGHTS (Jaccard)
+
+Chaque tableau est aligné sur 8 octets. Le chargement ne parse rien : le fichier
+est mappé en lecture seule et les tableaux sont des vues numpy sur le mmap, donc
+partagés entre processus via le cache de pages. save_graph écrit dans un .tmp
+puis renomme : un lecteur voit l'ancien fichier ou le nouveau, jamais un mélange.
+"""
+
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"DAARGRPH"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ")
+FLAG_WEIGHTS = 1
+ALIGN = 8
+
+
+class GraphFormatError(Exception):
+    pass
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+class CSRGraph:
+    """
+    Graphe non orienté en CSR. Se comporte comme le dict[int, set[int]] attendu par
+    search_core (len, in, get, itération sur les nœuds) sans construire de dict.
+    """
+
+    def __init__(self, node_ids, indptr, indices, weights=None, mm=None):
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self._mm = mm
+
+    # ------------------------------------------------------------------
+    # Accès
+    # ------------------------------------------------------------------
+    def row(self, book_id):
+        i = int(np.searchsorted(self.node_ids, book_id))
+        return i if i < len(self.node_ids) and self.node_ids[i] == book_id else None
+
+    def neighbors(self, book_id):
+        i = self.row(book_id)
+        if i is None:
+            return []
+        return self.node_ids[self.indices[self.indptr[i]:self.indptr[i + 1]]].tolist()
+
+    def edge_weights(self, book_id):
+        """{voisin: poids} (poids 1.0 si le fichier n'a pas de poids)."""
+        i = self.row(book_id)
+        if i is None:
+            return {}
+        start, end = self.indptr[i], self.indptr[i + 1]
+        ids = self.node_ids[self.indices[start:end]].tolist()
+        weights = self.weights[start:end].tolist() if self.weights is not None else [1.0] * len(ids)
+        return dict(zip(ids, weights))
+
+    @property
+    def n_edges(self):
+        return len(self.indices) // 2
+
+    # Interface dict[int, set[int]] (lecture seule) pour search_core
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, book_id):
+        return self.row(book_id) is not None
+
+    def __iter__(self):
+        return iter(self.node_ids.tolist())
+
+    def __getitem__(self, book_id):
+        if book_id not in self:
+            raise KeyError(book_id)
+        return self.neighbors(book_id)
+
+    def get(self, book_id, default=None):
+        return self.neighbors(book_id) if book_id in self else default
+
+    def to_dict(self):
+        """dict[int, set[int]] (conversion explicite, pour les algorithmes NetworkX)."""
+        return {bid: set(self.neighbors(bid)) for bid in self}
+
+    def close(self):
+        self.node_ids = self.indptr = self.indices = self.weights = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass   # des vues sont encore utilisées : le mapping sera libéré par le GC
+            self._mm = None
+
+
+def from_adjacency(graph, weights=None):
+    """
+    graph   : {book_id: itérable de voisins} (clés int ou str, comme l'ancien JSON)
+    weights : {(b1, b2): poids} optionnel, clé avec b1 < b2
+    Retourne un CSRGraph en mémoire ; les voisins absents des clés sont ignorés.
+    """
+    node_ids = np.array(sorted(int(k) for k in graph), dtype=np.int32)
+    position = {int(bid): i for i, bid in enumerate(node_ids)}
+    adjacency = {int(k): v for k, v in graph.items()}
+    indptr = np.zeros(len(node_ids) + 1, dtype=np.int32)
+    indices, edge_weights = [], []
+    for i, bid in enumerate(node_ids.tolist()):
+        row = sorted(position[int(n)] for n in adjacency[bid] if int(n) in position)
+        indices.extend(row)
+        if weights is not None:
+            for j in row:
+                other = int(node_ids[j])
+                edge_weights.append(weights.get((min(bid, other), max(bid, other)), 1.0))
+        indptr[i + 1] = indptr[i] + len(row)
+    return CSRGraph(
+        node_ids,
+        indptr,
+        np.array(indices, dtype=np.int32),
+        np.array(edge_weights, dtype=np.float32) if weights is not None else None,
+    )
+
+
+def save_graph(path, graph, weights=None):
+    """Écrit `graph` (CSRGraph ou dict d'adjacence) au format binaire, atomiquement."""
+    if not isinstance(graph, CSRGraph):
+        graph = from_adjacency(graph, weights)
+    path = Path(path)
+    flags = FLAG_WEIGHTS if graph.weights is not None else 0
+    arrays = [
+        graph.node_ids.astype(np.int32, copy=False),
+        graph.indptr.astype(np.int32, copy=False),
+        graph.indices.astype(np.int32, copy=False),
+    ]
+    if flags & FLAG_WEIGHTS:
+        arrays.append(graph.weights.astype(np.float32, copy=False))
+
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, len(graph.node_ids), len(graph.indices)))
+        for array in arrays:
+            f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+            f.write(array.tobytes())
+    tmp.replace(path)
+
+
+def load_graph(path):
+    """Mappe un graphe binaire ; GraphFormatError si le fichier n'est pas au bon format."""
+    path = Path(path)
+    if path.stat().st_size < HEADER.size:
+        raise GraphFormatError(f"{path} : fichier tronqué")
+    with path.open("rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, flags, n_nodes, n_edges = HEADER.unpack_from(mm, 0)
+    layout = [(np.int32, n_nodes), (np.int32, n_nodes + 1), (np.int32, n_edges)]
+    if flags & FLAG_WEIGHTS:
+        layout.append((np.float32, n_edges))
+    sections = []
+    offset = HEADER.size
+    for dtype, count in layout:
+        offset = _aligned(offset)
+        sections.append((dtype, count, offset))
+        offset += count * np.dtype(dtype).itemsize
+
+    error = None
+    if magic != MAGIC:
+        error = f"{path} n'est pas un graphe DAAR (JSON ? voir convert_graph)"
+    elif version != VERSION:
+        error = f"Version de graphe {version} non supportée (attendu {VERSION})"
+    elif offset > len(mm):
+        error = f"{path} : fichier tronqué"
+    if error:
+        mm.close()
+        raise GraphFormatError(error)
+
+    arrays = [np.frombuffer(mm, dtype=dtype, count=count, offset=start) for dtype, count, start in sections]
+    weights = arrays[3] if flags & FLAG_WEIGHTS else None
+    return CSRGraph(arrays[0], arrays[1], arrays[2], weights, mm=mm)
+
+
+def read_graph(path):
+    """Graphe binaire mappé, ou ancien JSON chargé en mémoire (détection par l'en-tête)."""
+    path = Path(path)
+    with path.open("rb") as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return load_graph(path)
+    return from_adjacency(json.loads(path.read_text(encoding="utf-8")))
+
+
+def convert_json(json_path, output_path):
+    """Convertit l'ancien graph_books.json ({"id": [voisins]}) au format binaire."""
+    graph = json.loads(Path(json_path).read_text(encoding="utf-8"))
+    save_graph(output_path, graph)
+    return load_graph(output_path)
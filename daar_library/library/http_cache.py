@@ -0,0 +1,166 @@
+"""
+Cache HTTP des réponses de recherche et de suggestions : ETag forts, 304, Cache-Control.
+
+Un résultat ne dépend que de la requête normalisée et des « générations » des
+artefacts lus :
+    index     index ES derrière l'alias "books" (nom concret + uuid, change à chaque réindexation)
+    snapshot  instantané mmap (date de construction), source des métadonnées et centralités
+    graph     graphe binaire (mtime_ns + taille du fichier)
+    positions index positionnel des extraits KWIC (date de construction)
+
+L'ETag est un hash de ces générations et de la requête. Si If-None-Match le
+contient, la vue n'est pas exécutée (304). Les réponses 200 portent l'ETag et
+Cache-Control public : un proxy ou un CDN devant le backend peut les servir et
+les revalider. Les réponses approximatives (garde-fou, timeout ES) ou profilées
+ne sont pas mises en cache.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+IGNORED_PARAMS = {"profile"}    # sans effet sur le corps de la réponse
+GENERATION_TTL = 5.0            # secondes de validité de la génération ES mémorisée
+
+_lock = threading.Lock()
+_index_generation = (None, 0.0)   # (valeur, instant de lecture)
+
+
+def index_generation():
+    """
+    Nom concret + uuid + révision (_meta.revision, incrémentée par les mises à jour
+    incrémentales) de l'index de recherche ; None si ES est injoignable.
+    """
+    global _index_generation
+    value, read_at = _index_generation
+    if value is not None and time.monotonic() - read_at < GENERATION_TTL:
+        return value
+    with _lock:
+        from library.elasticsearch_client import es, INDEX_NAME
+        try:
+            res = es.indices.get_settings(index=INDEX_NAME, name="index.uuid")
+            mappings = es.indices.get_mapping(index=INDEX_NAME)
+            revisions = {name: (data["mappings"].get("_meta") or {}).get("revision", 0) for name, data in mappings.items()}
+            value = ",".join(sorted(f"{name}:{data['settings']['index']['uuid']}:{revisions.get(name, 0)}"
+                                    for name, data in res.items()))
+        except Exception:
+            value = None
+        _index_generation = (value, time.monotonic())
+    return value
+
+
+def snapshot_generation():
+    from library.snapshot import get_snapshot
+    snapshot = get_snapshot()
+    return snapshot.meta.get("built_at", "") if snapshot is not None else "none"
+
+
+def graph_generation():
+    try:
+        stat = os.stat(settings.GRAPH_FILE)
+    except (FileNotFoundError, TypeError):
+        return "none"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def positions_generation():
+    from library.positions import get_positions
+    index = get_positions()
+    return str(index.meta.get("built_at", "")) if index is not None else "none"
+
+
+def facets_generation():
+    from library.facets import get_facets
+    index = get_facets()
+    return str(index.meta.get("built_at", "")) if index is not None else "none"
+
+
+GENERATIONS = {
+    "index": index_generation,
+    "snapshot": snapshot_generation,
+    "graph": graph_generation,
+    "positions": positions_generation,
+    "facets": facets_generation,
+}
+
+
+def normalized_query(request):
+    params = sorted(
+        (key, value.strip().lower() if key == "q" else value.strip())
+        for key, values in request.GET.lists() if key not in IGNORED_PARAMS
+        for value in values
+    )
+    return "&".join(f"{key}={value}" for key, value in params)
+
+
+def compute_etag(request, sources):
+    """ETag fort de la requête, ou None si une génération est inconnue (pas de cache)."""
+    parts = [request.path, normalized_query(request)]
+    for source in sources:
+        generation = GENERATIONS[source]()
+        if generation is None:
+            return None
+        parts.append(f"{source}={generation}")
+    return '"' + hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # comparaison faible : la compression gzip rend l'ETag faible (W/"...")
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def _cacheable(response):
+    if response.status_code != 200:
+        return False
+    data = getattr(response, "data", None)
+    if data is None and hasattr(response, "content") and not response.streaming:
+        return b'"approximate"' not in response.content   # clé présente seulement si vraie
+    return not (isinstance(data, dict) and data.get("approximate"))
+
+
+def conditional(*sources):
+    """
+    Décorateur de vue GET : 304 si If-None-Match correspond, sinon exécute la vue
+    et ajoute ETag + Cache-Control aux réponses 200 déterministes.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or IGNORED_PARAMS & set(request.GET):
+                return view(request, *args, **kwargs)
+            etag = compute_etag(request, sources)
+            if etag is None:
+                return view(request, *args, **kwargs)
+
+            cache_control = {
+                "public": True,
+                "max_age": getattr(settings, "HTTP_CACHE_MAX_AGE", 60),
+                "s_maxage": getattr(settings, "HTTP_CACHE_S_MAXAGE", 300),
+            }
+            if _etag_matches(request.headers.get("If-None-Match"), etag):
+                response = HttpResponseNotModified()
+                response["ETag"] = etag
+                patch_cache_control(response, **cache_control)
+                patch_vary_headers(response, ["Accept"])
+                return response
+
+            response = view(request, *args, **kwargs)
+            if _cacheable(response):
+                response["ETag"] = etag
+                patch_cache_control(response, **cache_control)
+                patch_vary_headers(response, ["Accept"])
+            else:
+                patch_cache_control(response, no_store=True)
+            return response
+        return wrapped
+    return decorator
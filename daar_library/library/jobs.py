@@ -0,0 +1,223 @@
+"""
+File de tâches de fond stockée en base (modèle Job), sans broker externe.
+
+Le tiers web ne fait plus de calcul lourd : il lit les artefacts publiés
+(graphe binaire, instantané, index ES) et, s'il en manque un, met une tâche en
+file. Un worker local (`manage.py run_jobs`) exécute les tâches :
+
+    reindex      index inversé ES (nouvel index puis bascule de l'alias "books")
+    build_graph  graphe de similarité -> settings.GRAPH_FILE
+    centrality   instantané mmap avec les vecteurs de centralité -> settings.SNAPSHOT_FILE
+
+Garanties :
+ - déduplication : enqueue() renvoie la tâche identique déjà en attente (même type,
+   mêmes paramètres) ; une tâche identique en cours n'est pas dédupliquée, pour
+   que la nouvelle demande voie les données les plus récentes ;
+ - réservation atomique : UPDATE ... WHERE status='pending', plusieurs workers possibles ;
+ - publication atomique : chaque artefact est écrit à côté puis renommé (ou l'alias
+   ES basculé), les lecteurs voient l'ancienne version ou la nouvelle ;
+ - progression : progress (0..1) et message mis à jour pendant l'exécution.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from library.models import Book, Job
+
+logger = logging.getLogger("library.jobs")
+
+HANDLERS = {}
+REPORT_INTERVAL = 0.5   # secondes entre deux écritures de progression
+HEARTBEAT_INTERVAL = 30  # battement de cœur pendant les étapes longues sans progression
+
+
+def job_handler(kind):
+    """Enregistre fn(job, report, **params) -> résultat JSON pour le type `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def dedup_key(kind, params):
+    payload = json.dumps([kind, params], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def enqueue(kind, **params):
+    """Met une tâche en file ; retourne (job, created). created=False si dédupliquée."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Type de tâche inconnu : {kind}")
+    key = dedup_key(kind, params)
+    existing = Job.objects.filter(dedup_key=key, status=Job.PENDING).first()
+    if existing is not None:
+        return existing, False
+    try:
+        with transaction.atomic():
+            return Job.objects.create(kind=kind, params=params, dedup_key=key), True
+    except IntegrityError:
+        # un autre processus l'a créée entre les deux requêtes
+        return Job.objects.get(dedup_key=key, status=Job.PENDING), False
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker):
+    """Réserve la plus ancienne tâche en attente (hors tâches identiques déjà en cours)."""
+    running = Job.objects.filter(status=Job.RUNNING).values_list("dedup_key", flat=True)
+    for job in Job.objects.filter(status=Job.PENDING).exclude(dedup_key__in=list(running)):
+        now = timezone.now()
+        claimed = Job.objects.filter(id=job.id, status=Job.PENDING).update(
+            status=Job.RUNNING, worker=worker, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def requeue_stale(max_age):
+    """Remet en file les tâches dont le worker ne donne plus signe de vie."""
+    cutoff = timezone.now() - max_age
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff)
+    requeued = 0
+    for job in stale:
+        if Job.objects.filter(dedup_key=job.dedup_key, status=Job.PENDING).exists():
+            Job.objects.filter(id=job.id).update(status=Job.FAILED, error="worker perdu (tâche déjà en file)",
+                                                 finished_at=timezone.now())
+        else:
+            requeued += Job.objects.filter(id=job.id, status=Job.RUNNING).update(
+                status=Job.PENDING, worker="", message="remise en file (worker perdu)",
+            )
+    return requeued
+
+
+class Progress:
+    """Rapporteur de progression d'une tâche (écritures limitées à une par REPORT_INTERVAL)."""
+
+    def __init__(self, job):
+        self.job = job
+        self._last = 0.0
+
+    def __call__(self, progress=None, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < REPORT_INTERVAL:
+            return
+        self._last = now
+        fields = {"heartbeat_at": timezone.now()}
+        if progress is not None:
+            fields["progress"] = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            fields["message"] = message[:500]
+        Job.objects.filter(id=self.job.id).update(**fields)
+
+
+class ProgressOutput(io.TextIOBase):
+    """stdout d'une commande de management : la dernière ligne devient le message de la tâche."""
+
+    def __init__(self, report):
+        self.report = report
+
+    def write(self, text):
+        line = text.strip()
+        if line:
+            self.report(message=line)
+        return len(text)
+
+
+def _heartbeat(job_id, stop):
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            Job.objects.filter(id=job_id, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()   # connexion propre à ce thread
+
+
+def run_job(job):
+    """Exécute une tâche réservée et enregistre son issue (done / failed)."""
+    report = Progress(job)
+    report(0.0, f"démarrée par {job.worker}", force=True)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job.id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.kind](job, report, **job.params)
+    except Exception as exc:
+        # trace complète dans les journaux du worker ; Job.error est servi par /api/jobs/
+        logger.exception("tâche %s (%s) en échec", job.id, job.kind)
+        Job.objects.filter(id=job.id).update(
+            status=Job.FAILED, error=str(exc) or type(exc).__name__, finished_at=timezone.now(),
+        )
+        return False
+    finally:
+        stop.set()
+        heartbeat.join()
+    Job.objects.filter(id=job.id).update(
+        status=Job.DONE, progress=1.0, result=result, message="terminée", finished_at=timezone.now(),
+    )
+    return True
+
+
+# ----------------------------------------------------------------------
+# Tâches
+# ----------------------------------------------------------------------
+@job_handler("reindex")
+def reindex(job, report, corpus=None):
+    options = {"atomic": True, "stdout": ProgressOutput(report)}
+    if corpus:
+        options["corpus"] = corpus
+    call_command("index_inverted_from_db", **options)
+    enqueue("centrality")   # l'instantané contient les postings : il faut le reconstruire
+    return {"index": "books"}
+
+
+@job_handler("build_graph")
+def build_graph(job, report, threshold=0.1):
+    from library.graph_store import save_graph
+    from library.search_core import similarity_graph, title_words
+
+    report(0.05, "lecture des titres", force=True)
+    book_words = {book.id: title_words(book.title) for book in Book.objects.only("id", "title")}
+    report(0.1, f"similarité de {len(book_words)} livres", force=True)
+    weights = {}
+    graph = similarity_graph(book_words, threshold=threshold, weights=weights)
+    report(0.9, "écriture du graphe", force=True)
+    save_graph(settings.GRAPH_FILE, graph, weights)   # .tmp puis renommage
+    enqueue("centrality")
+    return {"path": str(settings.GRAPH_FILE), "nodes": len(graph), "edges": len(weights)}
+
+
+@job_handler("centrality")
+def centrality(job, report):
+    call_command("build_snapshot", stdout=ProgressOutput(report))   # .tmp puis renommage
+    return {"path": str(settings.SNAPSHOT_FILE)}
+
+
+def run_worker(poll=1.0, once=False, stale_after=timedelta(minutes=30), log=print):
+    """Boucle du worker : requeue des tâches orphelines, réservation, exécution."""
+    worker = worker_name()
+    while True:
+        requeue_stale(stale_after)
+        job = claim_next(worker)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll)
+            continue
+        log(f"▶ {job.kind} #{job.id} {job.params or ''}")
+        ok = run_job(job)
+        log(f"{'✅' if ok else '❌'} {job.kind} #{job.id}")
@@ -0,0 +1,79 @@
+import io
+import json
+import pstats
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Agrège les profils collectés par ProfilingMiddleware (cProfile + profils ES)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=getattr(settings, "PROFILE_DIR", "profiles"))
+        parser.add_argument("--path", help="ne garder que les requêtes de ce chemin (ex: /api/search/regex/)")
+        parser.add_argument("--pattern", help="ne garder que les requêtes dont q contient ce texte")
+        parser.add_argument("--top", type=int, default=30, help="nombre de fonctions affichées")
+        parser.add_argument("--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"])
+        parser.add_argument("--output", help="écrit les stats fusionnées dans ce fichier .prof")
+
+    def handle(self, *args, **options):
+        profile_dir = Path(options["dir"])
+        metas = []
+        for meta_file in sorted(profile_dir.glob("*.json")):
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            if options["path"] and meta["path"] != options["path"]:
+                continue
+            if options["pattern"] and options["pattern"] not in meta["params"].get("q", ""):
+                continue
+            metas.append(meta)
+
+        if not metas:
+            self.stdout.write(self.style.WARNING(f"Aucun profil trouvé dans {profile_dir}"))
+            return
+
+        # ------------------------------------------------------------------
+        # 1) Requêtes profilées, par endpoint
+        # ------------------------------------------------------------------
+        by_path = defaultdict(list)
+        for meta in metas:
+            by_path[meta["path"]].append(meta)
+        self.stdout.write(self.style.SUCCESS(f"📊 {len(metas)} requêtes profilées"))
+        for path, items in sorted(by_path.items()):
+            walls = sorted(m["wall_ms"] for m in items)
+            slowest = max(items, key=lambda m: m["wall_ms"])
+            self.stdout.write(
+                f"  • {path} : {len(items)} req, médiane {walls[len(walls) // 2]:.1f} ms, "
+                f"max {walls[-1]:.1f} ms (q={slowest['params'].get('q', '')!r}, id={slowest['id']})"
+            )
+
+        # ------------------------------------------------------------------
+        # 2) Temps côté Elasticsearch (took vs mur de la requête)
+        # ------------------------------------------------------------------
+        es_took = [p["took"] for m in metas for p in m.get("es_profiles", []) if p.get("took") is not None]
+        if es_took and any(m["wall_ms"] for m in metas):
+            total_wall = sum(m["wall_ms"] for m in metas)
+            self.stdout.write(
+                f"\n🔎 Elasticsearch : {len(es_took)} recherches, took total {sum(es_took)} ms "
+                f"({100 * sum(es_took) / total_wall:.0f}% du temps mur)"
+            )
+
+        # ------------------------------------------------------------------
+        # 3) cProfile fusionné
+        # ------------------------------------------------------------------
+        prof_files = [profile_dir / f"{m['id']}.prof" for m in metas]
+        prof_files = [str(p) for p in prof_files if p.exists()]
+        if not prof_files:
+            return
+        out = io.StringIO()
+        stats = pstats.Stats(prof_files[0], stream=out)
+        for prof in prof_files[1:]:
+            stats.add(prof)
+        self.stdout.write(f"\n🐍 cProfile fusionné ({len(prof_files)} profils), tri '{options['sort']}' :")
+        stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["top"])
+        self.stdout.write(out.getvalue())
+
+        if options["output"]:
+            stats.dump_stats(options["output"])
+            self.stdout.write(self.style.SUCCESS(f"Stats fusionnées écrites dans {options['output']}"))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library.facets import FACETS, FacetsWriter
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = "Écrit les bitmaps des facettes (langue, sujet, étagère, auteur) des livres : settings.FACETS_FILE"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.FACETS_FILE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        writer = FacetsWriter()
+        fields = list(FACETS.values())
+        for row in Book.objects.order_by("id").values_list("id", *fields):
+            writer.add_book(row[0], dict(zip(FACETS, row[1:])))
+        writer.write(options["output"])
+        self.stdout.write(self.style.SUCCESS(
+            f"🏷️ {len(writer.book_ids)} livres, {len(writer.postings)} valeurs de facettes → {options['output']} "
+            f"en {time.perf_counter() - started:.2f} s"
+        ))
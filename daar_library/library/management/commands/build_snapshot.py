@@ -0,0 +1,98 @@
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from elasticsearch import helpers
+
+from library.elasticsearch_client import es, INDEX_NAME
+from library.graph_store import read_graph
+from library.models import Book
+from library.search_core import (
+    title_words, similarity_graph, closeness_for_ids, graph_to_csr, pagerank_csr,
+)
+from library.snapshot import SnapshotWriter, Snapshot
+
+
+class Command(BaseCommand):
+    help = "Écrit l'instantané mmap de la recherche (vocabulaire, postings, livres, graphe CSR, centralités)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.SNAPSHOT_FILE)
+        parser.add_argument("--graph", default=settings.GRAPH_FILE,
+                            help="graphe binaire ou ancien JSON (reconstruit depuis les titres s'il manque)")
+        parser.add_argument("--skip-closeness", action="store_true",
+                            help="ne pas précalculer la closeness (O(N·E)) ; calcul à la demande")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        writer = SnapshotWriter(meta={
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "index": INDEX_NAME,
+        })
+
+        # ------------------------------------------------------------------
+        # Vocabulaire + postings (les parts term_partN sont refusionnées)
+        # ------------------------------------------------------------------
+        postings = {}
+        for hit in helpers.scan(es, index=INDEX_NAME, query={"query": {"match_all": {}}}, _source=["term", "books"]):
+            src = hit["_source"]
+            books = postings.setdefault(src["term"], {})
+            for bid, count in src.get("books", {}).items():
+                books[int(bid)] = books.get(int(bid), 0) + count
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        post_books, post_counts = [], []
+        for i, term in enumerate(terms):
+            ordered = sorted(postings[term].items(), key=lambda x: -x[1])   # ordre d'impact
+            post_books.extend(bid for bid, _ in ordered)
+            post_counts.extend(count for _, count in ordered)
+            offsets[i + 1] = offsets[i] + len(ordered)
+        del postings
+        writer.add_strings("vocab", terms)
+        writer.add_array("post_offsets", offsets)
+        writer.add_array("post_books", np.array(post_books, dtype=np.int32))
+        writer.add_array("post_counts", np.array(post_counts, dtype=np.int32))
+        self.stdout.write(f"🔤 {len(terms)} termes, {len(post_books)} postings")
+
+        # ------------------------------------------------------------------
+        # Table des livres
+        # ------------------------------------------------------------------
+        rows = list(Book.objects.order_by("id").values_list("id", "title", "author", "image_url"))
+        book_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        writer.add_array("book_ids", book_ids)
+        writer.add_strings("title", [r[1] for r in rows])
+        writer.add_strings("author", [r[2] for r in rows])
+        writer.add_strings("image_url", [r[3] for r in rows])
+        self.stdout.write(f"📚 {len(rows)} livres")
+
+        # ------------------------------------------------------------------
+        # Graphe CSR + centralités
+        # ------------------------------------------------------------------
+        graph_path = Path(options["graph"])
+        if graph_path.exists():
+            graph = read_graph(graph_path)
+        else:
+            graph = similarity_graph({bid: title_words(title) for bid, title, _, _ in rows}, threshold=0.1)
+        indptr, indices = graph_to_csr(graph, book_ids)
+        writer.add_array("graph_indptr", indptr)
+        writer.add_array("graph_indices", indices)
+        writer.add_array("pagerank", pagerank_csr(indptr, indices).astype(np.float32))
+        if not options["skip_closeness"]:
+            closeness = closeness_for_ids(graph, book_ids)
+            writer.add_array("closeness", np.array([closeness[int(b)] for b in book_ids], dtype=np.float32))
+        self.stdout.write(f"🕸️ {len(indices) // 2} arêtes")
+
+        writer.meta.update(n_terms=len(terms), n_books=len(rows), n_edges=int(len(indices)) // 2)
+        writer.write(options["output"])
+
+        size = Path(options["output"]).stat().st_size
+        load_start = time.perf_counter()
+        Snapshot(options["output"]).close()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Instantané {options['output']} ({size / 1e6:.1f} Mo) en {time.perf_counter() - started:.1f} s ; "
+            f"ouverture mmap {1000 * (time.perf_counter() - load_start):.2f} ms"
+        ))
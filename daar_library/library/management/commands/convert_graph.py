@@ -0,0 +1,30 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from library.graph_store import convert_json, load_graph, GraphFormatError
+
+
+class Command(BaseCommand):
+    help = "Convertit l'ancien graph_books.json au format binaire CSR (library/graph_store.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--input", default="graph_books.json")
+        parser.add_argument("--output", default=settings.GRAPH_FILE)
+        parser.add_argument("--check", action="store_true", help="vérifie seulement le fichier binaire --output")
+
+    def handle(self, *args, **options):
+        output = Path(options["output"])
+        try:
+            if options["check"]:
+                graph = load_graph(output)
+            else:
+                if not Path(options["input"]).exists():
+                    raise CommandError(f"{options['input']} introuvable")
+                graph = convert_json(options["input"], output)
+        except GraphFormatError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🕸️ {output} : {len(graph)} nœuds, {graph.n_edges} arêtes, "
+            f"{'avec' if graph.weights is not None else 'sans'} poids ({output.stat().st_size / 1e3:.1f} Ko)"
+        ))
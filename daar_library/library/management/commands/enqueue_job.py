@@ -0,0 +1,26 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from library.jobs import HANDLERS, enqueue
+
+
+class Command(BaseCommand):
+    help = "Met une tâche de fond en file (dédupliquée si une tâche identique attend déjà)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(HANDLERS))
+        parser.add_argument("--param", action="append", default=[], metavar="CLE=VALEUR",
+                            help="paramètre de la tâche (valeur JSON ou texte), répétable")
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options["param"]:
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Paramètre invalide : {item} (attendu CLE=VALEUR)")
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        job, created = enqueue(options["kind"], **params)
+        verb = "mise en file" if created else "déjà en file"
+        self.stdout.write(self.style.SUCCESS(f"📋 {job.kind} #{job.id} {verb}"))
@@ -1,23 +1,49 @@
 import os
 import json
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from library.models import Book
 from library.elasticsearch_client import es, INDEX_NAME  # ton client Elasticsearch
+from library.corpus import CorpusReader
+from library.changes import ManifestError, read_manifest, changed_ids
 
 LIBRARY_DIR = "libraryBooks"  # chemin vers ton dossier avec les txt et metadata.json
 
 class Command(BaseCommand):
     help = "Import books from library folder and index them in Elasticsearch"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--library-dir", default=LIBRARY_DIR)
+        parser.add_argument("--corpus", help="lire les textes depuis un corpus compressé (pack_corpus)")
+        parser.add_argument("--skip-text", action="store_true",
+                            help="ne pas copier le texte dans SQLite (le corpus reste la source)")
+        parser.add_argument("--manifest",
+                            help="n'importer que les livres ajoutés / modifiés (changes.json de download_gutendex.py --sync)")
+
     def handle(self, *args, **options):
-        metadata_path = os.path.join(LIBRARY_DIR, "metadata.json")
+        library_dir = options["library_dir"]
+        metadata_path = os.path.join(library_dir, "metadata.json")
         with open(metadata_path, "r", encoding="utf-8") as f:
             metadata = json.load(f)
 
+        if options["manifest"]:
+            try:
+                wanted = changed_ids(read_manifest(options["manifest"]))
+            except ManifestError as exc:
+                raise CommandError(str(exc))
+            metadata = {book_id: data for book_id, data in metadata.items() if int(book_id) in wanted}
+            self.stdout.write(f"📋 Manifeste : {len(metadata)} livre(s) ajouté(s) ou modifié(s)")
+
+        corpus = CorpusReader(options["corpus"]) if options["corpus"] else None
+
         for book_id, data in metadata.items():
             # Lire le contenu du livre
-            text_file = os.path.join(LIBRARY_DIR, data["filename"])
-            if os.path.exists(text_file):
+            text_file = os.path.join(library_dir, data["filename"])
+            if options["skip_text"]:
+                content = ""
+            elif corpus is not None:
+                content = corpus.read_text(book_id) if book_id in corpus else ""
+            elif os.path.exists(text_file):
                 with open(text_file, "r", encoding="utf-8") as tf:
                     content = tf.read()
             else:
@@ -27,12 +53,24 @@ class Command(BaseCommand):
             book_obj, created = Book.objects.update_or_create(
                 title=data["title"],
                 defaults={
+                    "gutenberg_id": int(book_id),
                     "author": ", ".join([a["name"] for a in data.get("authors", [])]),
                     "image_url": data.get("cover_image", ""),
-                    "text_content": content
+                    "text_content": content,
+                    "languages": data.get("languages") or [],
+                    "subjects": data.get("subjects") or [],
+                    "bookshelves": data.get("bookshelves") or [],
+                    "authors": [a["name"] for a in data.get("authors", [])],
+                    "download_count": data.get("download_count"),
                 }
             )
 
             
 
             self.stdout.write(self.style.SUCCESS(f"Imported & indexed: {book_obj.title}"))
+
+        if corpus is not None:
+            corpus.close()
+
+        # bitmaps des facettes (filtres de recherche) à jour avec la base
+        call_command("build_facets", stdout=self.stdout)
@@ -1,11 +1,17 @@
-import re
+import os
+import time
 from collections import defaultdict
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
 
 from library.models import Book  # <-- ON UTILISE TON MODEL
+from library.corpus import CorpusReader
+from library.text import get_normalizer
+from library.sharding import ShardLayout
+from library.positions import PositionsWriter, scan_offsets, MAX_OFFSETS
+from library.changes import ManifestError, read_manifest, changed_ids, mark_applied
 
 """
 Ce script construit un index inversé complet à partir des objets Book stockés
@@ -13,22 +19,140 @@ dans la base Django. L’index inversé est ensuite envoyé dans Elasticsearch.
 
 Structure stockée dans ES :
     term → { book_id: count, book_id: count, ... }
+
+Les postings sont rangés par impact (count décroissant) : la part 0 d'un terme
+contient ses livres les plus forts, et chaque document porte `max_count` (borne
+supérieure de ses counts) et `n_books`. La recherche top-k approximative
+(?exact=false) s'en sert pour s'arrêter tôt sans lire toutes les parts.
+
+Avec --atomic, l'index est construit sous un nom daté (books_<timestamp>) puis
+l'alias "books" bascule dessus en une opération : les recherches en cours voient
+l'ancien index complet ou le nouveau, jamais un index à moitié rempli.
+
+Les termes sont produits par library/text.py (mêmes règles que la réécriture des
+requêtes) ; l'empreinte de la normalisation est rangée dans le _meta du mapping.
+
+Avec --shards N (défaut settings.ES_TERM_SHARDS), l'index a N shards primaires et
+chaque document-terme est routé vers le shard de sa première lettre (champ
+"shard", library/sharding.py) ; la recherche n'interroge que les shards utiles.
+--shards 1 : index non découpé (format antérieur).
+
+Avec --positions, les premiers offsets de chaque terme dans chaque livre sont
+aussi écrits dans settings.POSITIONS_FILE (library/positions.py) : extraits KWIC
+de enhanced_search?snippets=true.
+
+Avec --manifest changes.json (download_gutendex.py --sync, après
+import_books_withImage --manifest), l'index existant est mis à jour sur place :
+seuls les termes des livres ajoutés / modifiés (anciens et nouveaux termes) sont
+relus, recalculés et réécrits ; les parts devenues inutiles sont supprimées.
+Le compteur `revision` du _meta est incrémenté : la génération de l'index
+(library/http_cache.py) change, les caches HTTP et de curseurs sont invalidés.
 """
 
+MAX_BOOKS_PER_DOC = 500
+INCREMENTAL_BATCH = 500   # termes relus / réécrits par requête en mode --manifest
+
+
+def book_text(book, corpus):
+    """(texte ou itérable de blocs, unité des offsets, clé de corpus), ou None si le livre n'a pas de texte."""
+    if corpus is not None and book.gutenberg_id is not None and book.gutenberg_id in corpus:
+        # Lecture en flux depuis le corpus : jamais le livre entier en mémoire
+        return corpus.iter_text(book.gutenberg_id), "bytes", book.gutenberg_id
+    if book.text_content:
+        return book.text_content, "chars", None
+    return None
+
+
+def term_actions(index_name, term, books_dict, layout=None):
+    """
+    Documents ES d'un terme : postings rangées par impact (plus gros counts d'abord),
+    découpées en parts de MAX_BOOKS_PER_DOC livres au-delà (_id "<terme>_part<n>").
+    """
+    postings = sorted(books_dict.items(), key=lambda x: (-x[1], int(x[0])))   # ex aequo : ordre stable
+    routing, shard_field = {}, {}
+    if layout is not None:
+        shard = layout.shard_of(term)
+        routing, shard_field = {"_routing": layout.routing(shard)}, {"shard": shard}
+    if len(postings) > MAX_BOOKS_PER_DOC:
+        parts = [(f"{term}_part{n}", postings[i:i + MAX_BOOKS_PER_DOC])
+                 for n, i in enumerate(range(0, len(postings), MAX_BOOKS_PER_DOC))]
+    else:
+        parts = [(term, postings)]
+    return [{
+        "_index": index_name,
+        "_id": doc_id,
+        **routing,
+        "_source": {
+            "term": term,
+            "part": part_index,
+            "max_count": chunk[0][1],
+            "n_books": len(chunk),
+            "books": dict(chunk),
+            **shard_field,
+        }
+    } for part_index, (doc_id, chunk) in enumerate(parts)]
+
+
+def scan_hits(es, index_name, body):
+    """Tous les hits d'une recherche triée par (term, part), page par page (search_after)."""
+    body = dict(body, size=10000, sort=["term", "part"])
+    while True:
+        hits = es.search(index=index_name, body=body)["hits"]["hits"]
+        yield from hits
+        if len(hits) < body["size"]:
+            return
+        body["search_after"] = hits[-1]["sort"]
+
 class Command(BaseCommand):
     help = "Construit un index inversé à partir du modèle Django Book et l'envoie dans Elasticsearch"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", help="lire les textes depuis un corpus compressé (pack_corpus)")
+        parser.add_argument("--atomic", action="store_true",
+                            help="indexer dans un nouvel index puis basculer l'alias 'books'")
+        parser.add_argument("--shards", type=int, default=getattr(settings, "ES_TERM_SHARDS", 1),
+                            help="nombre de shards (routage par première lettre du terme ; 1 = pas de découpage)")
+        parser.add_argument("--positions", action="store_true",
+                            help="écrire aussi l'index positionnel échantillonné (settings.POSITIONS_FILE)")
+        parser.add_argument("--max-offsets", type=int, default=MAX_OFFSETS,
+                            help="occurrences gardées par (terme, livre) dans l'index positionnel")
+        parser.add_argument("--manifest",
+                            help="mise à jour incrémentale de l'index existant pour les livres du manifeste "
+                                 "(changes.json de download_gutendex.py --sync)")
+
     def handle(self, *args, **kwargs):
 
         # ----------------------------------------------------------------------
         # 1) Connexion Elasticsearch
         # ----------------------------------------------------------------------
-        es = Elasticsearch("http://localhost:9200", timeout=60)
-        index_name = "books"
+        es = Elasticsearch(os.environ.get("ELASTICSEARCH_URL", "http://localhost:9200"), timeout=60)
+        alias_name = "books"
+        normalizer = get_normalizer()
+        if kwargs.get("manifest"):
+            if kwargs.get("atomic") or kwargs.get("positions"):
+                raise CommandError("--manifest met à jour l'index en place : incompatible avec --atomic et --positions")
+            return self.update_from_manifest(es, alias_name, normalizer, kwargs)
+        n_shards = max(1, kwargs.get("shards") or 1)
+        layout = ShardLayout.for_shards(n_shards) if n_shards > 1 else None
+        meta = {"normalizer": normalizer.fingerprint}
+        properties = {
+            "term": {"type": "keyword"},
+            "part": {"type": "integer"},
+            "max_count": {"type": "integer"},
+            "n_books": {"type": "integer"},
+            "books": {"type": "flattened"},
+        }
+        if layout is not None:
+            meta.update(layout.as_meta())
+            properties["shard"] = {"type": "integer"}
+        atomic = kwargs.get("atomic")
+        index_name = f"{alias_name}_{int(time.time())}" if atomic else alias_name
 
         # ----------------------------------------------------------------------
         # 2) Supprimer puis créer l’index Elasticsearch
         # ----------------------------------------------------------------------
+        if not atomic and es.indices.exists_alias(name=alias_name):
+            self.swap_alias(es, alias_name, None)   # repasse d'un alias à un index simple
         if es.indices.exists(index=index_name):
             es.indices.delete(index=index_name)
             self.stdout.write(self.style.WARNING(f"🗑 Ancien index '{index_name}' supprimé"))
@@ -38,20 +162,18 @@ class Command(BaseCommand):
             body={
                 "settings": {
                     "index": {
-                        "max_result_window": 50000
+                        "max_result_window": 50000,
+                        "number_of_shards": n_shards,
                     }
                 },
                 "mappings": {
-                    "properties": {
-                        "term": {"type": "keyword"},
-                        "part": {"type": "integer"},
-                        "books": {"type": "flattened"}
-                    }
+                    "_meta": meta,
+                    "properties": properties,
                 }
             }
         )
 
-        self.stdout.write(self.style.SUCCESS(f"✅ Nouvel index créé : {index_name}"))
+        self.stdout.write(self.style.SUCCESS(f"✅ Nouvel index créé : {index_name} ({n_shards} shard(s))"))
 
         # ----------------------------------------------------------------------
         # 3) Récupération des livres depuis la BDD
@@ -72,23 +194,33 @@ class Command(BaseCommand):
         # ----------------------------------------------------------------------
         inverted_index = defaultdict(lambda: defaultdict(int))
         processed_count = 0
+        corpus = CorpusReader(kwargs["corpus"]) if kwargs.get("corpus") else None
+        positions = PositionsWriter(kwargs["max_offsets"]) if kwargs.get("positions") else None
 
         for book in all_books:
-            if not book.text_content:
+            source = book_text(book, corpus)
+            if source is None:
                 continue
+            text, unit, key = source
 
-            text = book.text_content.lower()
-
-            # Extraction de tous les mots (même regex que ton script)
-            words = re.findall(r"[a-zàâçéèêëîïôûùüÿñœ]+", text)
+            if positions is not None:
+                counts, term_offsets = scan_offsets(normalizer, [text] if unit == "chars" else text,
+                                                    unit, positions.max_offsets)
+                positions.add_book(book.id, unit, key, term_offsets)
+            else:
+                counts = normalizer.count_terms(text)
 
-            for word in words:
-                inverted_index[word][str(book.id)] += 1
+            book_key = str(book.id)
+            for term, count in counts.items():
+                inverted_index[term][book_key] = count
 
             processed_count += 1
             if processed_count % 100 == 0:
                 self.stdout.write(f"  ➜ {processed_count} livres traités...")
 
+        if corpus is not None:
+            corpus.close()
+
         total_terms = len(inverted_index)
 
         self.stdout.write(self.style.SUCCESS(
@@ -100,44 +232,14 @@ class Command(BaseCommand):
         # ----------------------------------------------------------------------
         self.stdout.write("📤 Envoi de l'index dans Elasticsearch...")
 
-        MAX_BOOKS_PER_DOC = 500
         actions = []
         docs_indexed = 0
         large_terms = []
 
         for term, books_dict in inverted_index.items():
-
-            postings = list(books_dict.items())
-            nb_books = len(postings)
-
-            # Cas : trop de livres → découpage
-            if nb_books > MAX_BOOKS_PER_DOC:
-                large_terms.append((term, nb_books))
-
-                for part_index, i in enumerate(range(0, nb_books, MAX_BOOKS_PER_DOC)):
-                    chunk = dict(postings[i:i + MAX_BOOKS_PER_DOC])
-
-                    actions.append({
-                        "_index": index_name,
-                        "_id": f"{term}_part{part_index}",
-                        "_source": {
-                            "term": term,
-                            "part": part_index,
-                            "books": chunk,
-                        }
-                    })
-
-            else:
-                # Cas normal
-                actions.append({
-                    "_index": index_name,
-                    "_id": term,
-                    "_source": {
-                        "term": term,
-                        "part": 0,
-                        "books": dict(books_dict),
-                    }
-                })
+            if len(books_dict) > MAX_BOOKS_PER_DOC:
+                large_terms.append((term, len(books_dict)))
+            actions.extend(term_actions(index_name, term, books_dict, layout))
 
             # Envoi batch
             if len(actions) >= 1000:
@@ -157,6 +259,15 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f"🎉 Indexation terminée : {docs_indexed} documents envoyés."))
 
+        if atomic:
+            es.indices.refresh(index=index_name)
+            self.swap_alias(es, alias_name, index_name)
+            self.stdout.write(self.style.SUCCESS(f"🔀 Alias '{alias_name}' → {index_name}"))
+
+        if positions is not None:
+            positions.write(settings.POSITIONS_FILE, meta={"normalizer": normalizer.fingerprint})
+            self.stdout.write(self.style.SUCCESS(f"📍 Index positionnel écrit : {settings.POSITIONS_FILE}"))
+
         # ----------------------------------------------------------------------
         # 6) Affichage des mots découpés
         # ----------------------------------------------------------------------
@@ -165,3 +276,105 @@ class Command(BaseCommand):
             for term, nb_books in sorted(large_terms, key=lambda x: x[1], reverse=True)[:10]:
                 parts = (nb_books + MAX_BOOKS_PER_DOC - 1) // MAX_BOOKS_PER_DOC
                 self.stdout.write(f"  • '{term}' : {nb_books} livres → {parts} parties")
+
+    def update_from_manifest(self, es, alias_name, normalizer, kwargs):
+        """
+        Mise à jour incrémentale : pour chaque terme qui contenait ou contient un livre
+        du manifeste, relit ses documents, remplace les postings de ces livres et réécrit
+        le terme (mêmes règles de découpage et de routage que l'indexation complète).
+        """
+        try:
+            manifest_ids = changed_ids(read_manifest(kwargs["manifest"]))
+        except ManifestError as exc:
+            raise CommandError(str(exc))
+        mappings = es.indices.get_mapping(index=alias_name)
+        if len(mappings) != 1:
+            raise CommandError(f"'{alias_name}' doit désigner un seul index (trouvé : {', '.join(mappings) or 'aucun'})")
+        index_name, mapping = next(iter(mappings.items()))
+        meta = mapping["mappings"].get("_meta", {})
+        if meta.get("normalizer") != normalizer.fingerprint:
+            raise CommandError("Normalisation différente de celle de l'index : réindexation complète nécessaire")
+        layout = ShardLayout.from_meta(meta)
+
+        # 1) Nouveaux postings des livres du manifeste
+        corpus = CorpusReader(kwargs["corpus"]) if kwargs.get("corpus") else None
+        new_postings = defaultdict(dict)   # terme -> {book_id: count}
+        book_keys = set()
+        for book in Book.objects.filter(gutenberg_id__in=manifest_ids):
+            book_key = str(book.id)
+            book_keys.add(book_key)   # sans texte : ses anciens postings sont seulement retirés
+            source = book_text(book, corpus)
+            if source is not None:
+                for term, count in normalizer.count_terms(source[0]).items():
+                    new_postings[term][book_key] = count
+        if corpus is not None:
+            corpus.close()
+        if not book_keys:
+            self.stdout.write(self.style.WARNING("ℹ Aucun livre du manifeste dans la base : rien à indexer"))
+            return
+        self.stdout.write(f"📋 Manifeste : {len(book_keys)} livre(s), {len(new_postings)} termes")
+
+        # 2) Termes qui contenaient déjà ces livres
+        keys = sorted(book_keys)
+        old_terms = set()
+        for i in range(0, len(keys), INCREMENTAL_BATCH):
+            should = [{"exists": {"field": f"books.{key}"}} for key in keys[i:i + INCREMENTAL_BATCH]]
+            body = {"query": {"bool": {"should": should}}, "_source": ["term"]}
+            old_terms.update(hit["_source"]["term"] for hit in scan_hits(es, index_name, body))
+        affected = sorted(old_terms | set(new_postings))
+
+        # 3) Relecture, fusion et réécriture des termes concernés, par lots
+        written = deleted = 0
+        for i in range(0, len(affected), INCREMENTAL_BATCH):
+            batch_terms = affected[i:i + INCREMENTAL_BATCH]
+            current = defaultdict(dict)   # terme -> postings actuels
+            docs = defaultdict(list)      # terme -> [(_id, routage)] des documents existants
+            body = {"query": {"terms": {"term": batch_terms}}, "_source": ["term", "books"]}
+            for hit in scan_hits(es, index_name, body):
+                term = hit["_source"]["term"]
+                current[term].update(hit["_source"].get("books", {}))
+                docs[term].append((hit["_id"], hit.get("_routing")))
+
+            actions = []
+            for term in batch_terms:
+                books_dict = {bid: count for bid, count in current[term].items() if bid not in book_keys}
+                books_dict.update(new_postings.get(term, {}))
+                term_docs = term_actions(index_name, term, books_dict, layout) if books_dict else []
+                kept = {doc["_id"] for doc in term_docs}
+                actions.extend(term_docs)
+                for doc_id, routing in docs[term]:
+                    if doc_id not in kept:
+                        actions.append({"_op_type": "delete", "_index": index_name, "_id": doc_id,
+                                        **({"_routing": routing} if routing is not None else {})})
+                        deleted += 1
+                written += len(term_docs)
+            success, errors = bulk(es, actions, raise_on_error=False, request_timeout=60)
+            if errors:
+                self.stdout.write(self.style.WARNING(f"⚠ {len(errors)} erreurs d’indexation."))
+            self.stdout.write(f"  ✓ {min(i + INCREMENTAL_BATCH, len(affected))}/{len(affected)} termes mis à jour...")
+
+        es.indices.refresh(index=index_name)
+        es.indices.put_mapping(index=index_name, body={"_meta": dict(meta, revision=meta.get("revision", 0) + 1)})
+        mark_applied(kwargs["manifest"])
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Mise à jour incrémentale : {len(affected)} termes, {written} documents écrits, {deleted} supprimés."
+        ))
+        self.stdout.write("ℹ Reconstruire l'instantané (build_snapshot) et l'index positionnel s'ils sont utilisés.")
+
+    def swap_alias(self, es, alias_name, new_index):
+        """
+        Fait pointer `alias_name` sur `new_index` (None : supprime l'alias) et supprime
+        les anciens index datés. Un index simple portant le nom de l'alias (avant
+        la première indexation atomique) doit être supprimé avant de créer l'alias.
+        """
+        old_indices = list(es.indices.get_alias(name=alias_name)) if es.indices.exists_alias(name=alias_name) else []
+        if new_index and not old_indices and es.indices.exists(index=alias_name):
+            es.indices.delete(index=alias_name)
+        actions = [{"remove": {"index": old, "alias": alias_name}} for old in old_indices]
+        if new_index:
+            actions.append({"add": {"index": new_index, "alias": alias_name}})
+        if actions:
+            es.indices.update_aliases(body={"actions": actions})
+        for old in old_indices:
+            if old != new_index:
+                es.indices.delete(index=old)
@@ -0,0 +1,39 @@
+import os
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from library.corpus import CorpusWriter
+
+LIBRARY_DIR = "libraryBooks"  # dossier avec les txt et metadata.json
+
+class Command(BaseCommand):
+    help = "Regroupe les .txt de libraryBooks dans un corpus zstd à accès aléatoire"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--library-dir", default=LIBRARY_DIR)
+        parser.add_argument("--output", default=settings.CORPUS_FILE)
+        parser.add_argument("--level", type=int, default=10, help="niveau de compression zstd")
+
+    def handle(self, *args, **options):
+        library_dir = options["library_dir"]
+        with open(os.path.join(library_dir, "metadata.json"), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        raw_bytes = 0
+        with CorpusWriter(options["output"], level=options["level"]) as writer:
+            for book_id, data in metadata.items():
+                text_file = os.path.join(library_dir, data["filename"])
+                if not os.path.exists(text_file):
+                    continue
+                # lecture binaire : le corpus stocke directement l'UTF-8
+                with open(text_file, "rb") as tf:
+                    content = tf.read()
+                writer.add(book_id, content)
+                raw_bytes += len(content)
+
+        packed = os.path.getsize(options["output"])
+        ratio = raw_bytes / packed if packed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"📦 {len(writer.index)} livres → {options['output']} "
+            f"({raw_bytes / 1e6:.1f} Mo → {packed / 1e6:.1f} Mo, x{ratio:.1f})"
+        ))
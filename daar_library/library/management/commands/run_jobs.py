@@ -0,0 +1,21 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from library.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Worker local de la file de tâches (reindex, build_graph, centrality)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="vide la file puis s'arrête")
+        parser.add_argument("--poll", type=float, default=1.0, help="attente entre deux scrutations (s)")
+        parser.add_argument("--stale-minutes", type=int, default=30,
+                            help="remet en file les tâches sans battement de cœur depuis ce délai")
+
+    def handle(self, *args, **options):
+        run_worker(
+            poll=options["poll"],
+            once=options["once"],
+            stale_after=timedelta(minutes=options["stale_minutes"]),
+            log=self.stdout.write,
+        )
@@ -0,0 +1,170 @@
+"""
+Instrumentation légère des requêtes : spans par phase, en-tête Server-Timing,
+histogrammes au format Prometheus et journal des requêtes lentes.
+
+    with span("es"):
+        res = es.search(...)
+
+Les spans d'une requête sont collectés dans une ContextVar ouverte par
+TimingMiddleware ; hors requête (commandes, benchmarks) span() ne fait que mesurer.
+Les histogrammes sont par processus : avec plusieurs workers gunicorn, Prometheus
+agrège les cibles (ou scrape chaque worker).
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse
+
+slow_logger = logging.getLogger("library.slow_queries")
+
+_request_spans = ContextVar("request_spans", default=None)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+class Histogram:
+    """Histogramme cumulatif Prometheus, une série par valeur de label."""
+
+    def __init__(self, name, help_text, buckets, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self.lock = threading.Lock()
+        self.series = {}   # label_value -> [counts par bucket..., +Inf], somme
+
+    def observe(self, value, label_value=""):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.series.get(label_value, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[idx] += 1
+            self.series[label_value] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted(self.series.items())
+        for label_value, (counts, total) in items:
+            prefix = f'{self.label}="{label_value}",' if self.label else ""
+            labels = f"{{{prefix.rstrip(',')}}}" if prefix else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram("library_request_seconds", "Durée totale des requêtes API", LATENCY_BUCKETS, "view")
+PHASE_SECONDS = Histogram("library_phase_seconds", "Durée par phase de traitement", LATENCY_BUCKETS, "phase")
+ES_TOOK_SECONDS = Histogram("library_es_took_seconds", "Temps 'took' rapporté par Elasticsearch", LATENCY_BUCKETS)
+ES_WALL_SECONDS = Histogram("library_es_wall_seconds", "Temps mur d'un appel Elasticsearch", LATENCY_BUCKETS)
+ES_RESPONSE_BYTES = Histogram("library_es_response_bytes", "Taille des réponses Elasticsearch", BYTES_BUCKETS)
+MATCHED_TERMS = Histogram("library_search_matched_terms", "Termes (documents ES) renvoyés par recherche", COUNT_BUCKETS)
+POSTINGS_MERGED = Histogram("library_search_postings_merged", "Postings (livre, compte) fusionnés par recherche", COUNT_BUCKETS)
+
+ALL_METRICS = [REQUEST_SECONDS, PHASE_SECONDS, ES_TOOK_SECONDS, ES_WALL_SECONDS,
+               ES_RESPONSE_BYTES, MATCHED_TERMS, POSTINGS_MERGED]
+
+
+@contextmanager
+def span(name):
+    """Mesure un bloc : histogramme par phase + entrée Server-Timing de la requête."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_SECONDS.observe(elapsed, name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def annotate(**fields):
+    """Ajoute des informations à la requête courante (motif regex, compteurs...)."""
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.annotations.update(fields)
+
+
+def record_es_response(res, wall_seconds):
+    """took ES vs temps mur, et octets reçus (Content-Length) d'une réponse ES."""
+    ES_WALL_SECONDS.observe(wall_seconds)
+    # ObjectApiResponse n'a pas de .get() : on passe par "in"
+    took = res["took"] if "took" in res else None
+    if took is not None:
+        ES_TOOK_SECONDS.observe(took / 1000)
+    meta = getattr(res, "meta", None)
+    length = meta.headers.get("content-length") if meta is not None else None
+    if length:
+        ES_RESPONSE_BYTES.observe(int(length))
+
+
+def record_search_stats(hits):
+    """Nombre de termes appariés et de postings fusionnés pour une liste de hits ES."""
+    MATCHED_TERMS.observe(len(hits))
+    postings = sum(len(hit["_source"].get("books", {})) for hit in hits)
+    POSTINGS_MERGED.observe(postings)
+    annotate(matched_terms=len(hits), postings=postings)
+
+
+class _Spans(list):
+    def __init__(self):
+        super().__init__()
+        self.annotations = {}
+
+
+class TimingMiddleware:
+    """
+    Ouvre la collecte de spans pour chaque requête, ajoute l'en-tête Server-Timing,
+    alimente library_request_seconds et journalise les requêtes lentes
+    (settings.SLOW_QUERY_MS) avec leur motif de recherche.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "SLOW_QUERY_MS", 500)
+
+    def __call__(self, request):
+        spans = _Spans()
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_spans.reset(token)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        REQUEST_SECONDS.observe(elapsed, view)
+
+        timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans]
+        timings.append(f"total;dur={elapsed * 1000:.2f}")
+        response["Server-Timing"] = ", ".join(timings)
+
+        if elapsed * 1000 >= self.slow_ms:
+            slow_logger.warning(
+                "slow query view=%s pattern=%r total_ms=%.1f spans=%s %s",
+                view, request.GET.get("q", ""), elapsed * 1000,
+                {name: round(seconds * 1000, 1) for name, seconds in spans},
+                spans.annotations,
+            )
+        return response
+
+
+def metrics_view(request):
+    """Exposition Prometheus (text/plain; version=0.0.4) des histogrammes du processus."""
+    body = "\n".join(metric.render() for metric in ALL_METRICS) + "\n"
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
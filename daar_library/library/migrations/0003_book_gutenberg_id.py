@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_remove_book_authors_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='gutenberg_id',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
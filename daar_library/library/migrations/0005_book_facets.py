@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='authors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='bookshelves',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='download_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='languages',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='subjects',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,10 +1,52 @@
 from django.db import models
 
 class Book(models.Model):
+    gutenberg_id = models.IntegerField(blank=True, null=True, db_index=True)
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255, blank=True, null=True)
     image_url = models.URLField(blank=True, null=True)
     text_content = models.TextField(blank=True, null=True)
+    # facettes Gutendex (metadata.json), indexées en bitmaps par build_facets
+    languages = models.JSONField(default=list, blank=True)
+    subjects = models.JSONField(default=list, blank=True)
+    bookshelves = models.JSONField(default=list, blank=True)
+    authors = models.JSONField(default=list, blank=True)
+    download_count = models.IntegerField(blank=True, null=True)
 
     def __str__(self):
         return self.title
+
+
+class Job(models.Model):
+    """Tâche de fond exécutée par `manage.py run_jobs` (voir library/jobs.py)."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(s, s) for s in (PENDING, RUNNING, DONE, FAILED)]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    dedup_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    progress = models.FloatField(default=0)
+    message = models.TextField(blank=True, default="")
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    worker = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            # une seule tâche identique en attente (la déduplication d'enqueue() s'appuie dessus)
+            models.UniqueConstraint(fields=["dedup_key"], condition=models.Q(status="pending"),
+                                    name="unique_pending_job"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
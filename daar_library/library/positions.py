@@ -0,0 +1,188 @@
+"""
+Index positionnel échantillonné : où apparaît un terme dans un livre.
+
+Construit en option par `index_inverted_from_db --positions` : pour chaque couple
+(terme, livre), les MAX_OFFSETS premières occurrences sont gardées, en offsets
+dans le texte source du livre :
+    "bytes" : octets UTF-8 du livre dans le corpus compressé (clé gutenberg_id),
+    "chars" : caractères de Book.text_content (base de données).
+Avec ces offsets, library/snippets.py lit quelques centaines d'octets autour
+d'une occurrence au lieu de parcourir le texte entier.
+
+Le fichier réutilise le conteneur mmap de library/snapshot.py (meta kind=positions) :
+    vocab_bytes / vocab_offsets   termes triés
+    term_ptr                      postings du terme i : [term_ptr[i], term_ptr[i+1])
+    post_books                    book_id de chaque posting (croissant par terme)
+    pos_ptr / offsets             offsets du posting j : offsets[pos_ptr[j]:pos_ptr[j+1]]
+    book_ids / book_units / book_keys   unité (0 = bytes, 1 = chars) et clé de corpus par livre
+"""
+
+import time
+from collections import Counter
+
+import numpy as np
+
+from library.published import Published
+from library.snapshot import Snapshot, SnapshotError, SnapshotWriter
+from library.text import WORD_RE
+
+MAX_OFFSETS = 4          # occurrences gardées par (terme, livre)
+UNITS = ("bytes", "chars")
+
+
+def scan_offsets(normalizer, chunks, unit="chars", max_offsets=MAX_OFFSETS):
+    """
+    Parcourt un livre (itérable de blocs de texte) : (Counter {terme: occurrences},
+    {terme: [offsets des max_offsets premières occurrences]}). Les offsets sont en
+    octets UTF-8 (unit="bytes") ou en caractères (unit="chars") depuis le début du livre.
+    Un mot coupé entre deux blocs est reporté sur le bloc suivant.
+    """
+    counts = Counter()
+    offsets = {}
+    normalize = normalizer.normalize
+    in_bytes = unit == "bytes"
+    consumed = 0   # offset du début de `text` dans le livre
+    carry = ""
+    pending = iter(chunks)
+    while True:
+        chunk = next(pending, None)
+        text = carry + chunk if chunk is not None else carry
+        if not text:
+            break
+        matches = list(WORD_RE.finditer(text))
+        carry = ""
+        if chunk is not None and matches and matches[-1].end() == len(text):
+            carry = matches.pop().group()
+        ascii_text = not in_bytes or text.isascii()
+        last_char = last_byte = 0
+        for m in matches:
+            term = normalize(m.group())
+            if term is None:
+                continue
+            counts[term] += 1
+            seen = offsets.get(term)
+            if seen is None:
+                seen = offsets[term] = []
+            elif len(seen) >= max_offsets:
+                continue
+            pos = m.start()
+            if not ascii_text:
+                last_byte += len(text[last_char:pos].encode("utf-8"))
+                last_char = pos
+                pos = last_byte
+            seen.append(consumed + pos)
+        processed = text[:len(text) - len(carry)]
+        consumed += len(processed) if ascii_text else len(processed.encode("utf-8"))
+        if chunk is None:
+            break
+    return counts, offsets
+
+
+class PositionsWriter:
+    """add_book() pour chaque livre indexé puis write(path) (publication atomique)."""
+
+    def __init__(self, max_offsets=MAX_OFFSETS):
+        self.max_offsets = max_offsets
+        self.books = []   # (book_id, unité, clé de corpus, termes, nb d'offsets, offsets)
+
+    def add_book(self, book_id, unit, key, term_offsets):
+        terms = list(term_offsets)
+        lengths = np.fromiter((len(term_offsets[t]) for t in terms), dtype=np.uint8, count=len(terms))
+        flat = np.fromiter((o for t in terms for o in term_offsets[t]), dtype=np.uint64, count=int(lengths.sum()))
+        self.books.append((int(book_id), UNITS.index(unit), -1 if key is None else int(key), terms, lengths, flat))
+
+    def write(self, path, meta=None):
+        self.books.sort(key=lambda b: b[0])
+        vocab = sorted({t for book in self.books for t in book[3]})
+        term_ids = {t: i for i, t in enumerate(vocab)}
+
+        empty_i = np.zeros(0, dtype=np.int64)
+        tids = np.concatenate([np.fromiter((term_ids[t] for t in b[3]), dtype=np.int64, count=len(b[3]))
+                               for b in self.books] or [empty_i])
+        rows = np.concatenate([np.full(len(b[3]), row, dtype=np.int64) for row, b in enumerate(self.books)] or [empty_i])
+        lengths = np.concatenate([b[4] for b in self.books] or [np.zeros(0, dtype=np.uint8)]).astype(np.int64)
+        flat = np.concatenate([b[5] for b in self.books] or [np.zeros(0, dtype=np.uint64)])
+        starts = np.zeros(len(lengths), dtype=np.int64)
+        if len(lengths):
+            np.cumsum(lengths[:-1], out=starts[1:])
+
+        # postings triés par (terme, livre)
+        order = np.lexsort((rows, tids))
+        book_ids = np.array([b[0] for b in self.books], dtype=np.int64)
+        sorted_lengths = lengths[order]
+        pos_ptr = np.zeros(len(order) + 1, dtype=np.uint64)
+        np.cumsum(sorted_lengths, out=pos_ptr[1:])
+        # offsets regroupés dans l'ordre des postings
+        gather = np.repeat(starts[order] - pos_ptr[:-1].astype(np.int64), sorted_lengths) + np.arange(int(pos_ptr[-1]))
+
+        writer = SnapshotWriter(dict(meta or {}, kind="positions", max_offsets=self.max_offsets,
+                                     built_at=time.time(), n_books=len(self.books)))
+        writer.add_strings("vocab", vocab)
+        writer.add_array("term_ptr", np.searchsorted(tids[order], np.arange(len(vocab) + 1)).astype(np.uint64))
+        writer.add_array("post_books", book_ids[rows[order]].astype(np.int32))
+        writer.add_array("pos_ptr", pos_ptr)
+        writer.add_array("offsets", flat[gather].astype(np.uint64))
+        writer.add_array("book_ids", book_ids)
+        writer.add_array("book_units", np.array([b[1] for b in self.books], dtype=np.uint8))
+        writer.add_array("book_keys", np.array([b[2] for b in self.books], dtype=np.int64))
+        writer.write(path)
+
+
+class PositionIndex:
+    """Lecture mmap d'un index positionnel (voir PositionsWriter)."""
+
+    def __init__(self, path):
+        self.snapshot = Snapshot(path)
+        if self.snapshot.meta.get("kind") != "positions":
+            raise SnapshotError(f"{path} n'est pas un index positionnel")
+        self.arrays = self.snapshot.arrays
+
+    @property
+    def meta(self):
+        return self.snapshot.meta
+
+    def term_index(self, term):
+        return self.snapshot.term_index(term)
+
+    def term_range(self, prefix):
+        """[lo, hi) des termes commençant par `prefix`."""
+        return self.snapshot.prefix_range(prefix)
+
+    def term(self, i):
+        return self.snapshot.term(i)
+
+    def source(self, book_id):
+        """("bytes", clé de corpus) ou ("chars", None) ; None si le livre n'est pas indexé."""
+        row = self.snapshot.book_row(book_id)
+        if row is None:
+            return None
+        unit = UNITS[int(self.arrays["book_units"][row])]
+        key = int(self.arrays["book_keys"][row])
+        return unit, (key if key >= 0 else None)
+
+    def offsets(self, term_index, book_id):
+        """Offsets échantillonnés du terme dans le livre (liste vide si absent)."""
+        term_ptr = self.arrays["term_ptr"]
+        lo, hi = int(term_ptr[term_index]), int(term_ptr[term_index + 1])
+        books = self.arrays["post_books"][lo:hi]
+        j = int(np.searchsorted(books, book_id))
+        if j >= len(books) or books[j] != book_id:
+            return []
+        pos_ptr = self.arrays["pos_ptr"]
+        return self.arrays["offsets"][int(pos_ptr[lo + j]):int(pos_ptr[lo + j + 1])].tolist()
+
+    def close(self):
+        self.snapshot.close()
+
+
+def _settings_path():
+    from django.conf import settings
+    return getattr(settings, "POSITIONS_FILE", None)
+
+
+_published = Published(_settings_path, PositionIndex, errors=(SnapshotError,))
+
+
+def get_positions():
+    """Index positionnel de settings.POSITIONS_FILE (rouvert s'il est republié), ou None."""
+    return _published.get()
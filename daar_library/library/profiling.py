@@ -0,0 +1,148 @@
+"""
+Profilage à la demande de requêtes réelles.
+
+Une requête est profilée si :
+ - `?profile=1` ou l'en-tête `X-Profile: 1` est présent ET l'appelant est autorisé
+   (utilisateur staff, ou en-tête `X-Profile-Token` égal à settings.PROFILE_TOKEN) ;
+ - ou, tirage aléatoire, avec la probabilité settings.PROFILE_SAMPLE_RATE.
+
+La vue tourne sous cProfile (ou pyinstrument avec `profile=pyinstrument` s'il est
+installé). Les recherches Elasticsearch de la requête sont envoyées avec
+`"profile": true` et leur sortie est conservée. Tout est écrit dans
+settings.PROFILE_DIR :
+
+    <id>.prof   stats cProfile (pstats)
+    <id>.json   méta : chemin, paramètres, durée, profils ES
+    <id>.html   rapport pyinstrument (si utilisé)
+
+L'identifiant est renvoyé dans l'en-tête X-Profile-Id ; `profile=text` renvoie
+directement le rapport texte au lieu de la réponse. La commande
+`aggregate_profiles` agrège les profils collectés.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import pstats
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+
+_es_profiles = ContextVar("es_profiles", default=None)
+
+
+def es_profiling_enabled():
+    return _es_profiles.get() is not None
+
+
+def record_es_profile(body, res):
+    """Conserve la sortie `profile` d'une recherche ES faite pendant une requête profilée."""
+    profiles = _es_profiles.get()
+    if profiles is not None and "profile" in res:
+        profiles.append({"query": body.get("query"), "took": res["took"] if "took" in res else None, "profile": res["profile"]})
+
+
+def _profile_dir():
+    path = Path(getattr(settings, "PROFILE_DIR", "profiles"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _allowed(request):
+    token = getattr(settings, "PROFILE_TOKEN", "")
+    sent = request.headers.get("X-Profile-Token", "")
+    # comparaison en temps constant (octets : compare_digest refuse les str non ASCII)
+    if token and hmac.compare_digest(sent.encode("utf-8"), token.encode("utf-8")):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+def _requested_mode(request):
+    mode = request.GET.get("profile") or request.headers.get("X-Profile")
+    if mode and mode not in ("0", "false") and _allowed(request):
+        return mode
+    rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+    if rate and random.random() < rate:
+        return "sample"
+    return None
+
+
+class ProfilingMiddleware:
+    """À placer après AuthenticationMiddleware (request.user doit être connu)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = _requested_mode(request) if request.path.startswith("/api/") else None
+        if mode is None:
+            return self.get_response(request)
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        es_profiles = []
+        token = _es_profiles.set(es_profiles)
+        start = time.perf_counter()
+        try:
+            if mode == "pyinstrument":
+                response, report = self._run_pyinstrument(request, profile_id)
+            else:
+                response, report = self._run_cprofile(request, profile_id)
+        finally:
+            _es_profiles.reset(token)
+        elapsed = time.perf_counter() - start
+
+        meta = {
+            "id": profile_id,
+            "path": request.path,
+            "params": request.GET.dict(),
+            "mode": mode,
+            "status": response.status_code,
+            "wall_ms": round(elapsed * 1000, 2),
+            "es_profiles": es_profiles,
+        }
+        (_profile_dir() / f"{profile_id}.json").write_text(json.dumps(meta), encoding="utf-8")
+
+        if mode == "text":
+            response = HttpResponse(report, content_type="text/plain; charset=utf-8")
+        response["X-Profile-Id"] = profile_id
+        return response
+
+    def _run_cprofile(self, request, profile_id):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+            # une réponse en streaming doit être consommée pour être profilée
+            if getattr(response, "streaming", False):
+                streamed = response
+                response = HttpResponse(b"".join(streamed.streaming_content), status=streamed.status_code)
+                for header, value in streamed.items():
+                    response[header] = value
+        finally:
+            profiler.disable()
+        profiler.dump_stats(str(_profile_dir() / f"{profile_id}.prof"))
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        return response, out.getvalue()
+
+    def _run_pyinstrument(self, request, profile_id):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            return self._run_cprofile(request, profile_id)
+        profiler = Profiler()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        (_profile_dir() / f"{profile_id}.html").write_text(profiler.output_html(), encoding="utf-8")
+        return response, profiler.output_text()
@@ -0,0 +1,76 @@
+"""
+Artefacts publiés sur disque (instantané, graphe, index positionnel, corpus),
+partagés par tous les threads d'un worker (gunicorn gthread, ASGI).
+
+Lecture-copie-mise à jour (RCU) : l'état courant est un tuple immuable
+(valeur, version du fichier, instant de vérification) rangé dans un seul
+attribut. Un lecteur lit cet attribut une fois, sans verrou, et obtient une
+version cohérente ; il garde sa valeur jusqu'à la fin de sa requête même si
+un rechargement a lieu entre-temps. Le rechargement (fichier republié par
+renommage atomique) construit la nouvelle valeur sous verrou puis remplace
+le tuple d'un coup : un seul thread recharge, les autres continuent de lire
+l'ancienne version. L'ancien mapping est libéré quand plus personne ne l'utilise.
+
+Les valeurs publiées ne sont jamais modifiées après construction ; l'état
+propre à une requête reste dans des variables locales.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+RECHECK_INTERVAL = 1.0   # secondes entre deux stat() du fichier
+
+_Version = namedtuple("_Version", "value stamp checked_at")
+
+
+def file_stamp(path):
+    """Version d'un fichier (mtime en ns), None s'il n'existe pas."""
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except FileNotFoundError:
+        return None
+
+
+class Published:
+    """
+    Valeur chargée depuis un fichier et rechargée quand il est republié.
+        path    : chemin, ou fonction sans argument qui le renvoie (réglages lus à la demande)
+        load    : chemin -> nouvelle valeur (immuable)
+        errors  : exceptions de `load` qui laissent la version courante en place
+    get() renvoie None tant que le fichier n'a jamais pu être chargé.
+    """
+
+    def __init__(self, path, load, errors=(), recheck=RECHECK_INTERVAL):
+        self._path = path
+        self._load = load
+        self._errors = errors
+        self._recheck = recheck
+        self._lock = threading.Lock()
+        self._current = _Version(None, None, 0.0)
+
+    def path(self):
+        return self._path() if callable(self._path) else self._path
+
+    def get(self):
+        current = self._current   # une seule lecture : version cohérente
+        if current.value is not None and time.monotonic() - current.checked_at < self._recheck:
+            return current.value
+        with self._lock:
+            current = self._current
+            now = time.monotonic()
+            if current.value is not None and now - current.checked_at < self._recheck:
+                return current.value   # rechargé par un autre thread pendant l'attente
+            path = self.path()
+            stamp = file_stamp(path)
+            value = current.value
+            if stamp is not None and (value is None or stamp != current.stamp):
+                try:
+                    value = self._load(path)
+                except self._errors:
+                    stamp = current.stamp
+            else:
+                stamp = current.stamp
+            self._current = _Version(value, stamp, now)
+            return value
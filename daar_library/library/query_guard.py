@@ -0,0 +1,288 @@
+"""
+Garde-fou des requêtes regexp : estimation du coût avant exécution.
+
+Un motif comme `.*` ou `.*a.*` correspond à presque tout le vocabulaire : ES renvoie
+des milliers de documents-termes et Python fusionne les postings de tous les livres.
+Avant d'envoyer la requête, on estime sur un échantillon du vocabulaire (rechargé à
+chaque génération de l'index) :
+
+    termes appariés  ≈ part de l'échantillon appariée × nb total de documents-termes
+    postings         ≈ somme des (livres par terme) appariés × facteur d'échelle
+
+Selon settings.QUERY_GUARD_MODE, un motif trop coûteux est :
+ - "degrade" : exécuté en top-k approximatif (au plus QUERY_GUARD_MAX_TERMS termes,
+   `terminate_after`), la réponse porte "approximate": true ;
+ - "reject"  : refusé (QueryTooExpensive -> HTTP 422).
+
+Toutes les requêtes partent avec `timeout` (ES_QUERY_TIMEOUT) ; un timeout ES
+rend aussi le résultat approximatif.
+
+L'estimation évalue le motif avec `re`, un moteur à retour arrière : un motif
+comme `(.*)*x` y est exponentiel alors que l'automate de Lucene le traite en temps
+linéaire. unsafe_regex() écarte ces motifs avant toute compilation (estimation
+par l'heuristique littérale) ; la même vérification protège les extraits KWIC
+(library/snippets.py) et la recherche dans un livre (library/book_search.py).
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+# Opérateurs Lucene sans équivalent Python : on se rabat sur l'heuristique littérale
+_UNTRANSLATABLE = re.compile(r"[~&<>#]")
+_LITERAL_SPLIT = re.compile(r"\\.|\[[^\]]*\]|\{[^}]*\}|[.*+?()|\[\]{}^$@\"~&<>#]")
+
+MAX_REGEX_LENGTH = 100   # caractères d'un motif évalué par `re`
+MAX_UNBOUNDED = 2        # quantificateurs non bornés (*, +, {n,}, @ en Lucene) par motif
+LARGE_BOUND = 100        # {m,n} : au-delà de n, compté comme non borné
+
+_QUANTIFIER = re.compile(r"[*+?][?+]?|\{(\d*)(,?)(\d*)\}[?+]?")
+
+SAMPLE_RETRY = 30.0      # secondes sans nouvel essai après un échec de chargement de l'échantillon
+
+_lock = threading.Lock()
+_sample = (None, None, float("-inf"))   # (génération de l'index, VocabularySample, instant du dernier échec)
+
+
+@dataclass
+class CostEstimate:
+    terms: int
+    postings: int
+    method: str   # "exact", "sample" ou "literal"
+
+    def as_dict(self):
+        return {"terms": self.terms, "postings": self.postings, "method": self.method}
+
+
+@dataclass
+class QueryPlan:
+    size: int                    # nombre de documents-termes demandés à ES
+    approximate: bool
+    estimate: CostEstimate | None
+    terminate_after: int | None = None
+
+    def apply(self, body):
+        """Reporte le plan dans un corps de requête ES (copie)."""
+        body = dict(body, size=self.size, timeout=getattr(settings, "ES_QUERY_TIMEOUT", "2s"))
+        if self.terminate_after:
+            body["terminate_after"] = self.terminate_after
+        return body
+
+
+class QueryTooExpensive(Exception):
+    def __init__(self, pattern, estimate):
+        self.pattern = pattern
+        self.estimate = estimate
+        super().__init__(
+            f"Motif trop coûteux : ~{estimate.terms} termes / ~{estimate.postings} postings "
+            f"(limites {max_terms()} / {max_postings()})"
+        )
+
+
+def max_terms():
+    return getattr(settings, "QUERY_GUARD_MAX_TERMS", 2000)
+
+
+def max_postings():
+    return getattr(settings, "QUERY_GUARD_MAX_POSTINGS", 200_000)
+
+
+class VocabularySample:
+    """Échantillon aléatoire de documents-termes : {terme: nb de livres du document}."""
+
+    def __init__(self, doc_freqs, total_docs):
+        self.doc_freqs = doc_freqs
+        self.total_docs = total_docs
+        self.scale = total_docs / len(doc_freqs) if doc_freqs else 0
+
+    @classmethod
+    def from_es(cls, es, index, size):
+        total = es.count(index=index)["count"]
+        res = es.search(index=index, body={
+            "size": size,
+            "_source": ["term", "books"],
+            "query": {"function_score": {"query": {"match_all": {}}, "random_score": {"seed": 42, "field": "_seq_no"}}},
+        })
+        doc_freqs = []
+        for hit in res["hits"]["hits"]:
+            doc_freqs.append((hit["_source"]["term"], len(hit["_source"].get("books", {}))))
+        return cls(doc_freqs, total)
+
+
+def get_sample():
+    """
+    Échantillon du vocabulaire de la génération courante de l'index (http_cache),
+    rechargé après une réindexation ; None si ES est indisponible. Un échec est
+    mémorisé SAMPLE_RETRY secondes : pendant ce temps, aucun appel ES.
+    """
+    global _sample
+    from library.http_cache import index_generation
+    generation = index_generation()
+    loaded_for, sample, failed_at = _sample
+    if generation is None or loaded_for == generation:
+        return sample   # ES injoignable : l'ancien échantillon (ou None) plutôt qu'un appel voué à l'échec
+    with _lock:
+        loaded_for, sample, failed_at = _sample
+        if loaded_for == generation:
+            return sample
+        if time.monotonic() - failed_at < SAMPLE_RETRY:
+            return None
+        from library.elasticsearch_client import es, INDEX_NAME
+        try:
+            sample = VocabularySample.from_es(es, INDEX_NAME, getattr(settings, "QUERY_GUARD_SAMPLE_SIZE", 5000))
+        except Exception:
+            _sample = (loaded_for, None, time.monotonic())
+            return None
+        _sample = (generation, sample, float("-inf"))
+    return sample
+
+
+def _skip_class(pattern, i):
+    """Indice qui suit la classe de caractères ouverte en `i` ([...])."""
+    j = i + 1
+    if pattern[j:j + 1] == "^":
+        j += 1
+    if pattern[j:j + 1] == "]":
+        j += 1
+    while j < len(pattern) and pattern[j] != "]":
+        j += 2 if pattern[j] == "\\" else 1
+    return j + 1
+
+
+def unsafe_regex(pattern, max_length=MAX_REGEX_LENGTH, max_unbounded=MAX_UNBOUNDED, lucene=False):
+    """
+    Raison (en anglais, renvoyée telle quelle par l'API) pour laquelle `pattern`
+    ne doit pas être exécuté par un moteur à retour arrière, ou None. Sont écartés : les motifs trop
+    longs, un quantificateur appliqué à un groupe qui contient déjà un quantificateur
+    ou une alternative ((a+)+, (.*)*, (a|a)*), les références arrière et plus de
+    `max_unbounded` quantificateurs non bornés (.*a.*b.*c). Avec lucene=True, `@`
+    (n'importe quelle chaîne) compte comme `.*` ; en syntaxe Python, c'est un littéral.
+    """
+    if len(pattern) > max_length:
+        return f"pattern too long (max {max_length} characters)"
+    groups = []        # par groupe ouvert : [contient un quantificateur, contient une alternative]
+    unbounded = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        quantified = None   # contenu de l'atome qui se termine en i : None, ou [quantificateur, alternative]
+        if c == "\\":
+            if pattern[i + 1:i + 2].isdigit() or pattern[i + 1:i + 2] in ("g", "k"):
+                return "backreferences are not allowed"
+            i += 2
+            quantified = [False, False]
+        elif c == "[":
+            i = _skip_class(pattern, i)
+            quantified = [False, False]
+        elif c == "(":
+            i += 1
+            if pattern[i:i + 1] == "?":
+                if pattern.startswith("?P=", i):
+                    return "backreferences are not allowed"
+                while i < len(pattern) and pattern[i] not in ":=!>)":
+                    i += 1
+                if pattern[i:i + 1] == ")":   # options en ligne : (?i)
+                    i += 1
+                    continue
+                i += 1
+            groups.append([False, False])
+            continue
+        elif c == ")":
+            quantified = groups.pop() if groups else [False, False]
+            i += 1
+        elif c == "|":
+            if groups:
+                groups[-1][1] = True
+            i += 1
+            continue
+        elif c == "@" and lucene:   # Lucene : n'importe quelle chaîne (.*)
+            unbounded += 1
+            if groups:
+                groups[-1][0] = True
+            i += 1
+            continue
+        else:
+            i += 1
+            quantified = [False, False]
+
+        m = _QUANTIFIER.match(pattern, i)
+        if m is not None:
+            if quantified[0] or quantified[1]:
+                return "nested quantifiers or repeated alternation"
+            if m.group().startswith(("*", "+")) or (m.group(2) and int(m.group(3) or LARGE_BOUND + 1) > LARGE_BOUND):
+                unbounded += 1
+            i = m.end()
+        if groups and (m is not None or quantified[0] or quantified[1]):
+            groups[-1][0] |= m is not None or quantified[0]
+            groups[-1][1] |= quantified[1]
+    if unbounded > max_unbounded:
+        return f"more than {max_unbounded} unbounded quantifiers"
+    return None
+
+
+def to_python_regex(pattern):
+    """
+    Regexp Lucene -> re Python (ancrée), ou None si non traduisible ou trop
+    coûteuse pour un moteur à retour arrière (unsafe_regex).
+    """
+    if _UNTRANSLATABLE.search(pattern) or unsafe_regex(pattern, lucene=True):
+        return None
+    try:
+        return re.compile(pattern.replace("@", ".*"))
+    except re.error:
+        return None
+
+
+def longest_literal(pattern):
+    return max(_LITERAL_SPLIT.split(pattern), key=len, default="")
+
+
+def estimate_cost(pattern, sample):
+    if longest_literal(pattern) == pattern:
+        # terme exact : quelques documents ES au plus (découpage en parts),
+        # l'extrapolation de l'échantillon n'a pas de sens ici
+        postings = sum(df for term, df in sample.doc_freqs if term == pattern) if sample else 0
+        return CostEstimate(terms=1, postings=postings, method="exact")
+
+    compiled = to_python_regex(pattern)
+    if compiled is not None and sample is not None and sample.doc_freqs:
+        matched = [df for term, df in sample.doc_freqs if compiled.fullmatch(term)]
+        return CostEstimate(
+            terms=round(len(matched) * sample.scale),
+            postings=round(sum(matched) * sample.scale),
+            method="sample",
+        )
+
+    # Heuristique : plus le littéral obligatoire est court, plus le motif est large
+    total = sample.total_docs if sample is not None else 0
+    avg_df = (sum(df for _, df in sample.doc_freqs) / len(sample.doc_freqs)) if sample and sample.doc_freqs else 1
+    literal = longest_literal(pattern)
+    fraction = {0: 1.0, 1: 0.5, 2: 0.1, 3: 0.02}.get(len(literal), 0.005)
+    terms = round(fraction * total)
+    return CostEstimate(terms=terms, postings=round(terms * avg_df), method="literal")
+
+
+def plan_query(pattern, requested_size):
+    """
+    Décide comment exécuter `pattern` : taille ES, approximation éventuelle.
+    Lève QueryTooExpensive en mode "reject" si le motif dépasse les limites.
+    """
+    if not getattr(settings, "QUERY_GUARD_ENABLED", True):
+        return QueryPlan(size=requested_size, approximate=False, estimate=None)
+
+    estimate = estimate_cost(pattern, get_sample())
+    if estimate.terms <= max_terms() and estimate.postings <= max_postings():
+        return QueryPlan(size=requested_size, approximate=False, estimate=estimate)
+
+    if getattr(settings, "QUERY_GUARD_MODE", "degrade") == "reject":
+        raise QueryTooExpensive(pattern, estimate)
+
+    # top-k approximatif : on ne ramène qu'une partie des termes appariés,
+    # assez pour respecter la limite de postings
+    avg_postings = estimate.postings / estimate.terms if estimate.terms else 1
+    size = max(1, min(requested_size, max_terms(), int(max_postings() / max(avg_postings, 1))))
+    return QueryPlan(size=size, approximate=True, estimate=estimate, terminate_after=size)
+
@@ -0,0 +1,93 @@
+"""
+Rendu JSON rapide (orjson) et NDJSON pour les vues de l'API.
+
+ORJSONRenderer remplace le JSONRenderer de DRF (settings.REST_FRAMEWORK) :
+orjson sérialise directement en bytes, sans passer par json.dumps + encode.
+Sans orjson installé, on retombe sur le JSONRenderer de DRF.
+
+NDJSONRenderer (?format=ndjson ou Accept: application/x-ndjson) écrit une ligne
+JSON par objet : d'abord les métadonnées de la réponse, puis un élément de
+"results" par ligne. Les vues de recherche le détectent (wants_ndjson) et
+renvoient une StreamingHttpResponse dont les résultats sont hydratés et envoyés
+par paquets, au fur et à mesure (ndjson_stream).
+"""
+
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : rendu DRF standard
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_BATCH = 100   # résultats hydratés et envoyés par paquet
+
+
+def dumps(data):
+    """Objet Python -> JSON (bytes), orjson si disponible."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+if orjson is not None:
+    class ORJSONRenderer(BaseRenderer):
+        media_type = "application/json"
+        format = "json"
+        charset = None   # JSON est toujours UTF-8 (comme le JSONRenderer de DRF)
+
+        def render(self, data, accepted_media_type=None, renderer_context=None):
+            if data is None:
+                return b""
+            return dumps(data)
+else:
+    ORJSONRenderer = JSONRenderer
+
+
+def ndjson_lines(data):
+    """Métadonnées (sans "results") puis une ligne par résultat."""
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        meta = {key: value for key, value in data.items() if key != "results"}
+        yield dumps(meta) + b"\n"
+        for row in data["results"]:
+            yield dumps(row) + b"\n"
+    else:
+        yield dumps(data) + b"\n"
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Réponses DRF non streamées (erreurs, petites vues) au format NDJSON."""
+
+    media_type = NDJSON_MEDIA_TYPE
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return b"".join(ndjson_lines(data))
+
+
+def wants_ndjson(request):
+    renderer = getattr(request, "accepted_renderer", None)
+    return renderer is not None and renderer.format == "ndjson"
+
+
+def ndjson_stream(meta, rows, hydrate, batch=NDJSON_BATCH):
+    """
+    StreamingHttpResponse NDJSON : `meta` en première ligne, puis les `rows`
+    hydratés par paquets de `batch` (hydrate(rows) -> [dict, ...]).
+    `response.data` garde les métadonnées (utilisées par le cache HTTP).
+    """
+    def generate():
+        yield dumps(meta) + b"\n"
+        for i in range(0, len(rows), batch):
+            yield b"".join(dumps(row) + b"\n" for row in hydrate(rows[i:i + batch]))
+
+    response = StreamingHttpResponse(generate(), content_type=NDJSON_MEDIA_TYPE)
+    response.data = meta
+    return response
@@ -0,0 +1,280 @@
+"""
+Cœur algorithmique de la recherche, sans Django ni Elasticsearch.
+
+Ces fonctions sont appelées par views.py et mesurées par benchmarks/bench_hot_paths.py :
+ - fusion des postings renvoyés par ES (term -> {book_id: count}),
+ - top-k avec arrêt anticipé sur postings ordonnés par impact,
+ - tri / pagination des livres,
+ - graphe de similarité (Jaccard sur les mots du titre),
+ - BFS, closeness et PageRank sur un graphe dict[int, set[int]] ou CSR,
+ - conversion en CSR et PageRank vectorisé (numpy) pour library/snapshot.py.
+"""
+
+import heapq
+
+import numpy as np
+
+from library.text import get_normalizer
+
+
+# -------------------------
+# Postings
+# -------------------------
+def merge_postings(hits):
+    """
+    Additionne les occurrences par livre sur tous les hits ES.
+    hits : [{"_source": {"books": {"<book_id>": count, ...}}}, ...]
+    Retourne {book_id (int): total_occurrences}.
+    """
+    book_map = {}
+    for hit in hits:
+        for bid, count in hit["_source"]["books"].items():
+            bid_int = int(bid)
+            book_map[bid_int] = book_map.get(bid_int, 0) + count
+    return book_map
+
+
+def rank_books(book_map):
+    """
+    [(book_id, score), ...] triés par score décroissant, puis book_id croissant :
+    ordre total, stable d'une requête à l'autre (pagination par curseur).
+    """
+    return sorted(book_map.items(), key=lambda x: (-x[1], x[0]))
+
+
+def paginate(sorted_books, page, size):
+    start = (page - 1) * size
+    return sorted_books[start:start + size]
+
+
+def impact_topk(blocks, fetch_postings, k, batch_size=16, postings_budget=None):
+    """
+    Top-k par somme des counts, sans lire toutes les postings (style MaxScore par blocs).
+
+    blocks         : [(doc_id, max_count), ...] documents-termes appariés par la requête ;
+                     max_count borne les counts du document (postings ordonnés par impact).
+    fetch_postings : fetch_postings(doc_ids, only_books=None) -> itérable de dicts
+                     {book_id: count} ; only_books restreint aux livres donnés.
+    k              : nombre de livres voulus (page * size).
+
+    Les blocs sont lus par max_count décroissant, par lots de taille croissante.
+    Avec R = somme des max_count non lus, un livre hors du top-k ne peut dépasser
+    (k+1)-ième score partiel + R : dès que le k-ième score partiel atteint cette borne,
+    l'ensemble du top-k est exact. Les blocs restants ne sont alors relus que pour
+    les k livres retenus, afin que leurs scores soient exacts.
+
+    Retourne (scores, exact, postings_read) : scores partiels de tous les livres vus
+    (exacts pour le top-k), exact=False si postings_budget a interrompu la recherche.
+    """
+    if k <= 0:
+        return {}, True, 0
+    pending = sorted(blocks, key=lambda b: -b[1])
+    remaining = sum(max_count for _, max_count in pending)
+    scores = {}
+    postings_read = 0
+    exact = False
+    i = 0
+
+    while i < len(pending):
+        batch = pending[i:i + batch_size]
+        i += len(batch)
+        batch_size *= 2
+        for books in fetch_postings([doc_id for doc_id, _ in batch]):
+            for bid, count in books.items():
+                bid_int = int(bid)
+                scores[bid_int] = scores.get(bid_int, 0) + count
+            postings_read += len(books)
+        remaining -= sum(max_count for _, max_count in batch)
+
+        top = heapq.nlargest(k + 1, scores.values())
+        if len(top) >= k:
+            next_best = top[k] if len(top) > k else 0
+            if top[k - 1] >= next_best + remaining:
+                exact = True
+                break
+        if postings_budget and postings_read >= postings_budget:
+            break
+    else:
+        exact = True   # tout a été lu
+
+    # Finalisation : les blocs non lus ne sont relus que pour les livres du top-k
+    if i < len(pending):
+        top_ids = [bid for bid, _ in heapq.nlargest(k, scores.items(), key=lambda x: x[1])]
+        for books in fetch_postings([doc_id for doc_id, _ in pending[i:]], only_books=top_ids):
+            for bid, count in books.items():
+                bid_int = int(bid)
+                scores[bid_int] = scores.get(bid_int, 0) + count
+
+    return scores, exact, postings_read
+
+
+# -------------------------
+# Graphe de similarité
+# -------------------------
+def title_words(title):
+    """Termes normalisés (> 3 lettres) d'un titre, utilisés pour la similarité entre livres."""
+    return {w for w in get_normalizer().tokens(title) if len(w) > 3}
+
+
+def similarity_graph(book_words, threshold=0.1, weights=None):
+    """
+    book_words : {book_id: set(mots)}
+    Relie deux livres si la similarité de Jaccard de leurs mots dépasse `threshold`.
+    Retourne {book_id: set(voisins)} ; si `weights` est un dict, il reçoit
+    {(b1, b2): jaccard} pour chaque arête (b1 < b2).
+    """
+    graph = {bid: set() for bid in book_words}
+    ids = sorted(book_words)
+    for i, b1 in enumerate(ids):
+        w1 = book_words[b1]
+        if not w1:
+            continue
+        for b2 in ids[i + 1:]:
+            w2 = book_words[b2]
+            if not w2:
+                continue
+            intersection = len(w1 & w2)
+            union = len(w1 | w2)
+            jaccard = intersection / union if union > 0 else 0
+
+            if jaccard > threshold:  # seuil de similarité
+                graph[b1].add(b2)
+                graph[b2].add(b1)
+                if weights is not None:
+                    weights[(b1, b2)] = jaccard
+    return graph
+
+
+# -------------------------
+# Centralité
+# -------------------------
+def bfs_distances(graph, start):
+    visited = {start: 0}
+    queue = [start]
+    while queue:
+        node = queue.pop(0)
+        for neighbor in graph.get(node, []):
+            if neighbor not in visited:
+                visited[neighbor] = visited[node] + 1
+                queue.append(neighbor)
+    return visited
+
+
+def bfs_sums_csr(indptr, indices, start):
+    """
+    BFS par niveaux sur un graphe CSR depuis la ligne `start`, vectorisé (numpy) :
+    (nœuds atteignables, start compris ; somme des distances).
+    """
+    visited = np.zeros(len(indptr) - 1, dtype=bool)
+    visited[start] = True
+    frontier = np.array([start], dtype=np.int64)
+    reachable, total, depth = 1, 0, 0
+    while len(frontier):
+        depth += 1
+        starts = indptr[frontier].astype(np.int64)
+        counts = indptr[frontier + 1].astype(np.int64) - starts
+        n = int(counts.sum())
+        if n == 0:
+            break
+        # positions dans `indices` de tous les voisins de la frontière
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(n)
+        neighbors = indices[offsets]
+        frontier = np.unique(neighbors[~visited[neighbors]])
+        visited[frontier] = True
+        reachable += len(frontier)
+        total += depth * len(frontier)
+    return reachable, total
+
+
+def closeness_for_ids(full_graph, book_ids):
+    """
+    Closeness (normalisation NetworkX pour graphe non connexe) des seuls `book_ids`.
+    full_graph : dict[int, set[int]], ou CSRGraph (library/graph_store.py) parcouru
+    directement sur ses tableaux indptr / indices.
+    """
+    # Nombre de nœuds total dans le graphe (pour normalisation)
+    N_total = len(full_graph)
+    csr = getattr(full_graph, "indptr", None) is not None
+
+    centrality_scores = {}
+    for node in book_ids:
+        node = int(node)
+        row = full_graph.row(node) if csr else None
+        if (csr and row is None) or (not csr and node not in full_graph):
+            centrality_scores[node] = 0
+            continue
+
+        # distances dans la composante de `node` (BFS sur le graphe complet)
+        if csr:
+            reachable, total_dist = bfs_sums_csr(full_graph.indptr, full_graph.indices, row)
+        else:
+            distances = bfs_distances(full_graph, node)  # dict {n: dist}
+            reachable = len(distances)  # inclut node lui-même
+            total_dist = sum(distances.values())
+
+        if reachable <= 1:
+            centrality_scores[node] = 0
+            continue
+
+        if total_dist <= 0:
+            centrality_scores[node] = 0
+            continue
+
+        # closeness "raw" sur la composante : (reachable-1) / sumdist
+        raw = (reachable - 1) / total_dist
+
+        # normalisation pour graphe disconnexe (comme NetworkX)
+        # multiplie par (reachable-1)/(N_total-1) pour tenir compte de la taille globale
+        if N_total > 1:
+            norm = raw * ((reachable - 1) / (N_total - 1))
+        else:
+            norm = 0.0
+
+        centrality_scores[node] = norm
+
+    return centrality_scores
+
+
+def pagerank(graph, d=0.85, max_iter=20):
+    N = len(graph)
+    ranks = {node: 1/N for node in graph}
+    for _ in range(max_iter):
+        new_ranks = {}
+        for node in graph:
+            rank_sum = sum(ranks[neighbor] / len(graph[neighbor]) for neighbor in graph if node in graph[neighbor])
+            new_ranks[node] = (1 - d)/N + d * rank_sum
+        ranks = new_ranks
+    return ranks
+
+
+# -------------------------
+# CSR (numpy)
+# -------------------------
+def graph_to_csr(graph, node_ids):
+    """
+    graph : {book_id: itérable de voisins}, node_ids : ids triés (une ligne par id).
+    Retourne (indptr int64, indices int32) ; les voisins absents de node_ids sont ignorés.
+    """
+    position = {int(bid): i for i, bid in enumerate(node_ids)}
+    indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    rows = []
+    for i, bid in enumerate(node_ids):
+        row = sorted(position[int(n)] for n in graph.get(int(bid), ()) if int(n) in position)
+        rows.append(row)
+        indptr[i + 1] = indptr[i] + len(row)
+    indices = np.fromiter((j for row in rows for j in row), dtype=np.int32, count=int(indptr[-1]))
+    return indptr, indices
+
+
+def pagerank_csr(indptr, indices, d=0.85, max_iter=20):
+    """Même itération que pagerank(), en O(E) par itération sur un graphe CSR."""
+    n = len(indptr) - 1
+    if n == 0:
+        return np.zeros(0)
+    degree = np.diff(indptr)
+    sources = np.repeat(np.arange(n), degree)
+    ranks = np.full(n, 1 / n)
+    for _ in range(max_iter):
+        share = ranks[sources] / degree[sources]
+        ranks = (1 - d) / n + d * np.bincount(indices, weights=share, minlength=n)
+    return ranks
@@ -0,0 +1,235 @@
+"""
+Découpage de l'index inversé en shards par première lettre du terme.
+
+Chaque document-terme porte un champ "shard" et est indexé avec le routage
+correspondant (index_inverted_from_db) : les termes d'une même plage de lettres
+vivent sur le même shard ES. Les plages a-z sont équilibrées selon la fréquence
+des initiales (INITIAL_WEIGHTS) ; le dernier shard reçoit les autres initiales
+(alphabets non latins). Les bornes sont rangées dans le _meta du mapping : la
+recherche relit la disposition réelle de l'index, pas la configuration courante.
+
+À la requête, views.guarded_search envoie une sous-requête par shard (un seul
+es.msearch, exécuté en parallèle par ES, routage + filtre "shard") et fusionne
+les résultats. Un shard dont la plage ne peut pas contenir la première lettre
+de la regexp n'est pas interrogé : "lov.*" ne touche qu'un shard, ".*ove" tous.
+Un terme n'existant que dans un shard, les book_map partiels s'additionnent.
+
+Un index sans _meta (format antérieur) est interrogé en une seule requête.
+"""
+
+import bisect
+import re
+import string
+import threading
+from dataclasses import dataclass
+
+# part approximative (%) des mots du vocabulaire commençant par chaque lettre
+INITIAL_WEIGHTS = {
+    "a": 6.0, "b": 5.5, "c": 9.0, "d": 6.0, "e": 4.2, "f": 4.0, "g": 3.3, "h": 3.8,
+    "i": 3.7, "j": 0.8, "k": 1.0, "l": 3.2, "m": 5.5, "n": 2.3, "o": 2.8, "p": 8.0,
+    "q": 0.5, "r": 5.8, "s": 11.0, "t": 5.5, "u": 3.0, "v": 1.6, "w": 2.6, "x": 0.1,
+    "y": 0.4, "z": 0.3,
+}
+MAX_CLASS_RANGE = 256   # au-delà, une plage [x-y] n'est pas énumérée (tous les shards)
+
+_PART_SUFFIX = re.compile(r"_part\d+$")
+
+
+class ShardSearchError(Exception):
+    """Erreur renvoyée par ES pour la sous-requête d'un shard (réponse msearch)."""
+
+    def __init__(self, routing, error, status=500):
+        self.routing = routing
+        self.error = error
+        self.status = status
+        super().__init__(f"Shard {routing} : {error}")
+
+
+def letter_bounds(buckets):
+    """Premières lettres de `buckets` plages contiguës de a-z, équilibrées selon INITIAL_WEIGHTS."""
+    total = sum(INITIAL_WEIGHTS.values())
+    bounds, acc = ["a"], 0.0
+    for letter in string.ascii_lowercase:
+        if len(bounds) < buckets and acc >= total * len(bounds) / buckets:
+            bounds.append(letter)
+        acc += INITIAL_WEIGHTS[letter]
+    return bounds
+
+
+@dataclass(frozen=True)
+class ShardLayout:
+    bounds: tuple   # première lettre de chaque plage a-z ; shard len(bounds) = autres initiales
+
+    @classmethod
+    def for_shards(cls, n_shards):
+        """Disposition à n_shards (>= 2) : n_shards - 1 plages de lettres + les autres initiales."""
+        return cls(tuple(letter_bounds(n_shards - 1)))
+
+    @classmethod
+    def from_meta(cls, meta):
+        bounds = (meta or {}).get("term_shard_bounds")
+        return cls(tuple(bounds)) if bounds else None
+
+    def as_meta(self):
+        return {"term_shard_bounds": list(self.bounds)}
+
+    @property
+    def n_shards(self):
+        return len(self.bounds) + 1
+
+    def shard_of(self, term):
+        first = term[:1]
+        if "a" <= first <= "z":
+            return bisect.bisect_right(self.bounds, first) - 1
+        return len(self.bounds)
+
+    def routing(self, shard):
+        return str(shard)
+
+    def routing_for_doc_id(self, doc_id):
+        """Routage d'un document-terme d'après son _id ("<terme>" ou "<terme>_part<n>")."""
+        return self.routing(self.shard_of(_PART_SUFFIX.sub("", doc_id)))
+
+    def candidates(self, pattern):
+        """Shards pouvant contenir un terme apparié par la regexp `pattern`."""
+        chars = first_chars(pattern)
+        if chars is None:
+            return list(range(self.n_shards))
+        return sorted({self.shard_of(c) for c in chars})
+
+    def restrict(self, body, shard):
+        """Corps de requête limité aux documents du shard (le routage seul peut regrouper deux plages)."""
+        query = {"bool": {"must": [body["query"]], "filter": [{"term": {"shard": shard}}]}}
+        return dict(body, query=query)
+
+
+# ----------------------------------------------------------------------
+# Premiers caractères possibles d'une regexp Lucene
+# ----------------------------------------------------------------------
+def first_chars(pattern):
+    """
+    Ensemble des premiers caractères possibles d'un terme apparié par `pattern`,
+    ou None si on ne sait pas le borner (., \\w, groupe, classe niée, atome optionnel...).
+    """
+    if "~" in pattern or "&" in pattern:   # complément / intersection
+        return None
+    chars = set()
+    for branch in _top_level_branches(pattern):
+        first = _branch_first_chars(branch)
+        if first is None:
+            return None
+        chars |= first
+    return chars
+
+
+def _literal_escape(c):
+    """
+    Vrai si "\\c" désigne le caractère c lui-même. Lucene reconnaît \\d \\w \\s
+    (et leurs négations) : une lettre ou un chiffre échappé n'est pas borné.
+    """
+    return not c.isalnum()
+
+
+def _top_level_branches(pattern):
+    branches, start, depth, i = [], 0, 0, 0
+    in_class = in_quote = False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if in_quote:
+            in_quote = c != '"'
+        elif in_class:
+            in_class = c != "]"
+        elif c == '"':
+            in_quote = True
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            branches.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+def _branch_first_chars(branch):
+    if not branch:
+        return None
+    c = branch[0]
+    if c == "\\":
+        if len(branch) < 2 or not _literal_escape(branch[1]):
+            return None
+        first, rest = {branch[1]}, branch[2:]
+    elif c == '"':
+        end = branch.find('"', 1)
+        if end <= 1:
+            return None
+        first, rest = {branch[1]}, branch[end + 1:]
+    elif c == "[":
+        end = branch.find("]", 1)
+        if end < 0 or branch[1:2] == "^":
+            return None
+        first, rest = _class_chars(branch[1:end]), branch[end + 1:]
+        if first is None:
+            return None
+    elif c in ".()?+*{}|@#<>":
+        return None
+    else:
+        first, rest = {c}, branch[1:]
+    if rest[:1] in ("?", "*") or rest.startswith("{0") or rest.startswith("{,"):
+        return None   # atome optionnel : le terme peut commencer par l'atome suivant
+    return first
+
+
+def _class_chars(body):
+    chars, i = set(), 0
+    while i < len(body):
+        c = body[i]
+        if c == "\\" and i + 1 < len(body):
+            c = body[i + 1]
+            if not _literal_escape(c):
+                return None
+            i += 1
+        if i + 2 < len(body) and body[i + 1] == "-":
+            end = body[i + 2]
+            if end == "\\" or ord(end) - ord(c) > MAX_CLASS_RANGE:
+                return None
+            chars.update(chr(o) for o in range(ord(c), ord(end) + 1))
+            i += 3
+            continue
+        chars.add(c)
+        i += 1
+    return chars or None
+
+
+# ----------------------------------------------------------------------
+# Disposition de l'index courant
+# ----------------------------------------------------------------------
+_lock = threading.Lock()
+_layout = (False, None)   # (génération de l'index lue, ShardLayout ou None)
+
+
+def get_layout():
+    """ShardLayout de l'index "books" (relu quand l'index change), None s'il n'est pas découpé."""
+    global _layout
+    from library.http_cache import index_generation
+    generation = index_generation()
+    cached_generation, layout = _layout
+    if generation is not None and generation == cached_generation:
+        return layout
+    with _lock:
+        from library.elasticsearch_client import es, INDEX_NAME
+        try:
+            res = es.indices.get_mapping(index=INDEX_NAME)
+            metas = [data["mappings"].get("_meta") for data in res.values()]
+            layout = ShardLayout.from_meta(metas[0]) if len(metas) == 1 else None
+        except Exception:
+            layout = None
+        _layout = (generation, layout)
+    return layout
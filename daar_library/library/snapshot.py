@@ -0,0 +1,229 @@
+"""
+Instantané de l'état de recherche dans un seul fichier versionné, lu par mmap.
+
+    [MAGIC 8 o][version u32][taille de l'en-tête u32][en-tête JSON][sections alignées]
+
+L'en-tête JSON décrit chaque section (dtype numpy, offset, forme) et des métadonnées
+(date, nombre de livres...). Chaque section est un tableau numpy brut aligné sur
+64 octets : à l'ouverture on ne lit que l'en-tête, les tableaux sont des vues
+np.frombuffer sur le mmap (aucune copie, aucun parsing). Les pages sont celles du
+cache du noyau : partagées entre tous les workers qui ouvrent le même fichier, et
+avec `gunicorn --preload` l'ouverture faite dans le maître est héritée au fork.
+
+Sections :
+    vocab_bytes / vocab_offsets           termes triés (UTF-8 concaténé + offsets)
+    post_offsets / post_books / post_counts  postings CSR par terme (ordre d'impact)
+    book_ids                              ids Book triés (index de ligne = position)
+    title_*, author_*, image_url_*        colonnes texte des livres
+    graph_indptr / graph_indices          graphe de similarité CSR (positions de livres)
+    closeness / pagerank                  centralités précalculées (float32)
+
+Construit par la commande `build_snapshot`.
+"""
+
+import bisect
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from library.published import Published
+
+MAGIC = b"DAARSNAP"
+VERSION = 1
+PREAMBLE = struct.Struct("<8sII")
+ALIGN = 64
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def encode_strings(values):
+    """Liste de str -> (octets UTF-8 concaténés, offsets uint64 de taille n+1)."""
+    encoded = [(v or "").encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    if encoded:
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class SnapshotWriter:
+    """add_array()/add_strings() puis write(path) ; écriture dans .tmp puis renommage."""
+
+    def __init__(self, meta=None):
+        self.sections = {}
+        self.meta = dict(meta or {})
+
+    def add_array(self, name, array):
+        self.sections[name] = np.ascontiguousarray(array)
+
+    def add_strings(self, name, values):
+        data, offsets = encode_strings(values)
+        self.add_array(f"{name}_bytes", data)
+        self.add_array(f"{name}_offsets", offsets)
+
+    def write(self, path):
+        path = Path(path)
+        table = {}
+        offset = 0
+        for name, array in self.sections.items():
+            offset = -(-offset // ALIGN) * ALIGN
+            table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += array.nbytes
+        header = json.dumps({"sections": table, "meta": self.meta}).encode("utf-8")
+        data_start = -(-(PREAMBLE.size + len(header)) // ALIGN) * ALIGN
+
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            for name, array in self.sections.items():
+                f.seek(data_start + table[name]["offset"])
+                f.write(array.tobytes())
+        tmp.replace(path)   # publication atomique : les lecteurs voient l'ancien ou le nouveau
+
+
+class Snapshot:
+    """Lecture mmap d'un instantané ; les sections sont des vues numpy en lecture seule."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = PREAMBLE.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} n'est pas un instantané DAAR")
+        if version != VERSION:
+            raise SnapshotError(f"Version d'instantané {version} non supportée (attendu {VERSION})")
+        header = json.loads(self.mm[PREAMBLE.size:PREAMBLE.size + header_len])
+        self.meta = header["meta"]
+        data_start = -(-(PREAMBLE.size + header_len) // ALIGN) * ALIGN
+
+        self.arrays = {}
+        for name, spec in header["sections"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            self.arrays[name] = np.frombuffer(
+                self.mm, dtype=dtype, count=count, offset=data_start + spec["offset"]
+            ).reshape(spec["shape"])
+
+        self.book_ids = self.arrays["book_ids"]
+        self.n_terms = len(self.arrays["vocab_offsets"]) - 1
+
+    # ------------------------------------------------------------------
+    # Chaînes
+    # ------------------------------------------------------------------
+    def _string(self, name, i):
+        offsets = self.arrays[f"{name}_offsets"]
+        return self.arrays[f"{name}_bytes"][offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def term(self, i):
+        return self._string("vocab", i)
+
+    def terms(self):
+        """Itère sur le vocabulaire trié (décodage à la volée)."""
+        return (self.term(i) for i in range(self.n_terms))
+
+    def term_index(self, term):
+        """Position du terme (recherche dichotomique), ou None."""
+        i = bisect.bisect_left(_LazySequence(self.term, self.n_terms), term)
+        return i if i < self.n_terms and self.term(i) == term else None
+
+    def prefix_range(self, prefix):
+        """[lo, hi) des termes commençant par `prefix`."""
+        terms = _LazySequence(self.term, self.n_terms)
+        lo = bisect.bisect_left(terms, prefix)
+        return lo, bisect.bisect_left(terms, prefix + "\U0010ffff", lo)
+
+    # ------------------------------------------------------------------
+    # Postings
+    # ------------------------------------------------------------------
+    def postings(self, term_index):
+        """(book_ids int32, counts int32) du terme, par count décroissant."""
+        offsets = self.arrays["post_offsets"]
+        start, end = offsets[term_index], offsets[term_index + 1]
+        return self.arrays["post_books"][start:end], self.arrays["post_counts"][start:end]
+
+    def doc_freq(self, term_index):
+        offsets = self.arrays["post_offsets"]
+        return int(offsets[term_index + 1] - offsets[term_index])
+
+    # ------------------------------------------------------------------
+    # Livres
+    # ------------------------------------------------------------------
+    def book_row(self, book_id):
+        row = int(np.searchsorted(self.book_ids, book_id))
+        return row if row < len(self.book_ids) and self.book_ids[row] == book_id else None
+
+    def book(self, book_id):
+        """{"id", "title", "author", "image_url"} ou None si le livre est inconnu."""
+        row = self.book_row(book_id)
+        if row is None:
+            return None
+        return {
+            "id": int(book_id),
+            "title": self._string("title", row),
+            "author": self._string("author", row) or None,
+            "image_url": self._string("image_url", row) or None,
+        }
+
+    # ------------------------------------------------------------------
+    # Graphe et centralité
+    # ------------------------------------------------------------------
+    def neighbors(self, book_id):
+        row = self.book_row(book_id)
+        if row is None:
+            return []
+        indptr, indices = self.arrays["graph_indptr"], self.arrays["graph_indices"]
+        return [int(self.book_ids[j]) for j in indices[indptr[row]:indptr[row + 1]]]
+
+    def centrality(self, book_ids, method="closeness"):
+        vector = self.arrays.get(method)
+        scores = {}
+        for bid in book_ids:
+            row = self.book_row(int(bid))
+            scores[int(bid)] = float(vector[row]) if vector is not None and row is not None else 0
+        return scores
+
+    def close(self):
+        self.arrays = {}
+        self.book_ids = None
+        try:
+            self.mm.close()
+        except BufferError:
+            pass   # des vues sont encore utilisées : le mapping sera libéré par le GC
+
+
+class _LazySequence:
+    """Séquence indexable pour bisect sans matérialiser le vocabulaire."""
+
+    def __init__(self, getter, length):
+        self.getter = getter
+        self.length = length
+
+    def __getitem__(self, i):
+        return self.getter(i)
+
+    def __len__(self):
+        return self.length
+
+
+def _settings_path():
+    from django.conf import settings
+    return getattr(settings, "SNAPSHOT_FILE", None)
+
+
+_published = Published(_settings_path, Snapshot, errors=(SnapshotError,))
+
+
+def get_snapshot():
+    """
+    Instantané de settings.SNAPSHOT_FILE ouvert par processus, ou None.
+    Un instantané republié (renommage atomique par build_snapshot / la tâche
+    "centrality") est rouvert au plus published.RECHECK_INTERVAL secondes après ; les
+    requêtes en cours gardent l'ancien (library/published.py).
+    """
+    return _published.get()
@@ -0,0 +1,152 @@
+"""
+Extraits KWIC (keyword in context) des résultats de recherche.
+
+Pour chaque livre de la page, les offsets des termes appariés sont lus dans
+l'index positionnel (library/positions.py), puis SNIPPET_CONTEXT octets ou
+caractères sont lus de part et d'autre de quelques occurrences :
+ - livre du corpus compressé : CorpusReader.read_range (une frame zstd par extrait) ;
+ - sinon : SUBSTR SQL sur Book.text_content, une requête par livre pour tous ses extraits.
+Aucun texte complet n'est chargé. Chaque extrait est {"left", "match", "right"}.
+
+Les termes d'une regex sont cherchés dans le vocabulaire de l'index positionnel :
+plage du préfixe littéral, au plus MAX_SCANNED termes examinés et MAX_TERMS retenus
+(extraits incomplets pour une regex sans préfixe). Le résultat est mémorisé par
+(built_at de l'index, motif) : le cache ne retient pas les index remplacés.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from django.db.models.functions import Substr
+
+from library.models import Book
+from library.positions import get_positions
+from library.query_guard import to_python_regex
+from library.text import WORD_RE
+
+SNIPPET_CONTEXT = 120     # octets / caractères de contexte de chaque côté
+SNIPPETS_PER_BOOK = 3
+MAX_TERMS = 64            # termes d'une regex recherchés dans l'index positionnel
+MAX_SCANNED = 20_000      # termes du vocabulaire examinés au plus pour une regex
+MAX_CACHED = 256          # motifs mémorisés
+MAX_WORD = 64             # longueur lue pour le mot apparié lui-même
+
+_LITERAL_PREFIX = re.compile(r'[^\\.\[\](){}*+?|@#~&<>"^$]*')
+_SPACES = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_terms = OrderedDict()   # (built_at de l'index, motif) -> indices des termes
+
+
+def matching_terms(index, pattern):
+    """Indices (tuple) des termes de l'index positionnel appariés par `pattern` (normalisé)."""
+    key = (index.meta.get("built_at"), pattern)
+    with _lock:
+        found = _terms.get(key)
+        if found is not None:
+            _terms.move_to_end(key)
+            return found
+    found = find_terms(index, pattern)
+    with _lock:
+        _terms[key] = found
+        while len(_terms) > MAX_CACHED:
+            _terms.popitem(last=False)
+    return found
+
+
+def find_terms(index, pattern):
+    if WORD_RE.fullmatch(pattern):
+        i = index.term_index(pattern)
+        return (i,) if i is not None else ()
+    compiled = to_python_regex(pattern)
+    if compiled is None:
+        return ()
+    prefix = _LITERAL_PREFIX.match(pattern).group()
+    if prefix and pattern[len(prefix):len(prefix) + 1] in ("?", "*", "{"):
+        prefix = prefix[:-1]   # dernier caractère optionnel
+    lo, hi = index.term_range(prefix) if prefix else (0, index.snapshot.n_terms)
+    found = []
+    for i in range(lo, min(hi, lo + MAX_SCANNED)):
+        if compiled.fullmatch(index.term(i)):
+            found.append(i)
+            if len(found) >= MAX_TERMS:
+                break
+    return tuple(found)
+
+
+def pick_offsets(offsets, limit=SNIPPETS_PER_BOOK):
+    """Premières occurrences dont les fenêtres ne se chevauchent pas."""
+    picked = []
+    for offset in sorted(offsets):
+        if not picked or offset - picked[-1] > 2 * SNIPPET_CONTEXT:
+            picked.append(offset)
+            if len(picked) == limit:
+                break
+    return picked
+
+
+def kwic(left, right, truncated_left):
+    """Découpe une fenêtre en {"left", "match", "right"} sur des mots entiers."""
+    m = WORD_RE.match(right)
+    if m is None:
+        return None
+    match, right = m.group(), right[m.end():]
+    left, right = _SPACES.sub(" ", left), _SPACES.sub(" ", right)
+    if truncated_left and " " in left:
+        left = left[left.index(" ") + 1:]     # premier mot coupé
+    if " " in right:
+        right = right[:right.rindex(" ")]     # dernier mot coupé
+    return {"left": left.lstrip(), "match": match, "right": right.rstrip()}
+
+
+def read_corpus_windows(corpus, key, offsets):
+    windows = []
+    for offset in offsets:
+        start = max(0, offset - SNIPPET_CONTEXT)
+        data = corpus.read_range(key, start, offset + MAX_WORD + SNIPPET_CONTEXT)
+        rel = offset - start
+        windows.append((data[:rel].decode("utf-8", "ignore"), data[rel:].decode("utf-8", "ignore"), start > 0))
+    return windows
+
+
+def read_db_windows(book_id, offsets):
+    columns = {}
+    for i, offset in enumerate(offsets):
+        start = max(0, offset - SNIPPET_CONTEXT)
+        columns[f"w{i}"] = Substr("text_content", start + 1, offset - start + MAX_WORD + SNIPPET_CONTEXT)
+    row = Book.objects.filter(id=book_id).values(**columns).first()
+    if row is None:
+        return []
+    windows = []
+    for i, offset in enumerate(offsets):
+        text, start = row[f"w{i}"] or "", max(0, offset - SNIPPET_CONTEXT)
+        rel = offset - start
+        windows.append((text[:rel], text[rel:], start > 0))
+    return windows
+
+
+def book_snippets(index, term_ids, book_id, corpus=None):
+    source = index.source(book_id)
+    if source is None:
+        return []
+    offsets = pick_offsets(o for i in term_ids for o in index.offsets(i, book_id))
+    if not offsets:
+        return []
+    unit, key = source
+    if unit == "bytes":
+        if corpus is None or key is None or key not in corpus:
+            return []
+        windows = read_corpus_windows(corpus, key, offsets)
+    else:
+        windows = read_db_windows(book_id, offsets)
+    return [s for s in (kwic(*window) for window in windows) if s is not None]
+
+
+def attach_snippets(results, pattern, corpus=None):
+    """Ajoute "snippets" à chaque résultat {id, ...} ; listes vides sans index positionnel."""
+    index = get_positions()
+    term_ids = matching_terms(index, pattern) if index is not None and pattern else ()
+    for result in results:
+        result["snippets"] = book_snippets(index, term_ids, result["id"], corpus) if term_ids else []
+    return results
@@ -1,3 +1,505 @@
-from django.test import TestCase
+import json
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from library import views
+from library.query_guard import (
+    QueryTooExpensive, VocabularySample, estimate_cost, to_python_regex, unsafe_regex,
+)
+from library.sharding import ShardLayout, ShardSearchError, first_chars
+
+
+class UnsafeRegexTests(SimpleTestCase):
+    def test_nested_quantifiers_are_rejected(self):
+        for pattern in ["(.*)*x", "((.*)*)*x", "(a+)+$", "(a?)*", "(a|a)*b", "(x{1,3}){2,}"]:
+            with self.subTest(pattern=pattern):
+                self.assertIsNotNone(unsafe_regex(pattern))
+                self.assertIsNone(to_python_regex(pattern))
+
+    def test_backreferences_and_long_patterns_are_rejected(self):
+        self.assertIsNotNone(unsafe_regex(r"(\w+)\1"))
+        self.assertIsNotNone(unsafe_regex("(?P<a>x)(?P=a)"))
+        self.assertIsNotNone(unsafe_regex("a" * 101))
+        self.assertIsNotNone(unsafe_regex(".*a.*b.*c"))
+        self.assertIsNotNone(unsafe_regex("@a@b@", lucene=True))
+        self.assertIsNone(unsafe_regex("@a@b@"))   # syntaxe Python : @ littéral
+
+    def test_ordinary_patterns_are_accepted(self):
+        for pattern in ["love", "lov.*", "h[ée]ros", r"\w+ing", "(ab)+", "[a-z]+(ing|ed)", "(?:ab)+c",
+                        "a{1,3}b", "[(]+x", "colou?r"]:
+            with self.subTest(pattern=pattern):
+                self.assertIsNone(unsafe_regex(pattern))
+                self.assertIsNotNone(to_python_regex(pattern))
+
+    def test_catastrophic_pattern_is_estimated_without_backtracking(self):
+        sample = VocabularySample([("a" * 22 + "y", 3)] * 5000, 50_000)
+        start = time.perf_counter()
+        estimate = estimate_cost("((.*)*)*x", sample)
+        self.assertEqual(estimate.method, "literal")
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+
+class SampleCacheTests(SimpleTestCase):
+    """Échantillon du vocabulaire : rechargé à chaque génération de l'index, échecs mémorisés."""
+
+    def setUp(self):
+        from library import query_guard
+        self.generation = "books-1:uuid:0"
+        self.from_es = mock.Mock(side_effect=lambda *args: VocabularySample([("love", 3)], 10))
+        for patch in (mock.patch.object(query_guard, "_sample", (None, None, float("-inf"))),
+                      mock.patch("library.http_cache.index_generation", side_effect=lambda: self.generation),
+                      mock.patch.object(VocabularySample, "from_es", self.from_es)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_sample_is_reloaded_after_a_reindex(self):
+        from library.query_guard import get_sample
+        first = get_sample()
+        self.assertIs(get_sample(), first)
+        self.assertEqual(self.from_es.call_count, 1)
+        self.generation = "books-2:uuid:0"
+        self.assertIsNot(get_sample(), first)
+        self.assertEqual(self.from_es.call_count, 2)
+
+    def test_failures_are_remembered_for_a_while(self):
+        from library import query_guard
+        self.from_es.side_effect = ConnectionError
+        self.assertIsNone(query_guard.get_sample())
+        self.assertIsNone(query_guard.get_sample())
+        self.assertEqual(self.from_es.call_count, 1)   # pas de nouvel appel ES pendant SAMPLE_RETRY
+        self.from_es.side_effect = lambda *args: VocabularySample([("love", 3)], 10)
+        with mock.patch.object(query_guard, "SAMPLE_RETRY", 0.0):
+            self.assertIsNotNone(query_guard.get_sample())
+        self.generation = None   # ES injoignable : aucun appel, échantillon gardé
+        self.assertIsNotNone(query_guard.get_sample())
+        self.assertEqual(self.from_es.call_count, 2)
+
+
+@override_settings(QUERY_GUARD_ENABLED=True, QUERY_GUARD_MAX_TERMS=10, QUERY_GUARD_MAX_POSTINGS=1000)
+class TopkGuardTests(SimpleTestCase):
+    """exact=False (top-k par impact) passe par le même garde-fou que la recherche complète."""
+
+    def setUp(self):
+        # "a.*" apparie tout l'échantillon : ~1000 termes estimés, bien au-delà de la limite
+        sample = VocabularySample([(f"a{i}", 5) for i in range(100)], 1000)
+        self.bodies = []
+        patches = [
+            mock.patch("library.query_guard.get_sample", return_value=sample),
+            mock.patch("library.views.get_layout", return_value=None),
+            mock.patch("library.views.es_search", side_effect=self.fake_search),
+            mock.patch("library.views.fetch_term_postings",
+                       side_effect=lambda ids, only_books=None: ({"1": 2, "2": 1} for _ in ids)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def fake_search(self, body, index=None, routing=None):
+        self.bodies.append(body)
+        hits = [{"_id": f"a{i}", "_source": {"max_count": 2}, "sort": [f"a{i}", 0]} for i in range(3)]
+        return {"timed_out": False, "hits": {"hits": hits}}
+
+    @override_settings(QUERY_GUARD_MODE="reject")
+    def test_expensive_topk_is_rejected_before_es(self):
+        with self.assertRaises(QueryTooExpensive):
+            views.collect_book_map("a.*", views.search_body("a.*", regex=True), 10, exact=False)
+        self.assertEqual(self.bodies, [])
+
+    @override_settings(QUERY_GUARD_MODE="degrade")
+    def test_expensive_topk_is_limited_and_approximate(self):
+        scores, approximate, total_exact = views.collect_book_map(
+            "a.*", views.search_body("a.*", regex=True), 10, exact=False)
+        self.assertEqual(len(self.bodies), 1)   # pas de search_after sur tous les termes
+        self.assertLessEqual(self.bodies[0]["size"], 10)
+        self.assertIn("terminate_after", self.bodies[0])
+        self.assertTrue(approximate)
+        self.assertFalse(total_exact)
+        self.assertEqual(scores, {1: 6, 2: 3})
+
+
+class ClosenessTests(SimpleTestCase):
+    def test_csr_graph_matches_dict_graph(self):
+        from library.graph_store import from_adjacency
+        from library.search_core import closeness_for_ids
+        # deux composantes, un nœud isolé, un id absent
+        graph = {1: {2, 3}, 2: {1, 4}, 3: {1}, 4: {2, 5}, 5: {4}, 10: {11}, 11: {10}, 20: set()}
+        ids = [1, 4, 10, 20, 99]
+        expected = closeness_for_ids(graph, ids)
+        self.assertEqual(closeness_for_ids(from_adjacency(graph), ids), expected)
+        self.assertAlmostEqual(expected[1], (4 / 7) * (4 / 7))
+
+
+class FoldTests(SimpleTestCase):
+    def test_latin_and_greek_accents_are_removed(self):
+        from library.tokenizer import fold
+        self.assertEqual(fold("ÉTÉ"), "ete")
+        self.assertEqual(fold("Straße"), "strasse")
+        self.assertEqual(fold("Œuvre"), "oeuvre")
+        self.assertEqual(fold("ἀγάπη"), "αγαπη")
+        self.assertEqual(fold("ﬁn"), "fin")
+
+    def test_cyrillic_letters_keep_their_diacritics(self):
+        from library.tokenizer import fold
+        self.assertEqual(fold("Война"), "война")
+        self.assertNotEqual(fold("Война"), fold("воина"))
+        self.assertEqual(fold("Ёлка"), "ёлка")
+        self.assertEqual(fold("\u0438\u0306"), "\u0439")   # и + brève combinante -> й
+
+
+class FirstCharsTests(SimpleTestCase):
+    def test_literal_prefixes(self):
+        self.assertEqual(first_chars("lov.*"), {"l"})
+        self.assertEqual(first_chars("love|hate"), {"l", "h"})
+        self.assertEqual(first_chars("[bc]at"), {"b", "c"})
+        self.assertEqual(first_chars("[a-c]x"), {"a", "b", "c"})
+        self.assertEqual(first_chars('"ab"c'), {"a"})
+        self.assertEqual(first_chars(r"\.x"), {"."})
+        self.assertEqual(first_chars(r"[\-x]y"), {"-", "x"})
+
+    def test_unbounded_prefixes(self):
+        for pattern in [".*ove", "(lo)ve", "l?ove", "[^a]x", "a~b", "", "x|.*"]:
+            with self.subTest(pattern=pattern):
+                self.assertIsNone(first_chars(pattern))
+
+    def test_escape_classes_are_not_literals(self):
+        for pattern in [r"\w+ing", r"\d+", r"\s", r"\W", r"[\w]ove", r"[a\d]x", r"love|\wate"]:
+            with self.subTest(pattern=pattern):
+                self.assertIsNone(first_chars(pattern))
+        self.assertEqual(ShardLayout.for_shards(4).candidates(r"\w+ing"), [0, 1, 2, 3])
+
+
+class ShardErrorResponseTests(SimpleTestCase):
+    def search(self, exc):
+        request = RequestFactory().get("/api/search_regex/", {"q": "lov.*"})
+        with mock.patch("library.views.ranked_search", side_effect=exc):
+            return views.search_response(request, regex=True)
+
+    def test_shard_failure_is_a_bad_gateway(self):
+        response = self.search(ShardSearchError("1", {"type": "node_disconnected"}, 500))
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("Shard 1", response.data["error"])
+
+    def test_rejected_query_keeps_its_client_status(self):
+        response = self.search(ShardSearchError("0", {"type": "too_complex_to_determinize"}, 400))
+        self.assertEqual(response.status_code, 400)
+
+
+class FakePositions:
+    """Vocabulaire trié minimal (interface de PositionIndex utilisée par matching_terms)."""
+
+    def __init__(self, terms, built_at):
+        self.terms = sorted(terms)
+        self.meta = {"built_at": built_at}
+        self.snapshot = mock.Mock(n_terms=len(self.terms))
+        self.reads = 0
+
+    def term_index(self, term):
+        return self.terms.index(term) if term in self.terms else None
+
+    def term_range(self, prefix):
+        hits = [i for i, t in enumerate(self.terms) if t.startswith(prefix)]
+        return (hits[0], hits[-1] + 1) if hits else (0, 0)
+
+    def term(self, i):
+        self.reads += 1
+        return self.terms[i]
+
+
+class MatchingTermsTests(SimpleTestCase):
+    def test_scan_without_prefix_is_capped(self):
+        from library import snippets
+        index = FakePositions([f"w{i:06d}" for i in range(500)], built_at=1.0)
+        with mock.patch.object(snippets, "MAX_SCANNED", 100):
+            found = snippets.matching_terms(index, ".*9")
+        self.assertEqual(index.reads, 100)
+        self.assertEqual(found, tuple(i for i in range(100) if i % 10 == 9))
+
+    def test_cache_is_keyed_by_build_time(self):
+        from library import snippets
+        old = FakePositions(["love", "loved", "lover"], built_at=2.0)
+        self.assertEqual(snippets.matching_terms(old, "lov.*"), (0, 1, 2))
+        # même motif, index republié : relu ; même built_at : servi par le cache
+        new = FakePositions(["love", "lovely"], built_at=3.0)
+        self.assertEqual(snippets.matching_terms(new, "lov.*"), (0, 1))
+        again = FakePositions(["love", "lovely"], built_at=3.0)
+        self.assertEqual(snippets.matching_terms(again, "lov.*"), (0, 1))
+        self.assertEqual(again.reads, 0)
+
+
+class StringText:
+    """Source de book_search en mémoire (offsets en caractères), lecture éventuellement lente."""
+
+    unit = "chars"
+
+    def __init__(self, text, parallel=True, delay=0.0):
+        self.text, self.size, self.parallel, self.delay = text, len(text), parallel, delay
+
+    def window(self, lo, start, hi):
+        time.sleep(self.delay)
+        return self.text[lo:hi], start - lo, start
+
+    measure = staticmethod(len)
+
+
+class BookSearchTests(SimpleTestCase):
+    def setUp(self):
+        patch = mock.patch("library.book_search.SEGMENT_SIZE", 64)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_catastrophic_patterns_are_rejected(self):
+        from library.book_search import BookSearchError, compile_pattern
+        for pattern in ["(a+)+$", "(.*)*x", r"(\w+)\1", ".*.*x", r".{0,4000}.{0,4000}x"]:
+            with self.subTest(pattern=pattern), self.assertRaises(BookSearchError):
+                compile_pattern(pattern)
+        self.assertIsNotNone(compile_pattern(r"\bwhale\w*"))
+
+    def test_at_sign_is_literal_and_rejections_are_in_english(self):
+        from library.book_search import BookSearchError, compile_pattern
+        for pattern in ["a@b@c", r"e-?mail@\w+"]:
+            with self.subTest(pattern=pattern):
+                self.assertIsNotNone(compile_pattern(pattern))
+        with self.assertRaisesRegex(BookSearchError, "^Pattern rejected: nested quantifiers"):
+            compile_pattern("(a+)+$")
+
+    def test_prefetched_scan_matches_sequential_scan(self):
+        import re
+        from library.book_search import compile_pattern, search_book
+        text = " ".join(f"whale{i} ship" for i in range(200))
+        compiled = compile_pattern(r"whale\d+")
+        expected = [(m.start(), m.group()) for m in re.finditer(r"whale\d+", text)]
+        for parallel in (True, False):
+            with self.subTest(parallel=parallel):
+                data = search_book(StringText(text, parallel), compiled, limit=1000, timeout=5)
+                self.assertGreater(data["segments"], 4)
+                self.assertEqual([(m["offset"], m["match"]) for m in data["matches"]], expected)
+                self.assertFalse(data["truncated"] or data["timed_out"])
+        data = search_book(StringText(text), compiled, limit=10, timeout=5)
+        self.assertEqual(len(data["matches"]), 10)
+        self.assertTrue(data["truncated"])
+
+    def test_timed_out_reflects_the_wall_clock(self):
+        from library.book_search import compile_pattern, search_book
+        source = StringText("whale " * 200, delay=0.05)
+        for parallel in (True, False):
+            with self.subTest(parallel=parallel):
+                source.parallel = parallel
+                start = time.monotonic()
+                data = search_book(source, compile_pattern("whale"), limit=1000, timeout=0.1)
+                self.assertTrue(data["timed_out"])
+                self.assertLess(time.monotonic() - start, 0.5)
+                self.assertLess(len(data["matches"]), 200)
+
+    def test_quadratic_pattern_stops_near_the_deadline(self):
+        from library.book_search import compile_pattern, search_book
+        text = ("a" * 60 + "\n") * 4000   # un seul segment de 244 000 caractères, sans x
+        with mock.patch("library.book_search.SEGMENT_SIZE", 1 << 20):
+            start = time.monotonic()
+            data = search_book(StringText(text, parallel=False), compile_pattern(r"[\s\S]*x"), timeout=0.2)
+        self.assertEqual(data["segments"], 1)
+        self.assertTrue(data["timed_out"])
+        self.assertLess(time.monotonic() - start, 2.0)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "coalesce": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "coalesce-tests"}},
+    SEARCH_COALESCE_CACHE="coalesce", SEARCH_COALESCE_WAIT=5.0,
+)
+class CoalesceTests(SimpleTestCase):
+    def test_follower_reads_the_leader_result(self):
+        import threading
+        from django.core.cache import caches
+        from library import coalesce
+        cache = caches["coalesce"]
+        cache.clear()
+        self.addCleanup(cache.clear)
+        released, computed, results = threading.Event(), [], []
+
+        def leader():
+            computed.append("leader")
+            released.wait(5)
+            return "ranking"
+
+        thread = threading.Thread(target=lambda: results.append(coalesce.across_workers("k", leader)))
+        thread.start()
+        while not cache.get("coalesce:lock:k"):
+            time.sleep(0.01)
+        follower = threading.Thread(
+            target=lambda: results.append(coalesce.across_workers("k", lambda: computed.append("follower"))))
+        follower.start()
+        time.sleep(0.2)
+        self.assertEqual(results, [])   # le suiveur attend le résultat du meneur
+        released.set()
+        thread.join(5)
+        follower.join(5)
+        self.assertEqual(computed, ["leader"])
+        self.assertEqual(results, ["ranking", "ranking"])
+        self.assertIsNone(cache.get("coalesce:lock:k"))
+        self.assertEqual(coalesce.across_workers("k", lambda: "late"), "ranking")   # déposé pour RESULT_TTL
+
+    def test_follower_computes_when_the_leader_fails(self):
+        from django.core.cache import caches
+        from library import coalesce
+        cache = caches["coalesce"]
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with self.assertRaises(RuntimeError):
+            coalesce.across_workers("k", mock.Mock(side_effect=RuntimeError))
+        self.assertIsNone(cache.get("coalesce:lock:k"))
+        self.assertEqual(coalesce.across_workers("k", lambda: "follower"), "follower")
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "coalesce": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "daar_coalesce"}})
+    def test_database_cache_is_not_used(self):
+        from library import coalesce
+        self.assertIsNone(coalesce.shared_cache())
+        self.assertEqual(coalesce.across_workers("k", lambda: "ranking"), "ranking")
+
+
+class FakeTermIndex:
+    """Index "books" en mémoire : les appels ES de index_inverted_from_db --manifest."""
+
+    def __init__(self, meta, actions):
+        self.meta = meta
+        self.docs = {}   # _id -> (routage, _source)
+        self.indices = self
+        self.bulk(self, actions)
+
+    def get_mapping(self, index):
+        return {"books_1": {"mappings": {"_meta": self.meta}}}
+
+    def put_mapping(self, index, body):
+        self.meta = body["_meta"]
+
+    def refresh(self, index):
+        pass
+
+    def search(self, index, body):
+        query = body["query"]
+        if "terms" in query:
+            def wanted(source):
+                return source["term"] in query["terms"]["term"]
+        else:
+            keys = [clause["exists"]["field"].split(".", 1)[1] for clause in query["bool"]["should"]]
+
+            def wanted(source):
+                return any(key in source["books"] for key in keys)
+        hits = [{"_id": doc_id, "_routing": routing, "_source": source, "sort": [source["term"], source["part"]]}
+                for doc_id, (routing, source) in sorted(self.docs.items()) if wanted(source)]
+        return {"hits": {"hits": hits}}
+
+    def bulk(self, es, actions, **kwargs):
+        for action in actions:
+            if action.get("_op_type") == "delete":
+                del self.docs[action["_id"]]
+            else:
+                self.docs[action["_id"]] = (action.get("_routing"), action["_source"])
+        return len(actions), []
+
+    def postings(self):
+        return {source["term"]: source["books"] for _, source in self.docs.values()}
+
+
+class ManifestTests(TestCase):
+    """Application du manifeste de download_gutendex.py --sync (library/changes.py et commandes --manifest)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.manifest = self.dir / "changes.json"
+        self.manifest.write_text(json.dumps({"generated_at": "2024-01-01T00:00:00Z", "added": [3], "updated": [2]}))
+
+    def test_read_and_mark_applied(self):
+        from library.changes import ManifestError, changed_ids, mark_applied, read_manifest
+        manifest = read_manifest(self.manifest)
+        self.assertEqual(manifest, {"added": {3}, "updated": {2}})
+        self.assertEqual(changed_ids(manifest), {2, 3})
+        mark_applied(self.manifest)
+        self.assertFalse(self.manifest.exists())
+        self.assertTrue((self.dir / "changes.json.applied").exists())
+        with self.assertRaises(ManifestError):
+            read_manifest(self.manifest)
+        (self.dir / "bad.json").write_text("{not json")
+        with self.assertRaises(ManifestError):
+            read_manifest(self.dir / "bad.json")
+
+    def test_import_only_manifest_books(self):
+        from library.models import Book
+        metadata = {}
+        for book_id in (1, 2, 3):
+            (self.dir / f"{book_id}.txt").write_text(f"text of book {book_id}", encoding="utf-8")
+            metadata[str(book_id)] = {"title": f"Book {book_id}", "filename": f"{book_id}.txt",
+                                      "authors": [{"name": "Author"}], "languages": ["en"]}
+        (self.dir / "metadata.json").write_text(json.dumps(metadata), encoding="utf-8")
+        with mock.patch("library.management.commands.import_books_withImage.call_command"):
+            call_command("import_books_withImage", library_dir=str(self.dir), manifest=str(self.manifest),
+                         stdout=mock.Mock())
+        self.assertEqual(sorted(Book.objects.values_list("gutenberg_id", "text_content")),
+                         [(2, "text of book 2"), (3, "text of book 3")])
+
+    def test_incremental_index_update(self):
+        from library.management.commands import index_inverted_from_db as command
+        from library.models import Book
+        from library.sharding import ShardLayout
+        from library.text import get_normalizer
+        b1 = Book.objects.create(title="One", author="A", gutenberg_id=1, text_content="whale ship")
+        b2 = Book.objects.create(title="Two", author="A", gutenberg_id=2, text_content="whale storm")
+        b3 = Book.objects.create(title="Three", author="A", gutenberg_id=3, text_content="storm")
+        layout = ShardLayout.for_shards(4)
+        # index avant la synchronisation : le livre 2 parlait de la mer, le livre 3 n'existait pas
+        old = {"whale": {str(b1.id): 1, str(b2.id): 2}, "ship": {str(b1.id): 1}, "sea": {str(b2.id): 1}}
+        es = FakeTermIndex(dict(normalizer=get_normalizer().fingerprint, **layout.as_meta()),
+                           [doc for term, books in old.items() for doc in command.term_actions("books_1", term, books, layout)])
+        with mock.patch.object(command, "Elasticsearch", return_value=es), mock.patch.object(command, "bulk", es.bulk):
+            call_command("index_inverted_from_db", manifest=str(self.manifest), stdout=mock.Mock())
+        self.assertEqual(es.postings(), {
+            "whale": {str(b1.id): 1, str(b2.id): 1},
+            "ship": {str(b1.id): 1},
+            "storm": {str(b2.id): 1, str(b3.id): 1},
+        })
+        self.assertEqual(es.docs["storm"][0], layout.routing(layout.shard_of("storm")))
+        self.assertEqual(es.meta["revision"], 1)
+        self.assertTrue((self.dir / "changes.json.applied").exists())
+
+
+class SearchParamsTests(SimpleTestCase):
+    def test_non_positive_page_or_size_is_a_bad_request(self):
+        for params in [{"size": "0"}, {"page": "0"}, {"page": "-2"}, {"size": "x"}]:
+            with self.subTest(params=params), mock.patch("library.views.ranked_search") as ranked:
+                request = RequestFactory().get("/api/search/", {"q": "love", "exact": "false", **params})
+                response = views.search_response(request)
+                self.assertEqual(response.status_code, 400)
+                ranked.assert_not_called()
+
+    def test_impact_topk_with_empty_k(self):
+        from library.search_core import impact_topk
+        self.assertEqual(impact_topk([("a", 0)], lambda ids, only_books=None: [{}], 0), ({}, True, 0))
+
+
+class PublishedGraphTests(SimpleTestCase):
+    def test_bad_republish_keeps_the_loaded_graph(self):
+        import os
+        from library.graph_store import save_graph
+        with tempfile.TemporaryDirectory() as tmp, override_settings(GRAPH_FILE=str(Path(tmp) / "graph.dgr")):
+            path = Path(tmp) / "graph.dgr"
+            with mock.patch.object(views, "_GRAPH", views.Published(
+                    lambda: views.settings.GRAPH_FILE, views.graph_store.load_graph,
+                    errors=views._GRAPH._errors, recheck=0)), mock.patch.object(views, "enqueue") as enqueue:
+                path.write_text("{}")   # ancien graphe JSON : pas de 500, la tâche de construction est relancée
+                self.assertIsNone(views.load_graph())
+                enqueue.assert_called_once_with("build_graph")
+
+                save_graph(path, {1: {2}, 2: {1}})
+                graph = views.load_graph()
+                self.assertEqual(sorted(graph.node_ids.tolist()), [1, 2])
+                path.write_bytes(path.read_bytes()[:20])   # republication tronquée
+                os.utime(path, ns=(time.time_ns() + 10**9,) * 2)
+                self.assertIs(views.load_graph(), graph)
@@ -0,0 +1,138 @@
+"""
+Normalisation du texte : un seul découpage en mots pour tout le projet.
+
+Utilisé par l'indexation (index_inverted_from_db), le graphe de similarité
+(search_core.title_words) et la réécriture des requêtes (views.ranked_search,
+/api/complete/). Le découpage en mots et le pliage viennent de library/tokenizer.py,
+module autonome que le téléchargeur (download_gutendex.py) importe aussi.
+Les options viennent de settings.TEXT_NORMALIZATION si Django est configuré,
+sinon des valeurs par défaut.
+
+Règles :
+ - mot = suite de lettres Unicode, tous alphabets (les signes combinants sont
+   gardés : devanagari, arabe vocalisé...) ; chiffres et ponctuation séparent ;
+ - pliage : casefold (Straße -> strasse) puis suppression des accents latins
+   et grecs : été, ete et ÉTÉ -> ete ; le й cyrillique reste distinct de и ;
+ - mots vides optionnels (anglais + français), retirés de l'index ;
+ - racinisation optionnelle (Snowball via PyStemmer ou nltk).
+
+Chemin rapide : les mots sont extraits du texte brut (pas de .lower() du livre
+entier), comptés par Counter au niveau C, puis chaque forme distincte n'est
+normalisée qu'une fois (cache) : le coût de normalisation suit le vocabulaire,
+pas la taille du texte.
+"""
+
+from collections import Counter
+
+from library.tokenizer import WORD_RE, count_words, fold, iter_raw_tokens  # noqa: F401 (réexportés)
+
+STOP_WORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does
+for from had has have he her his how i if in into is it its me my no not of on or
+our she so than that the their them then there these they this those to up was we
+were what when where which who will with would you your
+au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma
+mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses
+son sur ta te tes toi ton tu un une vos votre vous
+""".split())
+
+MAX_CACHED = 500_000   # formes de surface mémorisées (vidé au-delà)
+
+
+def load_stemmer(language):
+    """Fonction de racinisation Snowball, ou None si ni PyStemmer ni nltk ne sont installés."""
+    try:
+        import Stemmer
+        return Stemmer.Stemmer(language).stemWord
+    except ImportError:
+        pass
+    try:
+        from nltk.stem.snowball import SnowballStemmer
+        return SnowballStemmer(language).stem
+    except ImportError:
+        return None
+
+
+class Normalizer:
+    def __init__(self, stop_words=True, stem=False, language="english", min_length=1):
+        self.stop_words = STOP_WORDS if stop_words is True else frozenset(stop_words or ())
+        self.language = language
+        self.min_length = min_length
+        self._stem = None
+        if stem:
+            self._stem = load_stemmer(language)
+            if self._stem is None:
+                raise RuntimeError("Racinisation demandée : installer PyStemmer (pip install PyStemmer) ou nltk")
+        self._cache = {}
+
+    @property
+    def fingerprint(self):
+        """Identifie la normalisation (à stocker avec l'index : même règles à la requête)."""
+        stem = self.language if self._stem is not None else "none"
+        return f"v2;stop={len(self.stop_words)};stem={stem};min={self.min_length}"
+
+    def normalize(self, token):
+        """Forme indexée d'un mot, ou None s'il est écarté (mot vide, trop court)."""
+        cached = self._cache.get(token, False)
+        if cached is not False:
+            return cached
+        term = fold(token)
+        if len(term) < self.min_length or term in self.stop_words:
+            term = None
+        elif self._stem is not None:
+            term = self._stem(term)
+        if len(self._cache) >= MAX_CACHED:
+            self._cache.clear()
+        self._cache[token] = term
+        return term
+
+    def tokens(self, text):
+        """Termes normalisés de `text`, dans l'ordre."""
+        normalize = self.normalize
+        for token in WORD_RE.findall(text):
+            term = normalize(token)
+            if term is not None:
+                yield term
+
+    def count_terms(self, text):
+        """
+        Counter {terme: occurrences} d'un texte (str) ou d'un itérable de blocs
+        de texte (lecture en flux, voir iter_raw_tokens).
+        """
+        raw = Counter(WORD_RE.findall(text) if isinstance(text, str) else iter_raw_tokens(text))
+        counts = Counter()
+        normalize = self.normalize
+        for token, n in raw.items():
+            term = normalize(token)
+            if term is not None:
+                counts[term] += n
+        return counts
+
+    def rewrite_query(self, pattern):
+        """
+        Motif de recherche -> motif sur le vocabulaire normalisé.
+        Un mot simple reçoit la normalisation complète ("" si c'est un mot vide) ;
+        une regex n'est que pliée (casse, accents) : ses littéraux ne sont pas racinisés.
+        """
+        pattern = pattern.strip()
+        if WORD_RE.fullmatch(pattern):
+            return self.normalize(pattern) or ""
+        return fold(pattern)
+
+
+_default = None
+
+
+def get_normalizer():
+    """Normalizer du processus, configuré par settings.TEXT_NORMALIZATION si Django l'est."""
+    global _default
+    if _default is None:
+        options = {}
+        try:
+            from django.conf import settings
+            if settings.configured:
+                options = getattr(settings, "TEXT_NORMALIZATION", {})
+        except ImportError:   # téléchargeur : Django n'est pas requis
+            pass
+        _default = Normalizer(**options)
+    return _default
@@ -0,0 +1,72 @@
+"""
+Découpage en mots et pliage (casse, accents), partagés par l'application Django
+(library/text.py : indexation, requêtes, graphe) et le téléchargeur
+(download_gutendex.py, comptage des mots).
+
+Module autonome : bibliothèque standard seulement, ni Django ni import relatif.
+Le téléchargeur l'importe depuis la racine du dépôt sous le nom
+`daar_library.library.tokenizer`, sans modifier sys.path.
+
+Pliage : casefold (Straße -> strasse), ligatures (œ -> oe), puis suppression des
+accents des seules lettres latines et grecques (été, ete et ÉTÉ -> ete ; ά -> α).
+Les autres écritures gardent leurs diacritiques : le й cyrillique n'est pas un и
+accentué (Война reste distinct de воина), ni le ё un е.
+"""
+
+import re
+import unicodedata
+
+
+def _mark_ranges(limit=0x20000):
+    """Classe regex des signes combinants (Mn, Mc, Me), en plages de code points."""
+    ranges = []
+    for c in range(limit):
+        if unicodedata.category(chr(c)) in ("Mn", "Mc", "Me"):
+            if ranges and ranges[-1][1] == c - 1:
+                ranges[-1][1] = c
+            else:
+                ranges.append([c, c])
+    return "".join(re.escape(chr(a)) + (f"-{re.escape(chr(b))}" if b > a else "") for a, b in ranges)
+
+
+# des lettres, éventuellement suivies de signes combinants et d'autres lettres
+WORD_RE = re.compile(rf"[^\W\d_]+(?:[{_mark_ranges()}]+[^\W\d_]*)*")
+_ACCENTS_RE = re.compile("[\u0300-\u036f]")
+# suites de lettres latines / grecques (et de signes combinants isolés) dont les accents sont retirés
+_LATIN_GREEK_RE = re.compile("[A-Za-z\u00c0-\u024f\u0300-\u036f\u0370-\u03ff\u1e00-\u1fff]+")
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ø": "o", "ł": "l", "đ": "d", "ı": "i"})
+
+
+def _strip_accents(match):
+    return unicodedata.normalize("NFC", _ACCENTS_RE.sub("", unicodedata.normalize("NFD", match.group())))
+
+
+def fold(text):
+    """Casefold + suppression des accents latins et grecs (sans toucher aux autres caractères)."""
+    text = text.casefold().translate(_LIGATURES)
+    if text.isascii():
+        return text
+    # NFKC : formes de compatibilité (ﬁ -> fi) et lettres précomposées (и + brève -> й)
+    return _LATIN_GREEK_RE.sub(_strip_accents, unicodedata.normalize("NFKC", text))
+
+
+def iter_raw_tokens(chunks):
+    """
+    Mots bruts d'un texte lu par blocs : un mot coupé en fin de bloc est reporté
+    sur le bloc suivant, le résultat est identique à un findall sur le texte entier.
+    """
+    carry = ""
+    for chunk in chunks:
+        text = carry + chunk
+        carry = ""
+        words = WORD_RE.findall(text)
+        if words and text.endswith(words[-1]):
+            carry = words.pop()
+        yield from words
+    if carry:
+        yield carry
+
+
+def count_words(text):
+    """Nombre de mots bruts (avant normalisation) : seuil MIN_WORDS du téléchargeur."""
+    return sum(1 for _ in WORD_RE.finditer(text))
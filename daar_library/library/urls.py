@@ -1,11 +1,15 @@
 from django.urls import path
-from .views import search_books, search_regex, book_content, get_suggestions, enhanced_search
+from .views import search_books, search_regex, book_content, get_suggestions, enhanced_search, job_status, batch, complete, book_search
 
 urlpatterns = [
     path("search/", search_books),
     path("search/regex/", search_regex),
     path("book_content/",book_content),
+    path("book_search/", book_search),
     path('suggestions/', get_suggestions), 
     path("enhanced-search/", enhanced_search),
+    path("jobs/", job_status),
+    path("batch/", batch),
+    path("complete/", complete),
 
 ]
@@ -2,183 +2,451 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from library.elasticsearch_client import es, INDEX_NAME
 from library.models import Book
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from library.elasticsearch_client import es, INDEX_NAME
-from django.http import JsonResponse
 from elasticsearch import NotFoundError
 from django.http import StreamingHttpResponse
-from django.http import JsonResponse
-from django.test import Client
-import networkx as nx
-from networkx.algorithms import centrality
-from itertools import combinations
-
-import pickle
-from pathlib import Path
-import json
-
-
-INDEX_NAME = "books"
 
-BOOK_MAP = {}          # mis à jour par les endpoints de recherche
-GRAPH = nx.Graph()     # graphe global
-CENTRALITY = {}        # centralité calculée
-SUGGESTIONS = {}       # suggestions calculées
-_LAST_BOOK_MAP = {}    # pour détecter changement
-
-GRAPH_GLOBAL = None
-CENTRALITY_GLOBAL = None
-SUGGESTIONS_GLOBAL = None
-TOP_N = 3  # nombre de suggestions par livre
-GRAPH_READY = False
+import re
+import time
+import numpy as np
+from django.conf import settings
+from django.http import HttpResponse
+from library.corpus import CorpusReader, CorpusError
+from library.search_core import (
+    merge_postings, rank_books, paginate, impact_topk,
+    closeness_for_ids, pagerank_csr,
+)
+from library.metrics import span, annotate, record_es_response, record_search_stats
+from library.profiling import es_profiling_enabled, record_es_profile
+from library.query_guard import plan_query, QueryTooExpensive
+from library.snapshot import get_snapshot
+from library import graph_store
+from library.jobs import enqueue
+from library.complete import get_prefix_index
+from library.http_cache import conditional
+from library.renderers import wants_ndjson, ndjson_stream
+from library.cursors import (
+    RankedList, InvalidCursor, CursorExpired,
+    result_set_id, get_ranked, put_ranked, encode_cursor, decode_cursor,
+)
+from library.models import Job
+from library.text import get_normalizer, fold
+from library.sharding import get_layout, ShardSearchError
+from library.snippets import attach_snippets
+from library.published import Published
+from library.facets import FacetsUnavailable, parse_filters, filters_key, facet_filter, facet_counts
+from library.bitmaps import Bitmap
+from library.coalesce import coalesced
+from library.book_search import BookSearchError, DEFAULT_LIMIT, compile_pattern, book_text, search_book
+
+
+# Aucun état modifié par les requêtes au niveau du module : les artefacts partagés
+# (instantané, graphe, corpus...) sont des versions immuables remplacées d'un bloc
+# quand leur fichier est republié (library/published.py). Sûr avec des workers
+# multi-threads (gunicorn --threads, ASGI).
+
+_GRAPH = Published(lambda: settings.GRAPH_FILE, graph_store.load_graph,   # CSRGraph mappé (format binaire)
+                   errors=(graph_store.GraphFormatError,))
+_CORPUS = Published(lambda: getattr(settings, "CORPUS_FILE", None), CorpusReader, errors=(CorpusError,))
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_corpus():
+    """CorpusReader de settings.CORPUS_FILE (rouvert s'il est republié), ou None sans corpus."""
+    return _CORPUS.get()
+
+
+def parse_byte_range(header, size):
+    """
+    "bytes=a-b" | "bytes=a-" | "bytes=-n" -> (start, end) demi-ouvert, ou None si
+    l'en-tête est absent / invalide / insatisfaisable.
+    """
+    m = _RANGE_RE.match(header.strip()) if header else None
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) + 1 if m.group(2) else size
+    else:
+        start, end = max(0, size - int(m.group(2))), size
+    end = min(end, size)
+    if start >= end:
+        return None
+    return start, end
+
+
+def corpus_book_response(request, corpus, key, title):
+    """Sert le texte d'un livre depuis le corpus ; gère l'en-tête HTTP Range (206)."""
+    size = corpus.size(key)
+    filename = f'inline; filename="{title}.txt"'
+    byte_range = parse_byte_range(request.headers.get("Range"), size)
+    if byte_range:
+        start, end = byte_range
+        response = HttpResponse(corpus.read_range(key, start, end),
+                                content_type="text/plain; charset=utf-8", status=206)
+        response["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    else:
+        response = StreamingHttpResponse(corpus.iter_chunks(key), content_type="text/plain; charset=utf-8")
+        response["Content-Length"] = str(size)
+    response["Accept-Ranges"] = "bytes"
+    response["Content-Disposition"] = filename
+    return response
 
+def es_search(body, index=INDEX_NAME, routing=None):
+    """
+    es.search instrumenté : span "es", took vs temps mur, octets reçus.
+    Pendant une requête profilée (library.profiling), ajoute "profile": true.
+    """
+    if es_profiling_enabled():
+        body = dict(body, profile=True)
+    start = time.perf_counter()
+    with span("es"):
+        res = es.search(index=index, body=body, routing=routing)
+    record_es_response(res, time.perf_counter() - start)
+    record_es_profile(body, res)
+    return res
 
-GRAPH_FILE = Path("./graph_books.json") 
-client = Client()
 
-def save_graph_to_file(graph, centrality, suggestions):
-    with GRAPH_FILE.open("wb") as f:
-        pickle.dump({
-            "graph": graph,
-            "centrality": centrality,
-            "suggestions": suggestions
-        }, f)
+def es_msearch(bodies, index=INDEX_NAME, routings=None):
+    """
+    Plusieurs recherches en un seul aller-retour (es.msearch), instrumenté comme es_search.
+    `routings` : routage de chaque recherche (None : tous les shards).
+    """
+    if es_profiling_enabled():
+        bodies = [dict(body, profile=True) for body in bodies]
+    searches = []
+    for body, routing in zip(bodies, routings or [None] * len(bodies)):
+        header = {"index": index}
+        if routing is not None:
+            header["routing"] = routing
+        searches.extend([header, body])
+    start = time.perf_counter()
+    with span("es"):
+        res = es.msearch(searches=searches)
+    record_es_response(res, time.perf_counter() - start)
+    responses = res["responses"]
+    for body, sub in zip(bodies, responses):
+        record_es_profile(body, sub)
+    return responses
+
+
+def shard_requests(pattern, body):
+    """
+    [(corps, routage), ...] : une sous-requête par shard pouvant contenir un terme
+    apparié (library/sharding.py), ou la requête seule si l'index n'est pas découpé.
+    En mode approximatif (terminate_after), la taille est répartie entre les shards.
+    """
+    layout = get_layout()
+    if layout is None:
+        return [(body, None)]
+    shards = layout.candidates(pattern)
+    annotate(shards=len(shards))
+    requests = [(layout.restrict(body, shard), layout.routing(shard)) for shard in shards]
+    if "terminate_after" in body:
+        per_shard = max(1, body["size"] // len(requests))
+        requests = [(dict(sub, size=per_shard, terminate_after=per_shard), routing) for sub, routing in requests]
+    return requests
+
+
+def run_shard_requests(requests):
+    """Réponses ES des sous-requêtes : un es.search pour une seule, sinon un es.msearch (parallèle côté ES)."""
+    if len(requests) == 1:
+        body, routing = requests[0]
+        return [es_search(body, routing=routing)]
+    return es_msearch([body for body, _ in requests], routings=[routing for _, routing in requests])
+
+
+def gather_term_hits(requests, responses, exhaustive=True):
+    """
+    Hits de toutes les sous-requêtes d'une recherche (un terme n'est que dans un
+    shard : les hits se concatènent). exhaustive : les shards dont la page est
+    pleine sont lus jusqu'au bout (search_after). Retourne (hits, timed_out) ;
+    lève ShardSearchError si un shard a répondu par une erreur.
+    """
+    hits, timed_out = [], False
+    for (body, routing), res in zip(requests, responses):
+        if "error" in res:
+            raise ShardSearchError(routing, res["error"], res.get("status", 500))
+        shard_hits = res["hits"]["hits"]
+        if res["timed_out"]:
+            timed_out = True
+        elif exhaustive:
+            shard_hits, shard_timed_out = remaining_term_hits(body, shard_hits, routing)
+            timed_out = timed_out or shard_timed_out
+        hits.extend(shard_hits)
+    return hits, timed_out
+
+
+def guarded_search(pattern, body):
+    """
+    Recherche regexp protégée par le garde-fou de coût (library/query_guard.py),
+    répartie sur les shards candidats. Retourne (hits, approximate) ;
+    lève QueryTooExpensive en mode "reject".
+    Hors mode approximatif, tous les documents-termes appariés sont lus
+    (search_after), même au-delà de la taille de page ES.
+    """
+    plan, requests = planned_requests(pattern, body)
+    hits, timed_out = gather_term_hits(requests, run_shard_requests(requests), exhaustive=not plan.approximate)
+    return hits, plan.approximate or timed_out
 
 
-@api_view(["GET"])
-def search_books(request):
-    global BOOK_MAP  
-    query = request.GET.get("q", "").lower()
-    page = int(request.GET.get("page", 1))
-    size = int(request.GET.get("size", 10))
-    start = (page - 1) * size
+def planned_requests(pattern, body):
+    """
+    (plan, sous-requêtes) : plan du garde-fou de coût pour `pattern` (taille,
+    terminate_after, timeout) reporté dans `body`, réparti sur les shards candidats.
+    Lève QueryTooExpensive en mode "reject".
+    """
+    plan = plan_query(pattern, body["size"])
+    if plan.estimate is not None:
+        annotate(estimated_terms=plan.estimate.terms, estimated_postings=plan.estimate.postings)
+    return plan, shard_requests(pattern, plan.apply(body))
 
-    if not query:
-        return Response({"page": page, "size": size, "total": 0, "results": []})
 
+def remaining_term_hits(body, hits, routing=None):
+    """
+    Complète `hits` (première page de `body`) par les pages suivantes, tant
+    qu'elles sont pleines. Retourne (hits, timed_out).
+    """
+    hits = list(hits)
+    page = hits
+    while len(page) == body["size"]:
+        res = es_search(dict(body, search_after=page[-1]["sort"]), routing=routing)
+        if res["timed_out"]:
+            return hits, True
+        page = res["hits"]["hits"]
+        hits.extend(page)
+    return hits, False
+
+
+def fetch_term_postings(doc_ids, only_books=None):
+    """
+    Postings {book_id: count} des documents-termes `doc_ids` (mget par paquets de 1000).
+    Index découpé : chaque _id est lu avec le routage de son terme.
+    """
+    includes = [f"books.{bid}" for bid in only_books] if only_books is not None else ["books"]
+    if not includes:
+        return
+    layout = get_layout()
+    for i in range(0, len(doc_ids), 1000):
+        chunk = doc_ids[i:i + 1000]
+        if layout is None:
+            res = es.mget(index=INDEX_NAME, ids=chunk, source_includes=includes)
+        else:
+            docs = [{"_id": doc_id, "routing": layout.routing_for_doc_id(doc_id)} for doc_id in chunk]
+            res = es.mget(index=INDEX_NAME, docs=docs, source_includes=includes)
+        for doc in res["docs"]:
+            if doc.get("found"):
+                yield doc["_source"].get("books", {})
+
+
+def impact_topk_search(pattern, k):
+    """
+    Top-k sur postings ordonnées par impact (search_core.impact_topk).
+    Une requête ES par shard candidat pour les métadonnées (max_count) des
+    documents-termes appariés, puis lecture des postings par blocs jusqu'à ce que le top-k soit sûr.
+    Passe par le même garde-fou de coût que guarded_search : un motif trop large
+    est refusé ou limité à une partie des termes (top-k alors non exact).
+    Retourne (scores, exact) ou None si l'index n'a pas de max_count (ancien format).
+    """
     body = {
-        "from": 0,
-        "size": 1000,
-        "query": {
-            "regexp": {
-                "term": {"value": query}
-            }
-        }
+        "size": 10000,
+        "_source": ["max_count"],
+        "query": {"regexp": {"term": {"value": pattern}}},
+        "sort": ["term", "part"],
     }
+    plan, requests = planned_requests(pattern, body)
+    hits, timed_out = gather_term_hits(requests, run_shard_requests(requests), exhaustive=not plan.approximate)
+    blocks = [(hit["_id"], hit["_source"].get("max_count")) for hit in hits]
+    if any(max_count is None for _, max_count in blocks):
+        return None
+    budget = getattr(settings, "QUERY_GUARD_MAX_POSTINGS", None)
+    with span("topk"):
+        scores, exact, postings_read = impact_topk(blocks, fetch_term_postings, k, postings_budget=budget)
+    annotate(matched_terms=len(blocks), postings=postings_read, topk_exact=exact)
+    return scores, exact and not timed_out and not plan.approximate
+
+
+def collect_book_map(pattern, body, k, exact=True):
+    """
+    {book_id: score} d'une recherche regexp, plus deux indicateurs :
+    approximate (top-k non garanti) et total_exact (faux en mode exact=False,
+    où `total` ne compte que les livres rencontrés avant l'arrêt anticipé).
+    """
+    if not exact:
+        topk = impact_topk_search(pattern, k)
+        if topk is not None:
+            scores, topk_exact = topk
+            return scores, not topk_exact, False
+
+    hits, approximate = guarded_search(pattern, body)
+    record_search_stats(hits)
+    with span("aggregate"):
+        book_map = merge_postings(hits)  # { book_id: total_occurrences }
+    return book_map, approximate, True
+
 
-    res = es.search(index=INDEX_NAME, body=body)
-    hits = res["hits"]["hits"]
-
-    # Récupérer tous les book_ids et occurrences
-    book_map = {}  # { book_id: total_occurrences }
-    for hit in hits:
-        for bid, count in hit["_source"]["books"].items():
-            bid_int = int(bid)
-            book_map[bid_int] = book_map.get(bid_int, 0) + count
-
-    total = len(book_map)
-    if total == 0:
-        return Response({"page": page, "size": size, "total": 0, "results": []})
-
-    # Pagination côté Python
-    sorted_books = sorted(book_map.items(), key=lambda x: -x[1])  # tri par occurrences
-    paginated = sorted_books[start:start + size]
-
-    # Charger les livres depuis Django
-    book_ids = [bid for bid, _ in paginated]
-    books = Book.objects.filter(id__in=book_ids)
-    books_dict = {book.id: book for book in books}
-
-    results = []
-    for bid, occ in paginated:
-        book = books_dict.get(bid)
-        if book:
-            results.append({
+def fetch_book_metadata(book_ids):
+    """
+    {book_id: {id, title, author, image_url}} pour tous les `book_ids`.
+    Métadonnées lues dans l'instantané mmap s'il existe ; requête SQL unique
+    pour les livres absents (instantané plus ancien que la base).
+    """
+    books_dict = {}
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        for bid in book_ids:
+            book = snapshot.book(bid)
+            if book is not None:
+                books_dict[bid] = book
+    missing = [bid for bid in book_ids if bid not in books_dict]
+    if missing:
+        for book in Book.objects.filter(id__in=missing):
+            books_dict[book.id] = {
                 "id": book.id,
                 "title": book.title,
                 "author": book.author,
                 "image_url": book.image_url,
-                "score": occ
-            })
+            }
+    return books_dict
 
-    return Response({"page": page, "size": size, "total": total, "results": results})
-@api_view(["GET"])
-def search_regex(request):
-    global all_books_terms
-    global BOOK_MAP  
 
-    pattern = request.GET.get("q", "").lower()
-    page = int(request.GET.get("page", 1))
-    size = int(request.GET.get("size", 10))
-    start = (page - 1) * size
+def hydrate_books(paginated, books_dict=None):
+    """[(book_id, score), ...] -> résultats {id, title, author, image_url, score}."""
+    if books_dict is None:
+        books_dict = fetch_book_metadata([bid for bid, _ in paginated])
+    return [dict(books_dict[bid], score=occ) for bid, occ in paginated if bid in books_dict]
 
-    if not pattern:
-        return Response({"page": page, "size": size, "total": 0, "results": []})
 
-    body = {
-        "query": {
-            "regexp": {
-                "term": {"value": pattern}
-            }
-        },
-        "size": 10000
-    }
+def suggestion_ids(book_id):
+    """Voisins de `book_id` dans le graphe (instantané ou graphe binaire) ; None si pas encore construit."""
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.book_row(book_id) is not None:
+        return snapshot.neighbors(book_id)
+    with span("graph_load"):
+        graph = load_graph()
+    return graph.neighbors(book_id) if graph is not None else None
 
-    es_results = es.search(index=INDEX_NAME, body=body)
-    hits = es_results["hits"]["hits"]
 
-    # Extraire book_ids et occurrences
-    book_map = {}
-    for hit in hits:
-        for bid, count in hit["_source"]["books"].items():
-            bid_int = int(bid)
-            book_map[bid_int] = book_map.get(bid_int, 0) + count
+def search_flags(data, approximate, total_exact):
+    if approximate:
+        data["approximate"] = True
+    if not total_exact:
+        data["total_exact"] = False
+    return data
 
-    
-    total_books = len(book_map)
-    if total_books == 0:
-        return Response({"page": page, "size": size, "total": 0, "results": [] })
 
+def too_expensive_response(exc):
+    return Response({"error": str(exc), "pattern": exc.pattern, "estimate": exc.estimate.as_dict()}, status=422)
 
 
-    # Pagination côté Python
-    sorted_books = sorted(book_map.items(), key=lambda x: -x[1])
-    paginated = sorted_books[start:start + size]
-    
-    top_books = [bid for bid, _ in sorted_books[:10]]  # les 10 livres les plus pertinents
-    #suggestions, centrality = generate_suggestions(book_map, all_books_terms, top_n=3)
-    #print("book_map:", book_map)
-    #print("centrality:", centrality)
-    # Charger les livres depuis Django
-
-    BOOK_MAP = book_map
-
-    book_ids = [bid for bid, _ in paginated]
-    books = Book.objects.filter(id__in=book_ids)
-    books_dict = {book.id: book for book in books}
-
-    results = []
-    for bid, occ in paginated:
-        book = books_dict.get(bid)
-        if book:
-            results.append({
-                "id": book.id,
-                "title": book.title,
-                "author": book.author,
-                "image_url": book.image_url,
-                "score": occ
-            })
+class InvalidSearchParams(ValueError):
+    pass
+
+
+def check_page(page, size):
+    """InvalidSearchParams si page ou size n'est pas un entier >= 1 (k = page * size > 0)."""
+    if page < 1 or size < 1:
+        raise InvalidSearchParams("page and size must be positive integers")
+
+
+def search_params(request):
+    """(q, page, size, exact, cursor) de la requête ; lève InvalidSearchParams."""
+    try:
+        page, size = int(request.GET.get("page", 1)), int(request.GET.get("size", 10))
+    except ValueError:
+        raise InvalidSearchParams("page and size must be positive integers")
+    check_page(page, size)
+    return (
+        request.GET.get("q", "").lower(),
+        page,
+        size,
+        request.GET.get("exact", "true").lower() != "false",
+        request.GET.get("cursor") or None,
+    )
+
+
+def rerank_with_centrality(paginated):
+    """Ajoute la closeness au score de chaque livre de la page puis retrie (centrality=true)."""
+    if not paginated:
+        return paginated
+    centrality_scores = compute_centrality_for_ids([bid for bid, _ in paginated])
+    reranked = [(bid, score + centrality_scores.get(bid, 0)) for bid, score in paginated]
+    return sorted(reranked, key=lambda x: -x[1])
+
+
+def search_response(request, regex=False, centrality=False, snippets=False):
+    """
+    Réponse commune de search_books, search_regex et enhanced_search.
+    ?cursor=<next_cursor de la page précédente> : page suivante (keyset), `page` ignoré.
+    ?format=ndjson : métadonnées puis un résultat par ligne, hydratés par paquets.
+    ?language=&subject=&bookshelf=&author= : filtres de facettes ; ?facets=true : comptes
+    par facette sur tous les résultats (library/facets.py).
+    snippets : chaque résultat porte ses extraits KWIC (library/snippets.py).
+    """
+    try:
+        query, page, size, exact, cursor = search_params(request)
+    except InvalidSearchParams as exc:
+        return Response({"error": str(exc)}, status=400)
+    if not query:
+        return Response({"page": page, "size": size, "total": 0, "next_cursor": None, "results": []})
+    filters = parse_filters(request.GET)
+    with_facets = request.GET.get("facets", "false").lower() == "true"
+
+    try:
+        data, paginated = ranked_search(query, page, size, regex, exact, cursor, filters, with_facets)
+    except QueryTooExpensive as exc:
+        return too_expensive_response(exc)
+    except FacetsUnavailable as exc:
+        return Response({"error": str(exc)}, status=503)
+    except InvalidCursor as exc:
+        return Response({"error": str(exc)}, status=400)
+    except CursorExpired as exc:
+        return Response({"error": str(exc)}, status=410)
+    except ShardSearchError as exc:
+        # erreur de requête (regexp refusée par ES) : 4xx ; panne d'un shard : 502
+        return Response({"error": str(exc)}, status=exc.status if 400 <= exc.status < 500 else 502)
+    if centrality:
+        paginated = rerank_with_centrality(paginated)
+
+    hydrate = hydrate_books
+    if snippets:
+        pattern = get_normalizer().rewrite_query(query)
+
+        def hydrate(rows):
+            results = hydrate_books(rows)
+            with span("snippets"):
+                return attach_snippets(results, pattern, get_corpus())
+
+    if wants_ndjson(request):
+        return ndjson_stream(data, paginated, hydrate)
+    with span("hydrate"):
+        data["results"] = hydrate(paginated)
+    return Response(data)
+
+
+@conditional("index", "snapshot", "facets")
+@api_view(["GET"])
+def search_books(request):
+    return search_response(request, regex=False)
+
+
+@conditional("index", "snapshot", "facets")
+@api_view(["GET"])
+def search_regex(request):
+    return search_response(request, regex=True)
+
 
-    return Response({"page": page, "size": size, "total": total_books, "results": results })
-    update_graph_if_needed(all_books_terms)
-    
 @api_view(["GET"])
 def book_content(request):
     INDEX_1="books_index"
     book_id = request.GET.get("id")
     if not book_id:
-        return JsonResponse({"error": "ID parameter is required"}, status=400)
+        return Response({"error": "ID parameter is required"}, status=400)
+
+    corpus = get_corpus()
+    if corpus is not None:
+        book = Book.objects.filter(id=book_id).only("id", "title", "gutenberg_id").first()
+        if book and book.gutenberg_id is not None and book.gutenberg_id in corpus:
+            return corpus_book_response(request, corpus, book.gutenberg_id, book.title)
 
     try:
         res = es.get(index=INDEX_1, id=book_id)
@@ -193,135 +461,75 @@ def book_content(request):
         response['Content-Disposition'] = f'inline; filename="{res["_source"].get("title","book")}.txt"'
         return response
     except NotFoundError:
-        return JsonResponse({"error": "Book not found in Elasticsearch"}, status=404)
+        return Response({"error": "Book not found in Elasticsearch"}, status=404)
     except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+        return Response({"error": str(e)}, status=500)
     
 
 
 
-def fetch_all_terms():
+@api_view(["GET"])
+def book_search(request):
     """
-    Retourne un dict {book_id: set(terms)} à partir de l'index Elasticsearch.
+    Occurrences d'une regex dans un livre : ?id=<Book.id>&q=<regex>[&limit=].
+    Chaque occurrence porte son offset (octets pour un livre du corpus, utilisable dans
+    un en-tête Range de book_content ; caractères sinon) et son contexte (library/book_search.py).
     """
-    all_books_terms = {}
-
-    # Scroll ou size élevé si l'index n'est pas trop gros
-    body = {
-        "query": {"match_all": {}},
-        "size": 10000  # récupère tous les termes
-    }
-    res = es.search(index=INDEX_NAME, body=body)
-    hits = res["hits"]["hits"]
-
-    for hit in hits:
-        term = hit["_source"]["term"]
-        books = hit["_source"]["books"]  # ex: {"3357": 40, ...}
-        for book_id in books.keys():
-            book_id = int(book_id)
-            if book_id not in all_books_terms:
-                all_books_terms[book_id] = set()
-            all_books_terms[book_id].add(term)
-
-    return all_books_terms
-    
-
-
-all_books_terms = fetch_all_terms()
-
-def build_graph_from_books():
-    print("📘 Construction du graphe depuis Django Book...")
-
-    books = Book.objects.all()
-    graph = {}
-
-    # Préparer les sets de mots pour chaque livre
-    book_words = {}
-    for book in books:
-        words = set(book.title.lower().split())  # on peut étendre au texte complet si disponible
-        words = {w for w in words if len(w) > 3}
-        book_words[book.id] = words
-        graph[book.id] = set()
-
-    # Calculer similarité Jaccard et créer les liens
-    for b1 in books:
-        for b2 in books:
-            if b1.id >= b2.id:
-                continue  # éviter doublons et auto-lien
-
-            # Similarité Jaccard
-            w1, w2 = book_words[b1.id], book_words[b2.id]
-            if not w1 or not w2:
-                continue
-            intersection = len(w1 & w2)
-            union = len(w1 | w2)
-            jaccard = intersection / union if union > 0 else 0
-
-            if jaccard > 0.1:  # seuil de similarité
-                graph[b1.id].add(b2.id)
-                graph[b2.id].add(b1.id)
-
-    # Convert sets → lists pour JSON
-    graph = {str(k): list(v) for k, v in graph.items()}
-    GRAPH_FILE.write_text(json.dumps(graph), encoding="utf-8")
-    print("✅ Graphe sauvegardé dans", GRAPH_FILE)
-
-    return graph
+    book_id = request.GET.get("id")
+    if not book_id:
+        return Response({"error": "ID parameter is required"}, status=400)
+    try:
+        compiled = compile_pattern(request.GET.get("q", ""))
+        limit = min(int(request.GET.get("limit", DEFAULT_LIMIT)), settings.BOOK_SEARCH_MAX_LIMIT)
+    except BookSearchError as exc:
+        return Response({"error": str(exc)}, status=400)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+
+    book = Book.objects.filter(id=book_id).only("id", "gutenberg_id").first()
+    source = book_text(book, get_corpus()) if book is not None else None
+    if source is None:
+        return Response({"error": "Book text not found"}, status=404)
+    with span("book_search"):
+        data = search_book(source, compiled, max(1, limit))
+    annotate(segments=data["segments"])
+    return Response({"id": book.id, "q": compiled.pattern, **data, "total": len(data["matches"])})
 
 
 def load_graph():
-    if GRAPH_FILE.exists():
-        return json.loads(GRAPH_FILE.read_text(encoding="utf-8"))
-    else:
-        return build_graph_from_books()
+    """
+    CSRGraph mappé depuis settings.GRAPH_FILE, partagé par les threads tant que le fichier ne
+    change pas. Si le graphe n'a jamais été construit, met la tâche "build_graph"
+    en file (library/jobs.py) et retourne None : le tiers web ne calcule rien.
+    """
+    graph = _GRAPH.get()
+    if graph is None:
+        enqueue("build_graph")
+    return graph
 
 
 # -------------------------
 # Calcul de centralité manuelle
 # -------------------------
 def compute_centrality_for_ids(book_ids, method="closeness"):
-    graph_data = load_graph()
-    # Construire le graphe complet comme dict[int, set[int]]
-    full_graph = {int(k): set(v) for k, v in graph_data.items()}
-
-    # Nombre de nœuds total dans le graphe (pour normalisation)
-    N_total = len(full_graph)
-
-    centrality_scores = {}
-
-    if method == "closeness":
-        for node in book_ids:
-            node = int(node)
-            if node not in full_graph:
-                centrality_scores[node] = 0
-                continue
-
-            # distances dans la composante de `node` (BFS sur le graphe complet)
-            distances = bfs_distances(full_graph, node)  # dict {n: dist}
-            reachable = len(distances)  # inclut node lui-même
+    snapshot = get_snapshot()
+    if snapshot is not None and method in snapshot.arrays:
+        # centralités précalculées par build_snapshot : lecture directe du vecteur
+        with span("centrality"):
+            return snapshot.centrality(book_ids, method)
 
-            if reachable <= 1:
-                centrality_scores[node] = 0
-                continue
-
-            # somme des distances vers tous les autres noeuds atteignables
-            total_dist = sum(distances.values())
+    with span("graph_load"):
+        full_graph = load_graph()   # CSRGraph : interface dict[int, set[int]] sans conversion
+    if full_graph is None:
+        return {int(n): 0 for n in book_ids}   # graphe en cours de construction
 
-            if total_dist <= 0:
-                centrality_scores[node] = 0
-                continue
+    with span("centrality"):
+        return _centrality(full_graph, book_ids, method)
 
-            # closeness "raw" sur la composante : (reachable-1) / sumdist
-            raw = (reachable - 1) / total_dist
 
-            # normalisation pour graphe disconnexe (comme NetworkX)
-            # multiplie par (reachable-1)/(N_total-1) pour tenir compte de la taille globale
-            if N_total > 1:
-                norm = raw * ((reachable - 1) / (N_total - 1))
-            else:
-                norm = 0.0
-
-            centrality_scores[node] = norm
+def _centrality(full_graph, book_ids, method):
+    if method == "closeness":
+        centrality_scores = closeness_for_ids(full_graph, book_ids)
 
     elif method == "betweenness":
         # placeholder simple (tu peux remplacer par une version exacte)
@@ -329,149 +537,316 @@ def compute_centrality_for_ids(book_ids, method="closeness"):
 
     elif method == "pagerank":
         # PageRank calculé sur le graphe complet ; on renvoie seulement les ids demandés
-        pr = pagerank({k: v for k, v in full_graph.items()})
-        centrality_scores = {int(n): pr.get(int(n), 0.0) for n in book_ids}
+        pr = pagerank_csr(full_graph.indptr, full_graph.indices)
+        centrality_scores = {}
+        for n in book_ids:
+            row = full_graph.row(int(n))
+            centrality_scores[int(n)] = float(pr[row]) if row is not None else 0.0
 
     else:
         centrality_scores = {int(n): 0 for n in book_ids if int(n) in full_graph}
 
     return centrality_scores
     
-def bfs_distances(graph, start):
-    visited = {start: 0}
-    queue = [start]
-    while queue:
-        node = queue.pop(0)
-        for neighbor in graph.get(node, []):
-            if neighbor not in visited:
-                visited[neighbor] = visited[node] + 1
-                queue.append(neighbor)
-    return visited
-
-
-def pagerank(graph, d=0.85, max_iter=20):
-    N = len(graph)
-    ranks = {node: 1/N for node in graph}
-    for _ in range(max_iter):
-        new_ranks = {}
-        for node in graph:
-            rank_sum = sum(ranks[neighbor] / len(graph[neighbor]) for neighbor in graph if node in graph[neighbor])
-            new_ranks[node] = (1 - d)/N + d * rank_sum
-        ranks = new_ranks
-    return ranks
-
-
 # -------------------------
 # Vues Django REST
 # -------------------------
+@conditional("snapshot", "graph")
 @api_view(["GET"])
 def get_suggestions(request):
     book_id = request.GET.get("id")
     if not book_id:
         return Response({"error": "Missing id parameter"}, status=400)
 
-    graph = load_graph()
-    suggestions = graph.get(book_id, [])
-    books = []
-    for s_id in suggestions:
-        try:
-            b = Book.objects.get(id=s_id)
-            books.append({
-                "id": b.id,
-                "title": b.title,
-                "author": b.author,
-                "image_url": b.image_url,
-            })
-        except Book.DoesNotExist:
-            continue
-    ref = Book.objects.get(id=book_id)
-    return Response({"id": book_id, "title": ref.title, "results": books})
+    suggestions = suggestion_ids(int(book_id))
+    if suggestions is None:
+        return Response({"error": "Graphe en cours de construction", "job": pending_job_id("build_graph")},
+                        status=503, headers={"Retry-After": "30"})
+    with span("hydrate"):
+        books_dict = fetch_book_metadata([int(book_id)] + suggestions)
+    ref = books_dict.get(int(book_id))
+    if ref is None:
+        return Response({"error": "Book not found"}, status=404)
+    books = [books_dict[s_id] for s_id in suggestions if s_id in books_dict]
+    return Response({"id": book_id, "title": ref["title"], "results": books})
 
 
 @api_view(["GET"])
-def enhanced_search(request):
-    pattern = request.GET.get("q", "")
-    page = int(request.GET.get("page", 1))
-    size = int(request.GET.get("size", 10))
-    regex_mode = request.GET.get("regex", "false").lower() == "true"
-    centrality_enabled = request.GET.get("centrality", "false").lower() == "true"
+def complete(request):
+    """
+    Autocomplétion : ?prefix=lov&limit=10 -> termes du vocabulaire les plus fréquents
+    commençant par le préfixe, avec le nombre de livres qu'une recherche renverrait.
+    """
+    prefix = fold(request.GET.get("prefix", ""))
+    limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+    if not prefix:
+        return Response({"prefix": prefix, "results": []})
 
-    if not pattern:
-        return JsonResponse({"page": page, "size": size, "total": 0, "results": []})
+    index = get_prefix_index()
+    if index is None:
+        return Response({"error": "Vocabulary unavailable"}, status=503)
+    with span("complete"):
+        matches = index.complete(prefix, limit)
+    return Response({"prefix": prefix, "results": [{"term": term, "hits": hits} for term, hits in matches]})
 
-    data = perform_search_logic(pattern, page=page, size=size, regex=regex_mode)
 
-    ids = [r["id"] for r in data["results"] if r["id"]]
+def pending_job_id(kind):
+    job = Job.objects.filter(kind=kind, status__in=[Job.PENDING, Job.RUNNING]).order_by("-id").first()
+    return job.id if job else None
 
-    if centrality_enabled and ids:
-        centrality_scores = compute_centrality_for_ids(ids)
-        for r in data["results"]:
-            bid = r["id"]
-            r["score"] = r.get("score", 0) + centrality_scores.get(bid, 0)
-        data["results"].sort(key=lambda x: -x.get("score", 0))
 
-    return JsonResponse(data)
+@api_view(["GET"])
+def job_status(request):
+    """État des tâches de fond : ?id=<job> ou les 20 dernières."""
+    fields = ["id", "kind", "params", "status", "progress", "message", "result", "error",
+              "created_at", "started_at", "finished_at"]
+    job_id = request.GET.get("id")
+    if job_id:
+        job = Job.objects.filter(id=job_id).values(*fields).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=404)
+        return Response(job)
+    return Response({"results": list(Job.objects.order_by("-id").values(*fields)[:20])})
+
+
+@conditional("index", "snapshot", "graph", "positions", "facets")
+@api_view(["GET"])
+def enhanced_search(request):
+    regex_mode = request.GET.get("regex", "false").lower() == "true"
+    centrality_enabled = request.GET.get("centrality", "false").lower() == "true"
+    snippets_enabled = request.GET.get("snippets", "false").lower() == "true"
+    return search_response(request, regex=regex_mode, centrality=centrality_enabled, snippets=snippets_enabled)
+
 
-def perform_search_logic(query, page=1, size=10, regex=False):
+def search_body(pattern, regex=False):
     """
-    Retourne le dict {page, size, total, results} comme search_books ou search_regex.
+    Corps ES d'une recherche : regex (pages de 10000 documents-termes) ou normale
+    (pages de 1000). Le tri (term, part) permet de lire les pages suivantes par search_after.
     """
-    start = (page - 1) * size
-
     if regex:
         # Search regex
-        body = {
+        return {
             "query": {
                 "regexp": {
-                    "term": {"value": query.lower()}
+                    "term": {"value": pattern}
                 }
             },
-            "size": 10000
+            "size": 10000,
+            "sort": ["term", "part"],
         }
-    else:
-        # Search normal
-        body = {
-            "from": 0,
-            "size": 1000,
-            "query": {
-                "regexp": {  # ou match selon ton search_books
-                    "term": {"value": query.lower()}
-                }
+    # Search normal
+    return {
+        "size": 1000,
+        "query": {
+            "regexp": {  # ou match selon ton search_books
+                "term": {"value": pattern}
             }
-        }
+        },
+        "sort": ["term", "part"],
+    }
 
-    res = es.search(index=INDEX_NAME, body=body)
-    hits = res["hits"]["hits"]
-
-    # Récupérer book_ids et occurrences
-    book_map = {}
-    for hit in hits:
-        for bid, count in hit["_source"]["books"].items():
-            bid_int = int(bid)
-            book_map[bid_int] = book_map.get(bid_int, 0) + count
-
-    total = len(book_map)
-    if total == 0:
-        return {"page": page, "size": size, "total": 0, "results": []}
-
-    # Pagination
-    sorted_books = sorted(book_map.items(), key=lambda x: -x[1])
-    paginated = sorted_books[start:start + size]
-
-    book_ids = [bid for bid, _ in paginated]
-    books = Book.objects.filter(id__in=book_ids)
-    books_dict = {book.id: book for book in books}
-
-    results = []
-    for bid, occ in paginated:
-        book = books_dict.get(bid)
-        if book:
-            results.append({
-                "id": book.id,
-                "title": book.title,
-                "author": book.author,
-                "image_url": book.image_url,
-                "score": occ
-            })
 
-    return {"page": page, "size": size, "total": total, "results": results}
+def restrict_to(book_map, allowed):
+    """Sous-ensemble de {book_id: score} dont les livres sont dans le bitmap `allowed` (intersection de bitmaps)."""
+    candidates = Bitmap.from_ids(np.fromiter(book_map, dtype=np.int64, count=len(book_map)))
+    return {bid: book_map[bid] for bid in (candidates & allowed).to_array().tolist()}
+
+
+def rank_candidates(pattern, regex, k, full, allowed):
+    """
+    Livres appariés par `pattern` (restreints au bitmap `allowed`) triés par score :
+    RankedList si le classement est complet, sinon (sorted_books, approximate, total_exact).
+    """
+    book_map, approximate, total_exact = collect_book_map(pattern, search_body(pattern, regex), k, full)
+    if allowed is not None:
+        with span("facets"):
+            book_map = restrict_to(book_map, allowed)
+    with span("sort"):
+        sorted_books = rank_books(book_map)
+    if approximate or not total_exact:
+        return sorted_books, approximate, total_exact
+    return RankedList(sorted_books)
+
+
+def ranked_search(query, page=1, size=10, regex=False, exact=True, cursor=None, filters=None, with_facets=False):
+    """
+    Recherche sans hydratation : (métadonnées {page, size, total, next_cursor,
+    + indicateurs}, [(book_id, score), ...] de la page demandée).
+    Le classement complet est gardé en mémoire (library/cursors.py) : les pages
+    suivantes, par `page` ou par `cursor`, n'en lisent qu'une tranche.
+    filters : {facette: valeurs} ; les candidats sont intersectés avec le bitmap
+    des filtres avant le classement (top-k anticipé désactivé). with_facets : "facets"
+    dans les métadonnées (comptes sur tous les résultats).
+    Lève QueryTooExpensive, InvalidCursor, CursorExpired, FacetsUnavailable ou ShardSearchError.
+    """
+    annotate(pattern=query, regex=regex)
+    pattern = get_normalizer().rewrite_query(query)   # mêmes règles que l'indexation
+    if not pattern:
+        # mot vide : absent de l'index
+        return {"page": page, "size": size, "total": 0, "next_cursor": None}, []
+    allowed = facet_filter(filters)
+    rs_id = result_set_id(pattern, regex, filters_key(filters))
+    after = decode_cursor(cursor, rs_id) if cursor else None
+
+    ranked = get_ranked(rs_id)
+    annotate(ranked_cache=ranked is not None)
+    if ranked is None:
+        # Classement complet pour suivre un curseur ; requêtes identiques simultanées
+        # regroupées en un seul calcul (library/coalesce.py)
+        full = exact or after is not None or allowed is not None
+        k = page * size
+        ranking = coalesced(rs_id if full else f"{rs_id}:top{k}",
+                            lambda: rank_candidates(pattern, regex, k, full, allowed))
+        if not isinstance(ranking, RankedList):
+            # classement partiel : ni mis en cache, ni paginable par curseur
+            sorted_books, approximate, total_exact = ranking
+            data = search_flags({"page": page, "size": size, "total": len(sorted_books)}, approximate, total_exact)
+            if with_facets:
+                with span("facets"):
+                    data["facets"] = facet_counts([bid for bid, _ in sorted_books])
+            return data, paginate(sorted_books, page, size)
+        ranked = ranking
+        put_ranked(rs_id, ranked)
+
+    # Pagination : O(log n + size) dans le classement
+    with span("sort"):
+        start = ranked.position_after(*after) if after is not None else (page - 1) * size
+        paginated = ranked.slice(start, size)
+    data = {"page": start // size + 1 if size else page, "size": size, "total": len(ranked)}
+    data["next_cursor"] = encode_cursor(rs_id, *paginated[-1]) if paginated and start + size < len(ranked) else None
+    if with_facets:
+        with span("facets"):
+            data["facets"] = facet_counts(ranked.ids)
+    return data, paginated
+
+
+def perform_search_logic(query, page=1, size=10, regex=False, exact=True, cursor=None, filters=None):
+    """
+    Retourne le dict {page, size, total, next_cursor, results} comme search_books
+    ou search_regex (+ "approximate": True si le garde-fou a limité la requête).
+    exact=False : top-k par arrêt anticipé, "total_exact": False dans la réponse.
+    Lève QueryTooExpensive si le motif est refusé, InvalidCursor / CursorExpired
+    si `cursor` n'est pas utilisable, FacetsUnavailable si `filters` ne peut pas être appliqué.
+    """
+    data, paginated = ranked_search(query, page, size, regex, exact, cursor, filters)
+    with span("hydrate"):
+        data["results"] = hydrate_books(paginated)
+    return data
+
+
+BATCH_MAX_REQUESTS = 20
+BATCH_TYPES = ("search", "suggestions", "metadata")
+
+
+def batch_error(message, status, **extra):
+    return dict({"error": message, "status": status}, **extra)
+
+
+@api_view(["POST"])
+def batch(request):
+    """
+    Plusieurs sous-requêtes en un aller-retour HTTP :
+        {"requests": [
+            {"id": "hits", "type": "search", "q": "love", "page": 1, "size": 10, "regex": false},
+            {"id": "more", "type": "suggestions", "book_id": 12},
+            {"id": "meta", "type": "metadata", "ids": [3, 4]}
+        ]}
+    Toutes les recherches (et leurs sous-requêtes par shard) partent dans un seul es.msearch, tous les livres cités
+    sont hydratés en une requête SQL. Réponse : {"results": {<id>: résultat}} ;
+    une sous-requête en échec porte {"error", "status"} sans faire échouer les autres.
+    """
+    items = request.data.get("requests") if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({"error": "Body must be {\"requests\": [...]}"}, status=400)
+    if len(items) > BATCH_MAX_REQUESTS:
+        return Response({"error": f"At most {BATCH_MAX_REQUESTS} sub-requests"}, status=400)
+    keys = [item.get("id") if isinstance(item, dict) else None for item in items]
+    if any(not isinstance(key, str) or not key for key in keys) or len(set(keys)) != len(keys):
+        return Response({"error": "Each sub-request needs a unique string id"}, status=400)
+
+    results = {}
+    pending = {}    # id -> (kind, données à hydrater)
+    searches = []   # (id, page, size, plan, [(corps, routage) par shard])
+
+    for item in items:
+        key, kind = item["id"], item.get("type")
+        if kind not in BATCH_TYPES:
+            results[key] = batch_error(f"Unknown type {kind!r} (expected one of {', '.join(BATCH_TYPES)})", 400)
+            continue
+        try:
+            if kind == "search":
+                pattern = get_normalizer().rewrite_query(str(item.get("q", "")))
+                page, size = int(item.get("page", 1)), int(item.get("size", 10))
+                check_page(page, size)
+                if not pattern:
+                    results[key] = {"page": page, "size": size, "total": 0, "results": []}
+                    continue
+                body = search_body(pattern, bool(item.get("regex", False)))
+                try:
+                    plan = plan_query(pattern, body["size"])
+                except QueryTooExpensive as exc:
+                    results[key] = batch_error(str(exc), 422, pattern=exc.pattern, estimate=exc.estimate.as_dict())
+                    continue
+                searches.append((key, page, size, plan, shard_requests(pattern, plan.apply(body))))
+            elif kind == "suggestions":
+                book_id = int(item["book_id"])
+                neighbors = suggestion_ids(book_id)
+                if neighbors is None:
+                    results[key] = batch_error("Graphe en cours de construction", 503, job=pending_job_id("build_graph"))
+                    continue
+                pending[key] = (kind, (book_id, neighbors))
+            else:
+                pending[key] = (kind, [int(bid) for bid in item["ids"]])
+        except (KeyError, TypeError, ValueError) as exc:
+            results[key] = batch_error(f"Invalid sub-request: {exc}", 400)
+
+    # 1) Une seule requête ES pour toutes les recherches (une sous-requête par shard)
+    flat = [request for *_, requests in searches for request in requests]
+    responses = es_msearch([body for body, _ in flat], routings=[routing for _, routing in flat]) if flat else []
+    offset = 0
+    for key, page, size, plan, requests in searches:
+        shard_responses = responses[offset:offset + len(requests)]
+        offset += len(requests)
+        try:
+            hits, timed_out = gather_term_hits(requests, shard_responses, exhaustive=not plan.approximate)
+        except ShardSearchError as exc:
+            results[key] = batch_error(str(exc), exc.status)
+            continue
+        approximate = plan.approximate or timed_out
+        record_search_stats(hits)
+        with span("aggregate"):
+            book_map = merge_postings(hits)
+            paginated = paginate(rank_books(book_map), page, size)
+        data = {"page": page, "size": size, "total": len(book_map)}
+        pending[key] = ("search", (search_flags(data, approximate, True), paginated))
+
+    # 2) Une seule hydratation pour tous les livres cités
+    book_ids = set()
+    for kind, payload in pending.values():
+        if kind == "search":
+            book_ids.update(bid for bid, _ in payload[1])
+        elif kind == "suggestions":
+            book_ids.add(payload[0])
+            book_ids.update(payload[1])
+        else:
+            book_ids.update(payload)
+    with span("hydrate"):
+        books_dict = fetch_book_metadata(sorted(book_ids))
+
+    for key, (kind, payload) in pending.items():
+        if kind == "search":
+            data, paginated = payload
+            data["results"] = hydrate_books(paginated, books_dict)
+            results[key] = data
+        elif kind == "suggestions":
+            book_id, neighbors = payload
+            ref = books_dict.get(book_id)
+            if ref is None:
+                results[key] = batch_error("Book not found", 404)
+                continue
+            results[key] = {"id": book_id, "title": ref["title"],
+                            "results": [books_dict[s_id] for s_id in neighbors if s_id in books_dict]}
+        else:
+            results[key] = {"results": [books_dict[bid] for bid in payload if bid in books_dict]}
+
+    return Response({"results": {key: results[key] for key in keys}})
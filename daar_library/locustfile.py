@@ -1,24 +1,146 @@
-from locust import HttpUser, between, task
+"""
+Scénarios Locust de l'API.
+
+Sans variable d'environnement : mélange historique des cinq endpoints.
+Avec BENCH_MIX (utilisé par benchmarks/run_benchmarks.py) : un mélange de requêtes
+paramétré, tiré du vocabulaire du corpus synthétique (BENCH_VOCAB) :
+
+  prefix          /api/search/?q=<préfixe>.*
+  wildcard        /api/search/regex/?q=.*<suffixe>
+  regex           /api/search/regex/?q=.*<lettre>.*     (fanout élevé)
+  centrality_on   /api/enhanced-search/?...&centrality=true
+  centrality_off  /api/enhanced-search/?...&centrality=false
+  all             tous les précédents
+
+Chaque réponse est vérifiée (statut, JSON, clés attendues) : une réponse invalide
+compte comme un échec dans les statistiques.
+"""
+
+import json
+import os
+import random
+
+from locust import HttpUser, between, constant
+
+BENCH_MIX = os.environ.get("BENCH_MIX", "")
+BENCH_VOCAB = os.environ.get("BENCH_VOCAB", "")
+BENCH_SEED = int(os.environ.get("BENCH_SEED", "42"))
+BENCH_BOOK_ID = os.environ.get("BENCH_BOOK_ID", "120")
+
+
+def load_vocabulary():
+    if BENCH_VOCAB and os.path.exists(BENCH_VOCAB):
+        with open(BENCH_VOCAB, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return ["love", "test", "the", "time", "house", "night"]
+
+
+VOCAB = load_vocabulary()
+FREQUENT = VOCAB[:50]   # le vocabulaire est trié par fréquence décroissante
+
+
+def check_search(response):
+    """Valide une réponse de recherche ; marque l'échec dans Locust sinon."""
+    if response.status_code != 200:
+        response.failure(f"HTTP {response.status_code}")
+        return
+    try:
+        data = response.json()
+    except ValueError:
+        response.failure("réponse non JSON")
+        return
+    if not {"total", "results"} <= data.keys() or not isinstance(data["results"], list):
+        response.failure("clés total/results absentes")
+    elif data["total"] and not data["results"] and data.get("page", 1) == 1:
+        response.failure("total > 0 mais aucun résultat en page 1")
+    else:
+        response.success()
+
 
 class DjangoUser(HttpUser):
     wait_time = between(1, 3)
 
-    @task(3)
+    def on_start(self):
+        self.rng = random.Random(BENCH_SEED)
+
+    def get_search(self, url, name):
+        with self.client.get(url, name=name, catch_response=True) as response:
+            check_search(response)
+
+    # ------------------------------------------------------------------
+    # Mélange historique
+    # ------------------------------------------------------------------
     def search_basic(self):
-        self.client.get("/api/search/?q=test&page=1&size=10")
+        self.get_search("/api/search/?q=test&page=1&size=10", "search")
 
-    @task(3)
     def search_regex(self):
-        self.client.get("/api/search/regex/?q=the&page=1&size=10")
+        self.get_search("/api/search/regex/?q=the&page=1&size=10", "search_regex")
 
-    @task(5)
     def enhanced_search(self):
-        self.client.get("/api/enhanced-search/?q=love&regex=false&centrality=true&page=1&size=10")
+        self.get_search("/api/enhanced-search/?q=love&regex=false&centrality=true&page=1&size=10", "enhanced_search")
 
-    @task(1)
     def suggestions(self):
-        self.client.get("/api/suggestions/?id=120")
+        with self.client.get(f"/api/suggestions/?id={BENCH_BOOK_ID}", name="suggestions", catch_response=True) as r:
+            if r.status_code == 200 and "results" in r.json():
+                r.success()
+            else:
+                r.failure(f"HTTP {r.status_code}")
 
-    @task(1)
     def book_content(self):
-        self.client.get("/api/book_content/?id=120")
+        with self.client.get(f"/api/book_content/?id={BENCH_BOOK_ID}", name="book_content", catch_response=True) as r:
+            if r.status_code == 200 and r.content:
+                r.success()
+            else:
+                r.failure(f"HTTP {r.status_code}")
+
+    # ------------------------------------------------------------------
+    # Mélanges paramétrés (BENCH_MIX)
+    # ------------------------------------------------------------------
+    def bench_prefix(self):
+        word = self.rng.choice(FREQUENT)
+        self.get_search(f"/api/search/?q={word[:3]}.*&page=1&size=10", "prefix")
+
+    def bench_wildcard(self):
+        word = self.rng.choice(FREQUENT)
+        self.get_search(f"/api/search/regex/?q=.*{word[-3:]}&page=1&size=10", "wildcard")
+
+    def bench_regex(self):
+        letter = self.rng.choice("aeiou")
+        self.get_search(f"/api/search/regex/?q=.*{letter}.*&page=1&size=10", "regex_fanout")
+
+    def bench_centrality_on(self):
+        word = self.rng.choice(FREQUENT)
+        self.get_search(f"/api/enhanced-search/?q={word}&regex=false&centrality=true&page=1&size=10", "centrality_on")
+
+    def bench_centrality_off(self):
+        word = self.rng.choice(FREQUENT)
+        self.get_search(f"/api/enhanced-search/?q={word}&regex=false&centrality=false&page=1&size=10", "centrality_off")
+
+
+MIXES = {
+    "prefix": {DjangoUser.bench_prefix: 1},
+    "wildcard": {DjangoUser.bench_wildcard: 1},
+    "regex": {DjangoUser.bench_regex: 1},
+    "centrality_on": {DjangoUser.bench_centrality_on: 1},
+    "centrality_off": {DjangoUser.bench_centrality_off: 1},
+    "all": {
+        DjangoUser.bench_prefix: 3,
+        DjangoUser.bench_wildcard: 2,
+        DjangoUser.bench_regex: 1,
+        DjangoUser.bench_centrality_on: 2,
+        DjangoUser.bench_centrality_off: 2,
+    },
+}
+DEFAULT_MIX = {
+    DjangoUser.search_basic: 3,
+    DjangoUser.search_regex: 3,
+    DjangoUser.enhanced_search: 5,
+    DjangoUser.suggestions: 1,
+    DjangoUser.book_content: 1,
+}
+
+if BENCH_MIX:
+    DjangoUser.tasks = [fn for fn, weight in MIXES[BENCH_MIX].items() for _ in range(weight)]
+    DjangoUser.wait_time = constant(0)   # débit maximal en benchmark
+else:
+    DjangoUser.tasks = [fn for fn, weight in DEFAULT_MIX.items() for _ in range(weight)]
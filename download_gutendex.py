@@ -9,41 +9,108 @@ Objectif:
 
 Usage:
  - pip install aiohttp aiofiles tqdm python-slugify beautifulsoup4
+ - (optionnel) pip install lxml  ou  pip install selectolax
  - python download_gutendex_library.py
+
+Le parsing HTML et le comptage des mots (CPU) tournent dans un ProcessPoolExecutor
+pour ne pas bloquer la boucle asyncio pendant les téléchargements.
+Le parser est choisi via GUTENDEX_HTML_PARSER = html.parser | lxml | selectolax.
+
+Pipeline producteur/consommateur : une tâche parcourt les pages du catalogue en
+avance (file bornée de livres), CONCURRENT_REQUESTS workers téléchargent en continu.
+La politesse est assurée par un token bucket (REQUESTS_PER_SECOND) au lieu de sleep.
+GUTENDEX_BASE_API permet de pointer vers un serveur Gutendex local (mock) pour les tests.
+
+Mode synchronisation (--sync) : mise à jour incrémentale d'une bibliothèque existante.
+ - les livres déjà collectés sont relus par lots (/books?ids=...) et leur texte est
+   demandé en GET conditionnel (If-None-Match / If-Modified-Since) : 304 = inchangé ;
+   un 200 n'est considéré comme une mise à jour que si le hash SHA-256 du texte change ;
+ - les nouveaux livres (jusqu'à TARGET_BOOKS) sont cherchés dans le catalogue à partir
+   du point de reprise : les pages déjà parcourues ne sont pas redemandées ;
+ - ETag, Last-Modified, hash et point de reprise sont rangés dans sync_state.json ;
+ - les livres ajoutés / modifiés sont listés dans changes.json (manifeste des changements),
+   lu par `import_books_withImage --manifest` et `index_inverted_from_db --manifest`.
+   Un manifeste pas encore appliqué est complété, pas écrasé.
 """
 
+import argparse
 import asyncio
 import aiohttp
 import aiofiles
+import hashlib
 import json
 import os
-import re
 import time
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from slugify import slugify
-from tqdm.asyncio import tqdm_asyncio
+from tqdm import tqdm
 from bs4 import BeautifulSoup
 
 # ---------- CONFIG ----------
-BASE_API = "https://gutendex.com"
+BASE_API = os.environ.get("GUTENDEX_BASE_API", "https://gutendex.com").rstrip("/")
 BOOKS_ENDPOINT = f"{BASE_API}/books"
 TARGET_BOOKS = 1664
 MIN_WORDS = 10_000
 OUTPUT_DIR = Path("library")
 CONCURRENT_REQUESTS = 10
-REQUESTS_DELAY = 0.12   # délai entre requêtes pour politesse (s)
+REQUESTS_PER_SECOND = 8.0   # débit moyen autorisé (token bucket) pour politesse
+REQUESTS_BURST = 4          # nombre de requêtes pouvant partir d'un coup
+PREFETCH_PAGES = 2          # pages du catalogue chargées en avance
+PAGE_SIZE_HINT = 32         # taille d'une page Gutendex (borne de la file de livres)
 RETRY_LIMIT = 4
 INITIAL_BACKOFF = 1.0
+PROCESS_WORKERS = os.cpu_count() or 1   # processus pour le parsing HTML / comptage
+HTML_PARSER = os.environ.get("GUTENDEX_HTML_PARSER", "html.parser")
 # ----------------------------
 
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 METADATA_FILE = OUTPUT_DIR / "metadata.json"
 COLLECTED_FILE = OUTPUT_DIR / "collected_ids.json"
+SYNC_STATE_FILE = OUTPUT_DIR / "sync_state.json"   # validateurs HTTP, hashes, point de reprise
+CHANGES_FILE = OUTPUT_DIR / "changes.json"         # manifeste des livres ajoutés / modifiés
 
-_word_re = re.compile(r"\w+", flags=re.UNICODE)
+# même découpage en mots que l'indexation : module autonome de l'application Django
+from daar_library.library.tokenizer import count_words  # noqa: E402
 
-def count_words(text: str) -> int:
-    return len(_word_re.findall(text))
+def html_to_text(raw: str, parser: str = HTML_PARSER) -> str:
+    """
+    Convertit du HTML en texte brut (sans script/style).
+    parser: "selectolax" (le plus rapide), "lxml" ou "html.parser" (par défaut).
+    Si le parser demandé n'est pas installé on retombe sur html.parser.
+    """
+    if parser == "selectolax":
+        try:
+            from selectolax.parser import HTMLParser
+        except ImportError:
+            parser = "html.parser"
+        else:
+            tree = HTMLParser(raw)
+            for node in tree.css("script, style"):
+                node.decompose()
+            root = tree.body or tree.root
+            return root.text(separator="\n") if root is not None else ""
+    if parser == "lxml":
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            parser = "html.parser"
+    soup = BeautifulSoup(raw, parser)
+    for s in soup(["script", "style"]):
+        s.decompose()
+    return soup.get_text(separator="\n")
+
+def extract_text(raw: str, is_html: bool, parser: str = HTML_PARSER) -> tuple[str, int]:
+    """
+    Étape CPU d'un livre : HTML -> texte si nécessaire puis comptage des mots.
+    Fonction de module (picklable) exécutée dans le ProcessPoolExecutor.
+    """
+    text = raw
+    if is_html or raw.lstrip().startswith("<"):
+        text = html_to_text(raw, parser)
+    return text, count_words(text)
 
 def choose_text_format(formats: dict) -> str | None:
     """
@@ -74,17 +141,53 @@ def choose_text_format(formats: dict) -> str | None:
             return v
     return None
 
-async def http_get_with_retries(session: aiohttp.ClientSession, url: str, is_text=True) -> tuple[int, str]:
+class TokenBucket:
+    """
+    Limiteur de débit asyncio : `rate` jetons/seconde, au plus `capacity` en réserve.
+    acquire() attend seulement le temps nécessaire pour qu'un jeton soit disponible.
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def http_get_with_retries(session: aiohttp.ClientSession, url: str, is_text=True, limiter: TokenBucket | None = None) -> tuple[int, str]:
+    status, body, _ = await http_get_conditional(session, url, None, is_text, limiter)
+    return status, body
+
+async def http_get_conditional(session: aiohttp.ClientSession, url: str, validators: dict | None = None, is_text=True,
+                               limiter: TokenBucket | None = None) -> tuple[int, str | bytes | None, Mapping]:
+    """
+    GET avec reprises ; `validators` = en-têtes If-None-Match / If-Modified-Since.
+    Retourne (statut, corps, en-têtes insensibles à la casse) ; (304, None, en-têtes) si rien n'a changé.
+    """
     backoff = INITIAL_BACKOFF
     for attempt in range(1, RETRY_LIMIT + 1):
         try:
-            async with session.get(url, timeout=60) as resp:
+            if limiter is not None:
+                await limiter.acquire()
+            async with session.get(url, timeout=60, headers=validators or None) as resp:
                 status = resp.status
+                if status == 304 and validators:
+                    return status, None, resp.headers.copy()
                 if status == 200:
                     if is_text:
-                        return status, await resp.text(encoding='utf-8', errors='ignore')
+                        return status, await resp.text(encoding='utf-8', errors='ignore'), resp.headers.copy()
                     else:
-                        return status, await resp.read()
+                        return status, await resp.read(), resp.headers.copy()
                 elif status in (429, 503, 504):
                     await asyncio.sleep(backoff)
                     backoff *= 2
@@ -98,8 +201,53 @@ async def http_get_with_retries(session: aiohttp.ClientSession, url: str, is_tex
             backoff *= 2
     raise Exception("Unreachable")
 
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def file_hash(path: Path) -> str | None:
+    """Hash d'un texte déjà sauvegardé (bibliothèque constituée avant le premier --sync)."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def conditional_headers(entry: dict) -> dict:
+    """En-têtes de GET conditionnel à partir des validateurs mémorisés d'un livre."""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def read_json(path: Path, default):
+    if path.exists():
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            pass
+    return default
+
+def write_json_atomic(path: Path, data):
+    """Écrit dans un .tmp puis renomme : un arrêt brutal ne laisse jamais un fichier à moitié écrit."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+def book_text_url(book_meta: dict) -> str | None:
+    url = choose_text_format(book_meta.get("formats", {}))
+    if not url:
+        return None
+    if url.startswith("//"):
+        url = "https:" + url
+    elif url.startswith("http:") and BASE_API.startswith("https:"):
+        # on ne force https que pour le vrai Gutendex (un mock local reste en http)
+        url = "https:" + url[5:]
+    return url
+
 class GutendexDownloader:
-    def __init__(self):
+    def __init__(self, sync: bool = False):
+        self.sync = sync
         self.collected = set()
         if COLLECTED_FILE.exists():
             try:
@@ -107,7 +255,10 @@ class GutendexDownloader:
             except Exception:
                 self.collected = set()
         self.total_saved = len(self.collected)
-        self.sem = asyncio.Semaphore(CONCURRENT_REQUESTS)
+        self.reserved = 0   # nouveaux livres en cours de téléchargement
+        self.pool = None   # ProcessPoolExecutor, créé dans run()
+        self.limiter = TokenBucket(REQUESTS_PER_SECOND, REQUESTS_BURST)
+        self.done = asyncio.Event()   # levé quand TARGET_BOOKS est atteint
         self.meta_lock = asyncio.Lock()
         self.meta = {}
         if METADATA_FILE.exists():
@@ -115,8 +266,17 @@ class GutendexDownloader:
                 self.meta = json.loads(METADATA_FILE.read_text(encoding="utf-8"))
             except Exception:
                 self.meta = {}
+        # état de synchronisation : {"checkpoint": {"next_url", "page"} | None, "books": {id: validateurs + hash}}
+        self.state = read_json(SYNC_STATE_FILE, {})
+        self.state.setdefault("checkpoint", None)
+        self.state.setdefault("books", {})
+        self.added, self.updated = set(), set()
+        self.unchanged = 0
+        self.outstanding = Counter()   # page du catalogue -> livres de la page pas encore traités
+        self.page_urls = {}            # page du catalogue -> URL
+        self.catalog_position = self.state["checkpoint"]
 
-    async def save_text_and_meta(self, book_id: int, title: str, authors: list, text: str, cover_image: str, raw_meta: dict):
+    async def save_text_and_meta(self, book_id: int, title: str, authors: list, text: str, cover_image: str, raw_meta: dict, word_count: int | None = None):
         fname = f"{book_id}.txt"
         fpath = OUTPUT_DIR / fname
         async with aiofiles.open(fpath, "w", encoding="utf-8") as f:
@@ -128,7 +288,7 @@ class GutendexDownloader:
             "authors": authors,
             "filename": fname,
             "cover_image": cover_image,
-            "word_count": count_words(text),
+            "word_count": word_count if word_count is not None else count_words(text),
             "download_count": raw_meta.get("download_count"),
             "bookshelves": raw_meta.get("bookshelves"),
             "subjects": raw_meta.get("subjects"),
@@ -142,79 +302,228 @@ class GutendexDownloader:
                 await f.write(json.dumps(self.meta, ensure_ascii=False, indent=2))
 
     async def fetch_books_page(self, session: aiohttp.ClientSession, page_url: str):
-        await asyncio.sleep(REQUESTS_DELAY)
-        status, text = await http_get_with_retries(session, page_url, is_text=True)
+        status, text = await http_get_with_retries(session, page_url, is_text=True, limiter=self.limiter)
         return json.loads(text)
 
     async def process_book(self, session: aiohttp.ClientSession, book_meta: dict):
+        """
+        Télécharge un nouveau livre ; en mode --sync, revérifie aussi un livre déjà collecté
+        (GET conditionnel puis comparaison de hash). Retourne True si un nouveau livre est sauvegardé.
+        """
         book_id = book_meta.get("id")
-        if not book_id or str(book_id) in self.collected:
+        if not book_id:
+            return False
+        known = str(book_id) in self.collected
+        if known and not self.sync:
             return False
-        formats = book_meta.get("formats", {})
-        url = choose_text_format(formats)
+        if not known and self.total_saved + self.reserved >= TARGET_BOOKS:
+            return False
+        url = book_text_url(book_meta)
         if not url:
             return False
-        if url.startswith("//"):
-            url = "https:" + url
-        elif url.startswith("http:"):
-            url = "https:" + url[5:]
+        if known:
+            return await self.fetch_book(session, book_meta, url, known)
+        self.reserved += 1   # place réservée : les workers concurrents ne dépassent pas TARGET_BOOKS
         try:
-            async with self.sem:
-                await asyncio.sleep(REQUESTS_DELAY)
-                is_html = url.endswith(".htm") or url.endswith(".html") or "text/html" in url
-                status, raw = await http_get_with_retries(session, url, is_text=True)
-                text = raw
-                if is_html or raw.strip().startswith("<"):
-                    soup = BeautifulSoup(raw, "html.parser")
-                    for s in soup(["script", "style"]):
-                        s.decompose()
-                    text = soup.get_text(separator="\n")
-                words = count_words(text)
-                if words >= MIN_WORDS:
-                    title = book_meta.get("title", f"book_{book_id}")
-                    authors = book_meta.get("authors", [])
-                    cover_image = book_meta.get("formats", {}).get("image/jpeg", "")
-                    await self.save_text_and_meta(book_id, title, authors, text, cover_image, book_meta)
-                    self.collected.add(str(book_id))
-                    async with aiofiles.open(COLLECTED_FILE, "w", encoding="utf-8") as f:
-                        await f.write(json.dumps(list(self.collected), ensure_ascii=False, indent=2))
-                    self.total_saved += 1
-                    print(f"[SAVED] id={book_id} words={words} total_saved={self.total_saved}")
-                    return True
-                else:
-                    print(f"[SKIP] id={book_id} too short ({words} words).")
+            return await self.fetch_book(session, book_meta, url, known)
+        finally:
+            self.reserved -= 1
+
+    async def fetch_book(self, session: aiohttp.ClientSession, book_meta: dict, url: str, known: bool):
+        book_id = book_meta["id"]
+        entry = self.state["books"].get(str(book_id), {})
+        validators = conditional_headers(entry) if self.sync and entry.get("url") == url else None
+        try:
+            is_html = url.endswith(".htm") or url.endswith(".html") or "text/html" in url
+            status, raw, headers = await http_get_conditional(session, url, validators, True, self.limiter)
+            if status == 304:
+                self.unchanged += 1
+                return False
+            # Parsing + comptage hors de la boucle asyncio (et hors du sémaphore réseau)
+            loop = asyncio.get_running_loop()
+            text, words = await loop.run_in_executor(self.pool, extract_text, raw, is_html, HTML_PARSER)
+            digest = content_hash(text)
+            if known:
+                previous = entry.get("sha256") or file_hash(OUTPUT_DIR / f"{book_id}.txt")
+                self.remember(book_id, url, headers, digest)
+                if digest == previous:
+                    self.unchanged += 1
                     return False
+                await self.save_book(book_id, book_meta, text, words)
+                self.updated.add(book_id)
+                print(f"[UPDATED] id={book_id} words={words}")
+                return False
+            if words >= MIN_WORDS:
+                await self.save_book(book_id, book_meta, text, words)
+                self.collected.add(str(book_id))
+                async with self.meta_lock:   # écritures concurrentes des workers : fichier jamais entrelacé
+                    write_json_atomic(COLLECTED_FILE, list(self.collected))
+                if self.sync:
+                    self.remember(book_id, url, headers, digest)
+                    self.added.add(book_id)
+                self.total_saved += 1
+                if self.total_saved >= TARGET_BOOKS:
+                    self.done.set()
+                print(f"[SAVED] id={book_id} words={words} total_saved={self.total_saved}")
+                return True
+            else:
+                print(f"[SKIP] id={book_id} too short ({words} words).")
+                return False
         except Exception as e:
             print(f"[ERROR] book {book_id} -> {e}")
             return False
 
+    async def save_book(self, book_id: int, book_meta: dict, text: str, words: int):
+        title = book_meta.get("title", f"book_{book_id}")
+        authors = book_meta.get("authors", [])
+        cover_image = book_meta.get("formats", {}).get("image/jpeg", "")
+        await self.save_text_and_meta(book_id, title, authors, text, cover_image, book_meta, word_count=words)
+
+    def remember(self, book_id: int, url: str, headers: Mapping, digest: str):
+        """Validateurs HTTP et hash du texte d'un livre, pour le prochain GET conditionnel."""
+        self.state["books"][str(book_id)] = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "sha256": digest,
+            "checked_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
+    def save_checkpoint(self):
+        """
+        Point de reprise du catalogue pour le prochain --sync : la plus ancienne page
+        dont des livres n'ont pas été traités (file d'attente, objectif atteint), sinon
+        la page où le parcours s'est arrêté ; None quand le catalogue a été parcouru
+        entièrement (le prochain parcours repart du début).
+        """
+        if self.outstanding:
+            page = min(self.outstanding)
+            checkpoint = {"next_url": self.page_urls[page], "page": page}
+        else:
+            checkpoint = self.catalog_position
+        self.state["checkpoint"] = checkpoint
+        write_json_atomic(SYNC_STATE_FILE, self.state)
+
+    def write_changes(self):
+        """Complète le manifeste des changements (livres ajoutés / modifiés) encore non appliqué."""
+        changes = read_json(CHANGES_FILE, {})
+        added = set(changes.get("added", [])) | self.added
+        updated = (set(changes.get("updated", [])) | self.updated) - added
+        write_json_atomic(CHANGES_FILE, {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "added": sorted(added),
+            "updated": sorted(updated),
+        })
+
     async def run(self):
         timeout = aiohttp.ClientTimeout(total=120)
         conn = aiohttp.TCPConnector(limit=CONCURRENT_REQUESTS)
-        async with aiohttp.ClientSession(connector=conn, timeout=timeout) as session:
-            next_url = f"{BOOKS_ENDPOINT}"
-            page = 1
-            while self.total_saved < TARGET_BOOKS and next_url:
+        self.pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+        try:
+            await self._crawl(timeout, conn)
+        finally:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+            if self.sync:
+                self.save_checkpoint()
+                self.write_changes()
+                print(f"[SYNC] added={len(self.added)} updated={len(self.updated)} unchanged={self.unchanged} "
+                      f"-> {CHANGES_FILE}")
+
+    async def page_producer(self, session: aiohttp.ClientSession, queue: asyncio.Queue):
+        """
+        Parcourt le catalogue page par page et pousse chaque livre dans la file bornée.
+        La page suivante est demandée dès que la file a de la place : pas de barrière
+        de fin de page, les workers ne s'arrêtent jamais en attendant le catalogue.
+        En mode --sync, les livres déjà collectés passent d'abord, puis le catalogue
+        reprend au point de reprise.
+        """
+        try:
+            if self.sync:
+                await self.known_producer(session, queue)
+            checkpoint = self.state["checkpoint"] if self.sync else None
+            next_url = checkpoint["next_url"] if checkpoint else BOOKS_ENDPOINT
+            page = checkpoint["page"] if checkpoint else 1
+            while next_url and not self.done.is_set():
+                self.catalog_position = {"next_url": next_url, "page": page}
+                if self.sync:
+                    self.save_checkpoint()
                 print(f"[INFO] page {page} -> fetching {next_url} (collected {self.total_saved}/{TARGET_BOOKS})")
                 try:
                     data = await self.fetch_books_page(session, next_url)
                 except Exception as e:
                     print(f"[ERROR] fetching page {page}: {e}")
                     break
-                results = data.get("results", [])
-                tasks = [self.process_book(session, bm) for bm in results if bm and bm.get("id")]
-                if tasks:
-                    for ok in await tqdm_asyncio.gather(*tasks, desc=f"Processing page {page}", leave=False):
-                        if self.total_saved >= TARGET_BOOKS:
-                            break
+                self.page_urls[page] = next_url
+                for bm in data.get("results", []):
+                    if self.done.is_set():
+                        self.outstanding[page] += 1   # fin de page non parcourue : à reprendre
+                        break
+                    if bm and bm.get("id") and str(bm["id"]) not in self.collected:   # connus : déjà vérifiés
+                        self.outstanding[page] += 1
+                        await queue.put((page, bm))
                 next_url = data.get("next")
                 page += 1
-                await asyncio.sleep(REQUESTS_DELAY * 2)
+            else:
+                self.catalog_position = {"next_url": next_url, "page": page} if next_url else None
+        finally:
+            for _ in range(CONCURRENT_REQUESTS):
+                await queue.put(None)   # sentinelle de fin pour chaque worker
+
+    async def known_producer(self, session: aiohttp.ClientSession, queue: asyncio.Queue):
+        """Métadonnées à jour des livres déjà collectés, par lots de PAGE_SIZE_HINT ids."""
+        ids = sorted(self.collected, key=int)
+        for i in range(0, len(ids), PAGE_SIZE_HINT):
+            next_url = f"{BOOKS_ENDPOINT}?ids={','.join(ids[i:i + PAGE_SIZE_HINT])}"
+            while next_url:
+                try:
+                    data = await self.fetch_books_page(session, next_url)
+                except Exception as e:
+                    print(f"[ERROR] fetching known books {ids[i]}..: {e}")
+                    break
+                for bm in data.get("results", []):
+                    if bm and bm.get("id"):
+                        await queue.put((None, bm))
+                next_url = data.get("next")
+
+    async def book_worker(self, session: aiohttp.ClientSession, queue: asyncio.Queue, progress: tqdm):
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                page, bm = item
+                if page is not None and self.total_saved + self.reserved >= TARGET_BOOKS:
+                    continue   # on vide la file sans télécharger (la page reste à reprendre)
+                if await self.process_book(session, bm):
+                    progress.update(1)
+                if page is not None:
+                    self.outstanding[page] -= 1
+                    if not self.outstanding[page]:
+                        del self.outstanding[page]
+            finally:
+                queue.task_done()
+
+    async def _crawl(self, timeout: aiohttp.ClientTimeout, conn: aiohttp.TCPConnector):
+        if self.total_saved >= TARGET_BOOKS:
+            self.done.set()
+        queue = asyncio.Queue(maxsize=PREFETCH_PAGES * PAGE_SIZE_HINT)
+        async with aiohttp.ClientSession(connector=conn, timeout=timeout) as session:
+            with tqdm(total=TARGET_BOOKS, initial=min(self.total_saved, TARGET_BOOKS), desc="Books") as progress:
+                workers = [
+                    asyncio.create_task(self.book_worker(session, queue, progress))
+                    for _ in range(CONCURRENT_REQUESTS)
+                ]
+                await asyncio.gather(self.page_producer(session, queue), *workers)
 
             print(f"[DONE] saved {self.total_saved} books into {OUTPUT_DIR.resolve()}")
 
 def main():
-    dl = GutendexDownloader()
+    parser = argparse.ArgumentParser(description="Bibliothèque locale de livres Gutendex")
+    parser.add_argument("--sync", action="store_true",
+                        help="mise à jour incrémentale : livres modifiés + nouveaux, manifeste changes.json")
+    args = parser.parse_args()
+    dl = GutendexDownloader(sync=args.sync)
     asyncio.run(dl.run())
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+"""
+Fixtures des tests du téléchargeur (download_gutendex.py), lancés depuis la racine du dépôt :
+  pip install pytest
+  pytest tests/
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_gutendex import MockGutendex  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def gutendex_module(tmp_path_factory):
+    """Module download_gutendex, importé hors du dépôt (l'import crée ./library)."""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("import"))
+    try:
+        import download_gutendex
+    finally:
+        os.chdir(cwd)
+    return download_gutendex
+
+
+@pytest.fixture
+def mock_gutendex():
+    with MockGutendex() as mock:
+        yield mock
+
+
+@pytest.fixture
+def gutendex(gutendex_module, mock_gutendex, tmp_path, monkeypatch):
+    """download_gutendex pointé vers le serveur factice, bibliothèque dans tmp_path, sans attentes."""
+    gd = gutendex_module
+    out = tmp_path / "library"
+    out.mkdir()
+    for name, value in {
+        "BASE_API": mock_gutendex.base_url,
+        "BOOKS_ENDPOINT": f"{mock_gutendex.base_url}/books",
+        "OUTPUT_DIR": out,
+        "METADATA_FILE": out / "metadata.json",
+        "COLLECTED_FILE": out / "collected_ids.json",
+        "SYNC_STATE_FILE": out / "sync_state.json",
+        "CHANGES_FILE": out / "changes.json",
+        "PROCESS_WORKERS": 1,
+        "CONCURRENT_REQUESTS": 4,
+        "INITIAL_BACKOFF": 0.01,
+        "REQUESTS_PER_SECOND": 1000.0,
+        "REQUESTS_BURST": 100,
+        "MIN_WORDS": 100,
+    }.items():
+        monkeypatch.setattr(gd, name, value)
+    return gd
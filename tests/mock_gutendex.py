@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Serveur Gutendex factice (catalogue et textes en mémoire) pour tester download_gutendex.py.
+
+  - GET /books?page=N : page de PAGE_SIZE livres, lien "next" vers la page suivante ;
+  - GET /books?ids=1,2 : métadonnées de ces livres (revérification de --sync) ;
+  - GET /texts/<id>.txt : texte du livre, avec ETag (md5 du texte) et Last-Modified ;
+    304 sur If-None-Match égal à l'ETag courant, sauf si honor_validators est faux
+    (serveur qui renvoie toujours le texte : --sync compare alors les hashes).
+
+Des pannes peuvent être programmées par chemin (fail(path, 503, 503) : les deux
+prochaines requêtes reçoivent un 503) ; chaque requête est journalisée dans
+`requests` (instant, chemin, en-têtes) pour vérifier les reprises, le débit et
+les GET conditionnels.
+
+Usage manuel :
+  python tests/mock_gutendex.py --port 8765 --books 40
+  GUTENDEX_BASE_API=http://127.0.0.1:8765 python download_gutendex.py
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 3
+
+
+class MockGutendex:
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.texts = {}        # id -> texte
+        self.failures = {}     # chemin -> statuts à renvoyer d'abord
+        self.requests = []     # (instant, chemin, en-têtes de la requête)
+        self.honor_validators = True
+        self.lock = threading.Lock()
+        self.httpd = None
+
+    # ---------- catalogue ----------
+    def add_book(self, book_id, words):
+        self.texts[book_id] = " ".join(["lorem"] * words)
+
+    def set_text(self, book_id, text):
+        self.texts[book_id] = text
+
+    def fail(self, path, *statuses):
+        self.failures.setdefault(path, []).extend(statuses)
+
+    def hits(self, prefix):
+        return [path for _, path, _ in self.requests if path.startswith(prefix)]
+
+    def request_headers(self, path):
+        return [headers for _, p, headers in self.requests if p == path]
+
+    def book_meta(self, book_id):
+        return {
+            "id": book_id,
+            "title": f"Book {book_id}",
+            "authors": [{"name": "Author"}],
+            "subjects": ["Fiction"],
+            "bookshelves": [],
+            "languages": ["en"],
+            "download_count": 1,
+            "formats": {
+                "text/plain; charset=utf-8": f"{self.base_url}/texts/{book_id}.txt",
+                "image/jpeg": f"{self.base_url}/covers/{book_id}.jpg",
+            },
+        }
+
+    def books_by_id(self, ids):
+        return {"count": len(ids), "next": None,
+                "results": [self.book_meta(i) for i in ids if i in self.texts]}
+
+    def catalog_page(self, page):
+        ids = sorted(self.texts)
+        chunk = ids[(page - 1) * self.page_size:page * self.page_size]
+        more = page * self.page_size < len(ids)
+        return {
+            "count": len(ids),
+            "next": f"{self.base_url}/books?page={page + 1}" if more else None,
+            "results": [self.book_meta(i) for i in chunk],
+        }
+
+    # ---------- serveur ----------
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port=0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.httpd.mock = self
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        mock = self.server.mock
+        url = urlparse(self.path)
+        with mock.lock:
+            mock.requests.append((time.monotonic(), self.path, dict(self.headers)))
+            pending = mock.failures.get(self.path)
+            status = pending.pop(0) if pending else None
+        if status is not None:
+            return self.reply(status, b"unavailable", "text/plain")
+        if url.path == "/books":
+            query = parse_qs(url.query)
+            if "ids" in query:
+                data = mock.books_by_id([int(i) for i in query["ids"][0].split(",")])
+            else:
+                data = mock.catalog_page(int(query.get("page", ["1"])[0]))
+            return self.reply(200, json.dumps(data).encode("utf-8"), "application/json")
+        if url.path.startswith("/texts/"):
+            book_id = int(url.path.rsplit("/", 1)[-1].split(".")[0])
+            if book_id in mock.texts:
+                body = mock.texts[book_id].encode("utf-8")
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                headers = [("ETag", etag), ("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")]
+                if mock.honor_validators and self.headers.get("If-None-Match") == etag:
+                    return self.reply(304, b"", "text/plain", headers)
+                return self.reply(200, body, "text/plain; charset=utf-8", headers)
+        self.reply(404, b"not found", "text/plain")
+
+    def reply(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur Gutendex factice")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--books", type=int, default=40)
+    parser.add_argument("--words", type=int, default=12_000)
+    args = parser.parse_args()
+    mock = MockGutendex().start(args.port)
+    for book_id in range(1, args.books + 1):
+        mock.add_book(book_id, args.words)
+    print(f"Gutendex factice sur {mock.base_url} ({args.books} livres)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
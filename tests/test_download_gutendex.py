@@ -0,0 +1,75 @@
+"""Pipeline producteur / consommateur et limiteur de débit de download_gutendex.py, contre le serveur factice."""
+
+import asyncio
+import json
+import time
+
+
+def run(gd, sync=False):
+    downloader = gd.GutendexDownloader(sync=sync)
+    asyncio.run(downloader.run())
+    return downloader
+
+
+def saved_ids(gd):
+    return sorted(int(i) for i in json.loads(gd.COLLECTED_FILE.read_text(encoding="utf-8")))
+
+
+def test_token_bucket_rate(gutendex_module):
+    async def burst(n):
+        bucket = gutendex_module.TokenBucket(rate=50.0, capacity=5)
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 5 jetons en réserve, puis 25 à 50 jetons/seconde
+    elapsed = asyncio.run(burst(30))
+    assert 0.45 <= elapsed < 0.9
+
+
+def test_pipeline_reaches_target_and_stops(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 31):
+        mock_gutendex.add_book(book_id, 200)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 7)
+    downloader = run(gutendex)
+    assert downloader.total_saved == 7
+    assert len(saved_ids(gutendex)) == 7
+    metadata = json.loads(gutendex.METADATA_FILE.read_text(encoding="utf-8"))
+    assert sorted(metadata) == sorted(str(i) for i in saved_ids(gutendex))
+    assert all((gutendex.OUTPUT_DIR / f"{i}.txt").exists() for i in saved_ids(gutendex))
+    # places réservées : aucun texte téléchargé au-delà de l'objectif, même avec 4 workers en vol
+    assert len(mock_gutendex.hits("/texts/")) == 7
+
+
+def test_short_books_are_skipped(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 10):
+        mock_gutendex.add_book(book_id, 50 if book_id % 3 == 0 else 200)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 100)
+    run(gutendex)
+    assert saved_ids(gutendex) == [1, 2, 4, 5, 7, 8]
+    assert not (gutendex.OUTPUT_DIR / "3.txt").exists()
+
+
+def test_unavailable_responses_are_retried(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 5):
+        mock_gutendex.add_book(book_id, 200)
+    mock_gutendex.fail("/books", 503)
+    mock_gutendex.fail("/texts/2.txt", 503, 429)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 100)
+    run(gutendex)
+    assert saved_ids(gutendex) == [1, 2, 3, 4]
+    assert mock_gutendex.hits("/texts/2.txt") == ["/texts/2.txt"] * 3
+
+
+def test_requests_respect_the_rate_limit(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 10):
+        mock_gutendex.add_book(book_id, 200)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 100)
+    monkeypatch.setattr(gutendex, "REQUESTS_PER_SECOND", 20.0)
+    monkeypatch.setattr(gutendex, "REQUESTS_BURST", 2)
+    run(gutendex)
+    times = [t for t, *_ in mock_gutendex.requests]
+    # 3 pages + 9 textes : 2 requêtes d'un coup puis 20 par seconde
+    assert len(times) == 12
+    assert times[-1] - times[0] >= (len(times) - 2) / 20.0 - 0.05
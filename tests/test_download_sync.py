@@ -0,0 +1,88 @@
+"""Mode --sync de download_gutendex.py : GET conditionnels, hashes, point de reprise et manifeste."""
+
+import json
+
+from test_download_gutendex import run, saved_ids
+
+
+def read(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def apply_manifest(gd):
+    """Ce que fait index_inverted_from_db --manifest une fois l'index à jour (library/changes.py)."""
+    gd.CHANGES_FILE.replace(gd.CHANGES_FILE.with_name(gd.CHANGES_FILE.name + ".applied"))
+
+
+def test_unchanged_books_answer_304(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 5):
+        mock_gutendex.add_book(book_id, 200)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 4)
+    run(gutendex, sync=True)
+    state = read(gutendex.SYNC_STATE_FILE)
+    assert sorted(state["books"], key=int) == ["1", "2", "3", "4"]
+    assert read(gutendex.CHANGES_FILE)["added"] == [1, 2, 3, 4]
+
+    mock_gutendex.requests.clear()
+    downloader = run(gutendex, sync=True)
+    assert downloader.unchanged == 4
+    assert not downloader.added and not downloader.updated
+    assert mock_gutendex.hits("/books?ids=1,2,3,4")
+    sent = mock_gutendex.request_headers("/texts/1.txt")
+    assert sent and sent[-1]["If-None-Match"] == state["books"]["1"]["etag"]
+    assert sent[-1]["If-Modified-Since"] == state["books"]["1"]["last_modified"]
+
+
+def test_updates_are_detected_by_hash(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 5):
+        mock_gutendex.add_book(book_id, 200)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 4)
+    run(gutendex, sync=True)
+    apply_manifest(gutendex)
+
+    # le serveur renvoie tous les textes (200) : seul le hash distingue le livre modifié
+    mock_gutendex.honor_validators = False
+    mock_gutendex.set_text(2, " ".join(["storm"] * 300))
+    downloader = run(gutendex, sync=True)
+    assert downloader.updated == {2}
+    assert downloader.unchanged == 3
+    changes = read(gutendex.CHANGES_FILE)
+    assert (changes["added"], changes["updated"]) == ([], [2])
+    assert (gutendex.OUTPUT_DIR / "2.txt").read_text(encoding="utf-8").startswith("storm")
+    assert read(gutendex.SYNC_STATE_FILE)["books"]["2"]["sha256"] == gutendex.content_hash(mock_gutendex.texts[2])
+
+
+def test_catalog_resumes_from_checkpoint(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 13):
+        mock_gutendex.add_book(book_id, 200)
+    monkeypatch.setattr(gutendex, "PAGE_SIZE_HINT", 3)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 4)
+    run(gutendex, sync=True)
+    checkpoint = read(gutendex.SYNC_STATE_FILE)["checkpoint"]
+    assert checkpoint["page"] == 2   # livres 4 à 6 : le 4 est collecté, 5 et 6 restent à faire
+    assert saved_ids(gutendex) == [1, 2, 3, 4]
+
+    mock_gutendex.requests.clear()
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 8)
+    run(gutendex, sync=True)
+    catalog = [path for path in mock_gutendex.hits("/books") if "ids=" not in path]
+    assert catalog[0] == "/books?page=2"
+    assert "/books" not in catalog   # la première page n'est pas redemandée
+    assert saved_ids(gutendex) == list(range(1, 9))
+
+
+def test_pending_manifest_is_extended_not_overwritten(gutendex, mock_gutendex, monkeypatch):
+    for book_id in range(1, 7):
+        mock_gutendex.add_book(book_id, 200)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 2)
+    run(gutendex, sync=True)
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 4)
+    run(gutendex, sync=True)
+    assert read(gutendex.CHANGES_FILE)["added"] == [1, 2, 3, 4]
+
+    apply_manifest(gutendex)
+    mock_gutendex.set_text(1, " ".join(["storm"] * 300))
+    monkeypatch.setattr(gutendex, "TARGET_BOOKS", 5)
+    run(gutendex, sync=True)
+    changes = read(gutendex.CHANGES_FILE)
+    assert (changes["added"], changes["updated"]) == ([5], [1])